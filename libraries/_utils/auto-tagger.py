@@ -6,7 +6,10 @@ Automatically applies 4 diverse tags to each chapter in library JSON files.
 Usage:
     python auto-tagger.py <library_file.json>
     python auto-tagger.py --all              # Tag all libraries
+    python auto-tagger.py --all --jobs 8     # Tag libraries on 8 processes
     python auto-tagger.py --dry-run <file>   # Preview without saving
+    python auto-tagger.py --all --no-cache   # Retag every chapter, ignoring the tag cache
+    python auto-tagger.py --all --tfidf      # Score keywords by TF-IDF over the catalog (needs NumPy)
 
 Tag Strategy (4 tags per chapter):
     Tag 1 (Broad): Domain anchor - the primary knowledge domain
@@ -15,13 +18,23 @@ Tag Strategy (4 tags per chapter):
     Tag 4 (Specific): Precise identifier - the most specific applicable tag
 """
 
+import io
 import json
 import sys
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Set
 
+import _paths  # noqa: F401 - puts tools/ on sys.path
+from quarex_catalog import SNAPSHOT_PATH, load_catalog, read_json, walk_library_files
+from quarex_json_stream import is_legacy_library
+from quarex_tag_cache import TagCache
+from quarex_tag_matcher import MatchText, find_best_tag, find_multiple_tags, keyword_matcher
+from quarex_tag_tfidf import HAS_NUMPY, TfidfScorer, learn_idf
+
 # =============================================================================
 # CONFIGURATION
 # =============================================================================
@@ -48,7 +61,7 @@ LIBRARY_TYPE_PATTERNS = {
 SPECIFIC_TAG_KEYWORDS = {
     # Art periods and movements
     "prehistoric": ["prehistoric", "cave painting", "cave art", "paleolithic", "neolithic", "lascaux", "altamira"],
-    "ancient-egypt": ["egypt", "egyptian", "pharaoh", "pyramid", "hieroglyph", "nile", "tutankhamun"],
+    "ancient-egypt": ["egypt*", "egyptian", "pharaoh", "pyramid", "hieroglyph", "nile", "tutankhamun"],
     "ancient-greece": ["greek", "greece", "hellenistic", "parthenon", "acropolis", "athens", "sparta"],
     "ancient-rome": ["roman", "rome", "colosseum", "gladiator", "emperor", "latin", "pompeii"],
     "medieval": ["medieval", "middle ages", "gothic", "cathedral", "feudal", "knight", "crusade", "romanesque"],
@@ -67,11 +80,11 @@ SPECIFIC_TAG_KEYWORDS = {
     "classical": ["classical", "neoclassical", "davidian", "canova", "ingres", "academic"],
 
     # Art forms and media
-    "painting": ["painting", "paint", "oil", "watercolor", "acrylic", "fresco", "tempera", "gouache"],
-    "sculpture": ["sculpture", "sculpt", "carving", "bronze", "marble", "clay", "statue", "bust", "relief"],
+    "painting": ["painting", "paint*", "oil", "watercolor", "acrylic", "fresco", "tempera", "gouache"],
+    "sculpture": ["sculpture", "sculpt*", "carving", "bronze", "marble", "clay", "statue", "bust", "relief"],
     "drawing": ["drawing technique", "sketch", "pencil drawing", "charcoal drawing", "graphite", "conte crayon", "line drawing"],
-    "printmaking": ["print", "etching", "lithograph", "woodcut", "engraving", "screenprint", "intaglio", "relief print"],
-    "photography": ["photography", "photograph", "camera", "exposure", "darkroom", "aperture", "shutter"],
+    "printmaking": ["print*", "etching", "lithograph", "woodcut", "engraving", "screenprint", "intaglio", "relief print"],
+    "photography": ["photography", "photograph*", "camera", "exposure", "darkroom", "aperture", "shutter"],
     "ceramics": ["ceramic", "pottery", "clay", "kiln", "glaze", "porcelain", "stoneware", "earthenware"],
     "textiles": ["textile", "weaving", "fiber", "fabric", "tapestry", "embroidery", "quilt"],
     "glass-art": ["glass", "stained glass", "glassblowing", "fused glass", "lampwork"],
@@ -88,7 +101,7 @@ SPECIFIC_TAG_KEYWORDS = {
     # Music genres and forms
     "classical-music": ["symphony", "orchestra", "concerto", "sonata", "chamber music", "beethoven", "mozart", "bach", "brahms", "chopin"],
     "opera": ["opera", "aria", "libretto", "soprano", "tenor", "verdi", "puccini", "wagner"],
-    "ballet": ["ballet", "ballerina", "choreograph", "nutcracker", "swan lake", "pas de deux"],
+    "ballet": ["ballet", "ballerina", "choreograph*", "nutcracker", "swan lake", "pas de deux"],
     "jazz": ["jazz", "improvisation", "bebop", "swing", "blues", "ragtime", "ellington", "coltrane", "miles davis"],
     "rock-music": ["rock", "rock and roll", "guitar", "beatles", "rolling stones", "punk", "grunge", "metal"],
     "electronic-music": ["electronic", "synthesizer", "edm", "techno", "house", "ambient", "drum and bass"],
@@ -105,13 +118,13 @@ SPECIFIC_TAG_KEYWORDS = {
     "documentary": ["documentary", "docufilm", "non-fiction film", "journalism"],
     "animation": ["animation", "animated", "cartoon", "anime", "pixar", "stop motion"],
     "theater": ["theater", "theatre", "stage", "broadway", "west end", "drama", "acting"],
-    "dance": ["dance", "dancer", "choreograph", "modern dance", "contemporary dance", "folk dance"],
+    "dance": ["dance", "dancer", "choreograph*", "modern dance", "contemporary dance", "folk dance"],
 
     # Science branches - Physics
     "physics": ["physics", "physical", "force", "energy", "motion", "wave"],
     "quantum-mechanics": ["quantum", "quanta", "wave function", "heisenberg", "schrodinger", "superposition", "entanglement"],
     "thermodynamics": ["thermodynamic", "heat", "entropy", "thermal", "temperature", "energy transfer"],
-    "electromagnetism": ["electromagnetic", "electric", "magnetic", "maxwell", "faraday", "inductance"],
+    "electromagnetism": ["electromagnetic", "electric*", "magnetic", "maxwell", "faraday", "inductance"],
     "mechanics": ["mechanics", "newton", "momentum", "velocity", "acceleration", "friction", "dynamics"],
     "optics": ["optics", "optical", "light", "lens", "refraction", "reflection", "laser"],
     "relativity": ["relativity", "einstein", "spacetime", "lorentz", "time dilation", "mass-energy"],
@@ -123,18 +136,18 @@ SPECIFIC_TAG_KEYWORDS = {
     "chemistry": ["chemistry", "chemical", "molecule", "reaction", "element", "compound"],
     "organic-chemistry": ["organic", "carbon", "hydrocarbon", "polymer", "synthesis", "functional group"],
     "inorganic-chemistry": ["inorganic", "metal", "mineral", "coordination", "crystal"],
-    "biochemistry": ["biochem", "protein", "enzyme", "metabolism", "dna", "rna", "amino acid"],
+    "biochemistry": ["biochem*", "protein", "enzyme", "metabolism", "dna", "rna", "amino acid"],
 
     # Science branches - Biology
     "biology": ["biology", "biological", "organism", "life", "living"],
     "cell-biology": ["cell", "cellular", "organelle", "membrane", "mitosis", "cytoplasm"],
     "genetics": ["genetics", "genome", "dna", "heredity", "mutation", "chromosome", "crispr", "hereditary"],
-    "evolution-biology": ["evolution", "darwin", "natural selection", "speciation", "adaptation", "phylogen"],
-    "microbiology": ["microb", "bacteria", "virus", "pathogen", "microorganism", "infectious"],
+    "evolution-biology": ["evolution*", "darwin", "natural selection", "speciation", "adaptation", "phylogen*"],
+    "microbiology": ["microb*", "bacteria", "virus", "pathogen", "microorganism", "infectious"],
     "ecology": ["ecology", "ecosystem", "habitat", "biodiversity", "species interaction", "food web"],
     "botany": ["botany", "plant", "flora", "photosynthesis", "botanical", "vegetation"],
     "zoology": ["zoology", "animal", "fauna", "mammal", "vertebrate", "invertebrate"],
-    "neuroscience": ["neuro", "brain", "neuron", "synapse", "cognitive", "neural"],
+    "neuroscience": ["neuro*", "brain", "neuron", "synapse", "cognitive", "neural"],
 
     # Science branches - Earth sciences
     "geology": ["geology", "geological", "rock", "mineral", "tectonic", "volcano", "earthquake", "stratigraphy"],
@@ -143,7 +156,7 @@ SPECIFIC_TAG_KEYWORDS = {
     "astronomy": ["astronomy", "star", "planet", "galaxy", "telescope", "celestial", "solar system"],
 
     # Technology and computing
-    "computer-science": ["computer science", "algorithm", "data structure", "computation", "turing"],
+    "computer-science": ["computer science", "algorithm*", "data structure", "computation*", "turing"],
     "software-engineering": ["software", "programming", "code", "developer", "agile", "scrum"],
     "ai-ml": ["artificial intelligence", "machine learning", "neural network", "deep learning", "nlp", "computer vision"],
     "robotics": ["robot", "robotic", "autonomous", "automation", "sensor", "actuator"],
@@ -170,7 +183,7 @@ SPECIFIC_TAG_KEYWORDS = {
     "smart-grid": ["smart grid", "demand response", "load balancing", "grid modernization", "advanced metering"],
 
     # Design fields
-    "architecture": ["architecture", "architect", "architectural", "building design", "facade", "blueprint"],
+    "architecture": ["architecture", "architect*", "architectural", "building design", "facade", "blueprint"],
     "graphic-design": ["graphic design", "typography", "layout", "visual design", "branding"],
     "product-design": ["product design", "industrial design", "prototype", "manufacturing"],
     "user-experience": ["ux", "user experience", "usability", "interaction design", "user research"],
@@ -189,22 +202,22 @@ SPECIFIC_TAG_KEYWORDS = {
     "logical-fallacies": ["fallacy", "fallacies", "ad hominem", "straw man", "false dichotomy", "slippery slope"],
     "source-evaluation": ["source evaluation", "credibility", "reliability", "fact check", "verification"],
     "media-literacy": ["media literacy", "news literacy", "information literacy", "digital literacy"],
-    "scientific-method": ["scientific method", "hypothesis", "experiment", "peer review", "reproducibility"],
+    "scientific-method": ["scientific method", "hypothesis", "experiment*", "peer review", "reproducibility"],
 
     # Geopolitical regions
-    "russia-ukraine": ["ukraine", "russia", "kremlin", "putin", "kyiv", "moscow", "donbas", "crimea"],
-    "israel-palestine": ["israel", "palestine", "gaza", "hamas", "netanyahu", "west bank", "idf"],
+    "russia-ukraine": ["ukraine", "russia*", "kremlin", "putin", "kyiv", "moscow", "donbas", "crimea"],
+    "israel-palestine": ["israel*", "palestine", "gaza", "hamas", "netanyahu", "west bank", "idf"],
     "china-taiwan": ["taiwan strait", "cross-strait", "taiwanese", "taipei", "beijing-taipei", "prc-roc"],
-    "middle-east": ["middle east", "arab", "persian", "gulf", "levant", "mesopotamia"],
-    "africa": ["africa", "african", "sahara", "subsaharan", "maghreb", "horn of africa"],
-    "asia": ["asia", "asian", "east asia", "southeast asia", "south asia", "central asia"],
-    "europe": ["europe", "european", "eu", "western europe", "eastern europe", "nordic"],
+    "middle-east": ["middle east", "arab*", "persian", "gulf", "levant", "mesopotamia"],
+    "africa": ["africa*", "african", "sahara", "subsaharan", "maghreb", "horn of africa"],
+    "asia": ["asia*", "asian", "east asia", "southeast asia", "south asia", "central asia"],
+    "europe": ["europe*", "european", "eu", "western europe", "eastern europe", "nordic"],
     "americas": ["americas", "north america", "south america", "latin america", "caribbean"],
     "oceania": ["oceania", "pacific", "australasia", "polynesia", "melanesia"],
 
     # Political and social
     "us-politics": ["american politics", "congress", "senate", "house of representatives", "white house"],
-    "elections": ["election", "vote", "ballot", "campaign", "candidate", "polling"],
+    "elections": ["election", "vote*", "ballot", "campaign", "candidate", "polling"],
     "trump": ["trump", "maga", "january 6", "jan 6", "mar-a-lago"],
     "journalism": ["journalism", "journalist", "reporter", "news media", "press freedom", "editorial board", "investigative reporting"],
     "immigration": ["immigration", "immigrant", "border", "visa", "asylum", "deportation"],
@@ -213,7 +226,7 @@ SPECIFIC_TAG_KEYWORDS = {
 
     # Finance and economics
     "personal-finance": ["personal finance", "budget", "saving", "investing", "retirement", "debt"],
-    "economics-theory": ["economic theory", "keynesian", "monetarist", "supply and demand", "market"],
+    "economics-theory": ["economic theory", "keynesian", "monetarist", "supply and demand", "market*"],
     "monetary-policy": ["monetary policy", "federal reserve", "interest rate", "inflation", "central bank"],
     "fiscal-policy": ["fiscal policy", "taxation", "government spending", "deficit", "stimulus"],
 }
@@ -224,65 +237,65 @@ MEDIUM_TAG_KEYWORDS = {
     "critical-thinking": ["critical thinking", "analyze", "evaluate", "reasoning", "logic", "argument"],
     "systems-thinking": ["systems thinking", "interconnected", "holistic", "complexity", "feedback loop"],
     "epistemology": ["epistemology", "knowledge", "truth", "belief", "justification", "certainty"],
-    "methodology": ["methodology", "method", "approach", "framework", "systematic"],
+    "methodology": ["methodology", "method", "approach", "framework", "systematic*"],
     "empiricism": ["empirical", "observation", "evidence", "data-driven", "experimental"],
-    "theory": ["theory", "theoretical", "conceptual", "model", "framework", "abstract"],
+    "theory": ["theory", "theoretical", "conceptual", "model*", "framework", "abstract"],
     "application": ["application", "applied", "practical", "real-world", "implementation"],
     "analysis": ["analysis", "examine", "investigate", "breakdown", "dissect"],
-    "synthesis": ["synthesis", "combine", "integrate", "unify", "bring together"],
+    "synthesis": ["synthesis", "combine", "integrate*", "unify", "bring together"],
 
     # Creative and artistic lenses
     "aesthetics": ["aesthetic", "beauty", "taste", "sensory", "perception", "sublime"],
     "expression": ["expression", "expressive", "communicate", "convey", "voice"],
-    "craft": ["craft", "craftsmanship", "skill", "mastery", "artisan", "handmade"],
-    "technique": ["technique", "technical", "method", "process", "procedure"],
-    "composition": ["composition", "arrange", "structure", "organize", "layout"],
+    "craft": ["craft*", "craftsmanship", "skill", "mastery", "artisan", "handmade"],
+    "technique": ["technique", "technical", "method", "process*", "procedure"],
+    "composition": ["composition", "arrange*", "structure", "organize*", "layout"],
     "narrative": ["narrative", "story", "storytelling", "plot", "character development"],
-    "tradition": ["tradition", "traditional", "heritage", "classical", "established"],
+    "tradition": ["tradition*", "traditional", "heritage", "classical", "established"],
     "innovation": ["innovation", "innovative", "new", "breakthrough", "pioneering", "revolutionary"],
-    "experimentation": ["experiment", "experimental", "avant-garde", "explore", "test"],
-    "modernism": ["modern", "modernist", "contemporary", "20th century", "break from tradition"],
+    "experimentation": ["experiment*", "experimental", "avant-garde", "explore", "test"],
+    "modernism": ["modern*", "modernist", "contemporary", "20th century", "break from tradition"],
     "postmodernism": ["postmodern", "deconstruction", "irony", "pastiche", "meta"],
 
     # Scientific lenses
-    "discovery": ["discovery", "discover", "found", "reveal", "uncover"],
-    "measurement": ["measurement", "measure", "quantify", "metric", "calibrate"],
-    "modeling": ["model", "simulation", "represent", "approximate"],
-    "prediction": ["prediction", "predict", "forecast", "anticipate", "project"],
+    "discovery": ["discovery", "discover*", "found", "reveal*", "uncover"],
+    "measurement": ["measurement", "measure*", "quantify", "metric", "calibrate"],
+    "modeling": ["model*", "simulation", "represent*", "approximate"],
+    "prediction": ["prediction", "predict*", "forecast", "anticipate", "project"],
     "causation": ["causation", "cause", "effect", "mechanism", "why"],
-    "verification": ["verification", "verify", "confirm", "validate", "prove"],
-    "replication": ["replication", "reproduce", "repeat", "confirm"],
-    "uncertainty": ["uncertainty", "uncertain", "probability", "risk", "unknown"],
+    "verification": ["verification", "verify", "confirm*", "validate", "prove"],
+    "replication": ["replication", "reproduce", "repeat*", "confirm*"],
+    "uncertainty": ["uncertainty", "uncertain*", "probability", "risk", "unknown"],
     "scale": ["scale", "micro", "macro", "magnitude", "level"],
-    "complexity": ["complexity", "complex", "emergent", "nonlinear", "chaotic"],
+    "complexity": ["complexity", "complex*", "emergent", "nonlinear", "chaotic"],
     "frontiers": ["frontier", "cutting edge", "latest", "emerging", "future"],
-    "foundations": ["foundation", "fundamental", "basic", "core", "essential"],
+    "foundations": ["foundation", "fundamental*", "basic", "core", "essential"],
     "interdisciplinary": ["interdisciplinary", "cross-disciplinary", "multidisciplinary"],
 
     # Social and political lenses
     "democracy": ["democracy", "democratic", "voting", "representation", "civic"],
-    "governance": ["governance", "govern", "administration", "oversight", "regulation"],
+    "governance": ["governance", "govern*", "administration", "oversight", "regulation"],
     "human-rights": ["human rights", "rights", "freedom", "liberty", "dignity"],
     "justice": ["justice", "fair", "equitable", "remedy", "court"],
     "accountability": ["accountability", "accountable", "responsible", "answerable"],
     "transparency": ["transparency", "transparent", "open", "disclosure"],
-    "representation": ["representation", "represent", "voice", "inclusion"],
+    "representation": ["representation", "represent*", "voice", "inclusion"],
     "activism": ["activism", "activist", "movement", "protest", "advocacy"],
     "inequality": ["inequality", "unequal", "disparity", "gap", "divide"],
-    "colonialism": ["colonial", "colonialism", "imperialism", "empire", "post-colonial"],
-    "authoritarianism": ["authoritarian", "autocracy", "dictatorship", "totalitarian"],
+    "colonialism": ["colonial*", "colonialism", "imperialism", "empire", "post-colonial"],
+    "authoritarianism": ["authoritarian*", "autocracy", "dictatorship", "totalitarian"],
     "nationalism": ["nationalism", "nationalist", "patriotism", "nation-state"],
-    "globalization": ["globalization", "global", "international", "worldwide", "transnational"],
+    "globalization": ["globalization", "global*", "international", "worldwide", "transnational"],
 
     # Cultural and identity lenses
     "identity": ["identity", "belonging", "self", "who we are"],
-    "cultural-heritage": ["heritage", "legacy", "tradition", "cultural", "preservation"],
+    "cultural-heritage": ["heritage", "legacy", "tradition*", "cultural", "preservation"],
     "migration": ["migration", "immigrant", "emigrant", "diaspora", "displacement"],
-    "spirituality": ["spiritual", "sacred", "divine", "transcendent", "faith"],
+    "spirituality": ["spiritual*", "sacred", "divine", "transcendent", "faith"],
 
     # Communication lenses
     "rhetoric": ["rhetoric", "persuasion", "argument", "discourse", "oratory"],
-    "propaganda": ["propaganda", "influence", "manipulation", "messaging"],
+    "propaganda": ["propaganda", "influence*", "manipulation", "messaging"],
     "misinformation": ["misinformation", "disinformation", "fake news", "false"],
     "communication": ["communication", "communicate", "message", "convey"],
     "cognition": ["cognition", "cognitive", "mental", "thinking", "mind"],
@@ -290,24 +303,24 @@ MEDIUM_TAG_KEYWORDS = {
 
     # Technical and practical lenses
     "infrastructure": ["infrastructure", "system", "network", "facility"],
-    "security": ["security", "secure", "protect", "defense", "threat"],
+    "security": ["security", "secure", "protect*", "defense", "threat*"],
     "sustainability": ["sustainability", "sustainable", "renewable", "green", "eco"],
     "energy": ["energy", "power", "electricity", "fuel"],
     "development": ["development", "growth", "progress", "advancement"],
     "regulation": ["regulation", "regulate", "rule", "standard", "compliance"],
 
     # Historical lenses
-    "evolution": ["evolution", "evolve", "develop", "change over time", "gradual"],
-    "revolution": ["revolution", "revolutionary", "radical change", "transformation", "upheaval"],
-    "legacy": ["legacy", "lasting", "enduring", "influence", "impact"],
-    "influence": ["influence", "influenced", "shaped", "affected", "inspired"],
+    "evolution": ["evolution*", "evolve*", "develop*", "change over time", "gradual"],
+    "revolution": ["revolution*", "revolutionary", "radical change", "transformation", "upheaval"],
+    "legacy": ["legacy", "lasting", "enduring", "influence*", "impact"],
+    "influence": ["influence*", "influenced", "shaped", "affected", "inspired"],
     "controversy": ["controversy", "controversial", "debate", "disputed", "contested"],
 
     # Personal and interpersonal
     "mental-health": ["mental health", "psychological", "therapy", "wellbeing", "emotional"],
     "interpersonal-dynamics": ["relationship", "interpersonal", "social", "connection", "bond"],
     "workplace-dynamics": ["workplace", "career", "job", "employment", "professional"],
-    "digital-life": ["digital", "online", "virtual", "internet", "cyber"],
+    "digital-life": ["digital", "online", "virtual", "internet", "cyber*"],
     "privacy": ["privacy", "private", "surveillance", "data protection"],
     "free-speech": ["free speech", "expression", "censorship", "first amendment"],
     "finance": ["finance", "financial", "money", "investment", "banking"],
@@ -317,26 +330,33 @@ MEDIUM_TAG_KEYWORDS = {
 
 # Maps keywords to broad-tier domain tags
 BROAD_TAG_KEYWORDS = {
-    "science": ["science", "scientific", "research", "study", "experiment", "hypothesis"],
+    "science": ["science", "scientific", "research*", "study", "experiment*", "hypothesis"],
     "technology": ["technology", "tech", "digital", "computer", "software", "engineering"],
     "arts": ["art", "artistic", "creative", "visual", "aesthetic", "expression"],
-    "history": ["history", "historical", "past", "ancient", "medieval", "century"],
+    "history": ["history", "historical*", "past", "ancient", "medieval", "century"],
     "politics": ["politics", "political", "government", "policy", "legislature"],
-    "economics": ["economics", "economic", "market", "trade", "finance", "fiscal"],
-    "ethics": ["ethics", "ethical", "moral", "value", "right and wrong"],
+    "economics": ["economics", "economic*", "market*", "trade", "finance", "fiscal"],
+    "ethics": ["ethics", "ethical", "moral*", "value", "right and wrong"],
     "society": ["society", "social", "community", "culture", "people"],
-    "geography": ["geography", "geographic", "region", "country", "territory", "land"],
-    "health": ["health", "medical", "medicine", "disease", "wellness", "healthcare"],
-    "education": ["education", "educational", "learning", "teaching", "pedagogy"],
-    "law": ["law", "legal", "court", "legislation", "judicial", "constitution"],
-    "conflict": ["conflict", "war", "military", "battle", "combat", "peace"],
-    "environment": ["environment", "environmental", "ecology", "climate", "nature"],
-    "media": ["media", "journalism", "news", "press", "broadcast", "publication"],
+    "geography": ["geography", "geographic", "region*", "country", "territory", "land"],
+    "health": ["health*", "medical", "medicine", "disease", "wellness", "healthcare"],
+    "education": ["education*", "educational", "learning", "teaching", "pedagogy"],
+    "law": ["law", "legal*", "court", "legislation", "judicial", "constitution*"],
+    "conflict": ["conflict", "war", "military", "battle*", "combat", "peace*"],
+    "environment": ["environment*", "environmental", "ecology", "climate", "nature"],
+    "media": ["media", "journalism", "news*", "press", "broadcast", "publication"],
     "philosophy": ["philosophy", "philosophical", "metaphysics", "logic", "epistemology"],
-    "religion": ["religion", "religious", "faith", "sacred", "spiritual", "divine"],
+    "religion": ["religion", "religious", "faith", "sacred", "spiritual*", "divine"],
     "psychology": ["psychology", "psychological", "mental", "cognitive", "behavior", "mind"],
 }
 
+# Keyword maps by vocabulary tier; a trailing * marks a stem (see quarex_tag_matcher)
+TIER_KEYWORDS = {
+    "broad": BROAD_TAG_KEYWORDS,
+    "medium": MEDIUM_TAG_KEYWORDS,
+    "specific": SPECIFIC_TAG_KEYWORDS,
+}
+
 # =============================================================================
 # CONTEXT-AWARE FALLBACK ALTERNATIVES
 # =============================================================================
@@ -420,55 +440,6 @@ def detect_library_type(file_path: str) -> str:
                 return lib_type
     return "knowledge"
 
-def normalize_text(text: str) -> str:
-    """Normalize text for matching - lowercase and clean."""
-    return text.lower().strip()
-
-def find_best_tag(text: str, keyword_map: Dict[str, List[str]], valid_tags: Set[str]) -> Optional[str]:
-    """Find the best matching tag from a keyword map."""
-    text_lower = normalize_text(text)
-
-    # Score each potential tag by number of keyword matches and specificity
-    scores = {}
-    for tag, keywords in keyword_map.items():
-        if tag not in valid_tags:
-            continue
-        score = 0
-        for keyword in keywords:
-            if keyword.lower() in text_lower:
-                # Longer keywords are more specific, give them more weight
-                score += len(keyword.split())
-        if score > 0:
-            scores[tag] = score
-
-    if scores:
-        # Return the tag with the highest score
-        return max(scores, key=scores.get)
-    return None
-
-def find_multiple_tags(text: str, keyword_map: Dict[str, List[str]], valid_tags: Set[str],
-                       exclude: Set[str] = None, limit: int = 3) -> List[str]:
-    """Find multiple matching tags, excluding already-used ones."""
-    if exclude is None:
-        exclude = set()
-
-    text_lower = normalize_text(text)
-
-    scores = {}
-    for tag, keywords in keyword_map.items():
-        if tag not in valid_tags or tag in exclude:
-            continue
-        score = 0
-        for keyword in keywords:
-            if keyword.lower() in text_lower:
-                score += len(keyword.split())
-        if score > 0:
-            scores[tag] = score
-
-    # Sort by score descending and return top matches
-    sorted_tags = sorted(scores.keys(), key=lambda t: scores[t], reverse=True)
-    return sorted_tags[:limit]
-
 def get_fallback_tag(broad_tag: str, tier: str, used_tags: Set[str], valid_tags: Set[str]) -> Optional[str]:
     """Get a fallback tag based on the broad category context."""
     alternatives = FALLBACK_ALTERNATIVES.get(broad_tag, FALLBACK_ALTERNATIVES["default"])
@@ -483,12 +454,24 @@ def get_fallback_tag(broad_tag: str, tier: str, used_tags: Set[str], valid_tags:
 # MAIN TAGGING LOGIC
 # =============================================================================
 
+def chapter_text(library_name: str, shelf_name: str, book_name: str, chapter_name: str) -> MatchText:
+    """All the names a chapter is tagged from, split into words once."""
+    return MatchText(f"{library_name} {shelf_name} {book_name} {chapter_name}")
+
 def generate_tags(library_type: str, shelf_name: str, book_name: str,
-                  chapter_name: str, library_name: str, valid_tags: Dict[str, Set[str]]) -> List[str]:
-    """Generate 4 diverse tags for a chapter using comprehensive keyword matching."""
+                  chapter_name: str, library_name: str, valid_tags: Dict[str, Set[str]],
+                  scores: Optional[Dict[str, Dict[str, float]]] = None) -> List[str]:
+    """Generate 4 diverse tags for a chapter using comprehensive keyword matching.
+
+    `scores` ({tier: {tag: score}}, e.g. from TfidfScorer) replaces the
+    default keyword-count scoring when given.
+    """
 
-    # Combine all text for matching
-    combined_text = f"{library_name} {shelf_name} {book_name} {chapter_name}"
+    # Combine all text for matching, split it into words once and score every tier
+    if scores is None:
+        combined_text = chapter_text(library_name, shelf_name, book_name, chapter_name)
+        scores = {tier: keyword_matcher(rules).scores(combined_text)
+                  for tier, rules in TIER_KEYWORDS.items()}
 
     used_tags: Set[str] = set()
     final_tags: List[str] = []
@@ -496,7 +479,7 @@ def generate_tags(library_type: str, shelf_name: str, book_name: str,
     # -------------------------------------------------------------------------
     # TAG 1: Broad domain tag
     # -------------------------------------------------------------------------
-    broad_tag = find_best_tag(combined_text, BROAD_TAG_KEYWORDS, valid_tags["broad"])
+    broad_tag = find_best_tag(scores["broad"], valid_tags["broad"])
 
     # Library type fallbacks if no keyword match
     if not broad_tag:
@@ -517,7 +500,7 @@ def generate_tags(library_type: str, shelf_name: str, book_name: str,
     # -------------------------------------------------------------------------
     # TAG 2: Medium conceptual lens
     # -------------------------------------------------------------------------
-    medium_tag = find_best_tag(combined_text, MEDIUM_TAG_KEYWORDS, valid_tags["medium"])
+    medium_tag = find_best_tag(scores["medium"], valid_tags["medium"])
 
     if medium_tag and medium_tag not in used_tags:
         final_tags.append(medium_tag)
@@ -536,15 +519,15 @@ def generate_tags(library_type: str, shelf_name: str, book_name: str,
     # TAG 3: Second medium or specific differentiator
     # -------------------------------------------------------------------------
     # Try to find a specific tag first for more diversity
-    specific_tag = find_best_tag(combined_text, SPECIFIC_TAG_KEYWORDS, valid_tags["specific"])
+    specific_tag = find_best_tag(scores["specific"], valid_tags["specific"])
 
     if specific_tag and specific_tag not in used_tags:
         final_tags.append(specific_tag)
         used_tags.add(specific_tag)
     else:
         # Try another medium tag
-        medium_alternatives = find_multiple_tags(combined_text, MEDIUM_TAG_KEYWORDS,
-                                                  valid_tags["medium"], used_tags, limit=3)
+        medium_alternatives = find_multiple_tags(scores["medium"], valid_tags["medium"],
+                                                  used_tags, limit=3)
         if medium_alternatives:
             final_tags.append(medium_alternatives[0])
             used_tags.add(medium_alternatives[0])
@@ -561,8 +544,8 @@ def generate_tags(library_type: str, shelf_name: str, book_name: str,
     # TAG 4: Most specific tag possible
     # -------------------------------------------------------------------------
     # Find additional specific tags
-    specific_alternatives = find_multiple_tags(combined_text, SPECIFIC_TAG_KEYWORDS,
-                                               valid_tags["specific"], used_tags, limit=5)
+    specific_alternatives = find_multiple_tags(scores["specific"], valid_tags["specific"],
+                                               used_tags, limit=5)
 
     if specific_alternatives:
         final_tags.append(specific_alternatives[0])
@@ -611,24 +594,37 @@ def generate_tags(library_type: str, shelf_name: str, book_name: str,
 # MAIN PROCESSING
 # =============================================================================
 
-def process_library(file_path: str, dry_run: bool = False) -> Tuple[int, int]:
-    """Process a library file and add tags to all chapters."""
-    vocabulary = load_tag_vocabulary()
-    valid_tags = get_valid_tags(vocabulary)
+def process_library(file_path: str, dry_run: bool = False,
+                    valid_tags: Optional[Dict[str, Set[str]]] = None,
+                    cache: Optional[TagCache] = None,
+                    scorer: Optional[TfidfScorer] = None) -> Tuple[int, Dict[str, int]]:
+    """Process a library file and add tags to all chapters.
+
+    Chapters whose inputs are in `cache` take their tags from it, and the
+    file is only rewritten if some chapter's tags changed. With a `scorer`,
+    the remaining chapters are scored by TF-IDF in one batch. Returns the
+    number of chapters tagged and how often each tag was used.
+    """
+    if valid_tags is None:
+        valid_tags = get_valid_tags(load_tag_vocabulary())
     library_type = detect_library_type(file_path)
 
     print(f"\nProcessing: {file_path}")
     print(f"Library type: {library_type}")
 
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = read_json(file_path)
 
     chapters_tagged = 0
+    chapters_cached = 0
+    chapters_changed = 0
     tag_distribution: Dict[str, int] = {}
 
     # Navigate the JSON structure: library -> shelves -> books -> chapters
     library_name = data.get("library", "Unknown")
+    scoring = ("tfidf", scorer.version) if scorer else ("keywords",)
 
+    # Tags of chapters whose inputs were tagged before, None for the rest
+    entries = []
     for shelf in data.get("shelves", []):
         shelf_name = shelf.get("name", "")
 
@@ -637,33 +633,59 @@ def process_library(file_path: str, dry_run: bool = False) -> Tuple[int, int]:
 
             for chapter in book.get("chapters", []):
                 chapter_name = chapter.get("name", "")
-
-                # Generate new tags
-                new_tags = generate_tags(library_type, shelf_name, book_name,
-                                         chapter_name, library_name, valid_tags)
-
-                # Track tag distribution
-                for tag in new_tags:
-                    tag_distribution[tag] = tag_distribution.get(tag, 0) + 1
-
-                if dry_run:
-                    try:
-                        print(f"  [{book_name}] {chapter_name}")
-                        print(f"    -> {new_tags}")
-                    except UnicodeEncodeError:
-                        print(f"  [{book_name.encode('ascii', 'replace').decode()}] {chapter_name.encode('ascii', 'replace').decode()}")
-                        print(f"    -> {new_tags}")
-                else:
-                    chapter["tags"] = new_tags
-
-                chapters_tagged += 1
-
-    if not dry_run:
+                key = cache.key(library_type, shelf_name, book_name, chapter_name,
+                                library_name, *scoring) if cache else None
+                cached_tags = cache.get(key) if cache else None
+                entries.append((shelf_name, book_name, chapter, key, cached_tags))
+
+    # Score every chapter still to tag in one batch
+    batch_scores = {}
+    if scorer:
+        pending = [i for i, entry in enumerate(entries) if entry[4] is None]
+        texts = [chapter_text(library_name, entries[i][0], entries[i][1], entries[i][2].get("name", ""))
+                 for i in pending]
+        batch_scores = dict(zip(pending, scorer.score(texts)))
+
+    for i, (shelf_name, book_name, chapter, key, new_tags) in enumerate(entries):
+        chapter_name = chapter.get("name", "")
+
+        # Generate new tags, unless these inputs were tagged before
+        if new_tags is None:
+            new_tags = generate_tags(library_type, shelf_name, book_name,
+                                     chapter_name, library_name, valid_tags,
+                                     batch_scores.get(i))
+            if cache:
+                cache.put(key, new_tags)
+        else:
+            chapters_cached += 1
+
+        # Track tag distribution
+        for tag in new_tags:
+            tag_distribution[tag] = tag_distribution.get(tag, 0) + 1
+
+        if dry_run:
+            try:
+                print(f"  [{book_name}] {chapter_name}")
+                print(f"    -> {new_tags}")
+            except UnicodeEncodeError:
+                print(f"  [{book_name.encode('ascii', 'replace').decode()}] {chapter_name.encode('ascii', 'replace').decode()}")
+                print(f"    -> {new_tags}")
+        elif chapter.get("tags") != new_tags:
+            chapter["tags"] = new_tags
+            chapters_changed += 1
+
+        chapters_tagged += 1
+
+    if cache:
+        print(f"Cached: {chapters_cached} of {chapters_tagged} chapters")
+    if dry_run:
+        print(f"Dry run: {chapters_tagged} chapters would be tagged")
+    elif chapters_changed:
         with open(file_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
-        print(f"Saved: {chapters_tagged} chapters tagged")
+        print(f"Saved: {chapters_tagged} chapters tagged, {chapters_changed} changed")
     else:
-        print(f"Dry run: {chapters_tagged} chapters would be tagged")
+        print(f"Unchanged: {chapters_tagged} chapters already tagged, file not rewritten")
 
     # Print tag diversity stats
     unique_tags = len(tag_distribution)
@@ -676,28 +698,89 @@ def process_library(file_path: str, dry_run: bool = False) -> Tuple[int, int]:
         for tag, count in sorted_tags[:10]:
             print(f"  {tag}: {count}")
 
-    return chapters_tagged, unique_tags
+    return chapters_tagged, tag_distribution
 
 def find_all_libraries() -> List[str]:
-    """Find all library JSON files to process."""
+    """Find all nested-shelves library JSON files to process."""
     libraries = []
-    base_dir = SCRIPT_DIR
-
-    for lib_type in LIBRARY_TYPE_PATTERNS.keys():
-        lib_dir = base_dir / f"{lib_type}-libraries"
-        if lib_dir.exists():
-            for json_file in lib_dir.glob("*.json"):
-                # Skip inventory and other meta files
-                if "inventory" in json_file.name.lower():
-                    continue
-                if "questions" in json_file.name.lower():
-                    continue
-                if "bare" in json_file.name.lower():
-                    continue
-                libraries.append(str(json_file))
+
+    for json_file, _, _, _ in walk_library_files():
+        # Skip inventory and other meta files
+        name = json_file.name.lower()
+        if "inventory" in name or "questions" in name or "bare" in name:
+            continue
+        if is_legacy_library(json_file):
+            libraries.append(str(json_file))
 
     return sorted(libraries)
 
+def catalog_idf(dry_run: bool = False):
+    """IDF of every tier keyword, learned from all chapters of the catalog.
+
+    A dry run reads the catalog from JSON and leaves its snapshot alone.
+    """
+    catalog = load_catalog(snapshot_path=None if dry_run else SNAPSHOT_PATH)
+    texts = [chapter_text(library.name, shelf.name, book.name, chapter.name)
+             for library in catalog.values()
+             for shelf in library.shelves.values()
+             for book in shelf.books
+             for chapter in book.chapters]
+    print(f"Learning keyword IDF from {len(texts)} catalog chapters")
+    return learn_idf(TIER_KEYWORDS, texts)
+
+# Vocabulary, tag cache and TF-IDF scorer loaded once per worker process by init_worker()
+_worker_valid_tags: Optional[Dict[str, Set[str]]] = None
+_worker_cache: Optional[TagCache] = None
+_worker_scorer: Optional[TfidfScorer] = None
+
+
+def init_worker(use_cache: bool = True, idf=None):
+    """Load the vocabulary, tag cache and keyword matchers once per process.
+
+    `idf` ({tier: array}, from catalog_idf() in the main process) switches
+    the worker to TF-IDF scoring.
+    """
+    global _worker_valid_tags, _worker_cache, _worker_scorer
+    _worker_valid_tags = get_valid_tags(load_tag_vocabulary())
+    _worker_cache = TagCache.for_tagger(__file__, TAG_VOCABULARY_PATH) if use_cache else None
+    for rules in TIER_KEYWORDS.values():
+        keyword_matcher(rules)
+    _worker_scorer = TfidfScorer(TIER_KEYWORDS, idf, _worker_valid_tags) if idf is not None else None
+
+
+def tag_library_file(task: Tuple[str, bool]) -> Tuple[str, int, Dict[str, int], Dict]:
+    """Pool task: tag one library file, returning its report, tag counts and new cache entries."""
+    file_path, dry_run = task
+    report = io.StringIO()
+    with redirect_stdout(report):
+        tagged, distribution = process_library(file_path, dry_run, _worker_valid_tags,
+                                               _worker_cache, _worker_scorer)
+    added = _worker_cache.take_added() if _worker_cache else {}
+    return report.getvalue(), tagged, distribution, added
+
+
+def tag_libraries(libraries: List[str], dry_run: bool, jobs: int, use_cache: bool = True,
+                  idf=None):
+    """Tag library files, on `jobs` processes, yielding results in file order.
+
+    Each result is (report, chapters tagged, tag distribution, new cache
+    entries); a worker's report is printed only when its file is done, so
+    the output reads the same whatever the number of processes.
+    """
+    if jobs <= 1 or len(libraries) <= 1:
+        init_worker(use_cache, idf)
+        for file_path in libraries:
+            tagged, distribution = process_library(file_path, dry_run, _worker_valid_tags,
+                                                   _worker_cache, _worker_scorer)
+            added = _worker_cache.take_added() if _worker_cache else {}
+            yield "", tagged, distribution, added
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                             initargs=(use_cache, idf)) as pool:
+        yield from pool.map(tag_library_file, [(path, dry_run) for path in libraries])
+
+
 def main():
     if len(sys.argv) < 2:
         print(__doc__)
@@ -707,27 +790,64 @@ def main():
         sys.exit(1)
 
     dry_run = "--dry-run" in sys.argv
-    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    use_cache = "--no-cache" not in sys.argv
+    tfidf = "--tfidf" in sys.argv
+    jobs = os.cpu_count() or 1
+    args = []
+    argv = iter(sys.argv[1:])
+    for arg in argv:
+        if arg == "--jobs":
+            jobs = int(next(argv, "1"))
+        elif arg.startswith("--jobs="):
+            jobs = int(arg.split("=", 1)[1])
+        elif not arg.startswith("--"):
+            args.append(arg)
 
     if "--all" in sys.argv:
         libraries = find_all_libraries()
         print(f"Found {len(libraries)} libraries to process")
     else:
-        libraries = args
+        libraries = []
+        for lib_path in args:
+            if os.path.exists(lib_path):
+                libraries.append(lib_path)
+            else:
+                print(f"File not found: {lib_path}")
+
+    idf = None
+    if tfidf:
+        if not HAS_NUMPY:
+            print("Error: --tfidf needs NumPy (pip install numpy)")
+            sys.exit(1)
+        idf = catalog_idf(dry_run)
 
     total_tagged = 0
     total_unique = 0
-    for lib_path in libraries:
-        if not os.path.exists(lib_path):
-            print(f"File not found: {lib_path}")
-            continue
-        tagged, unique = process_library(lib_path, dry_run)
+    total_distribution: Dict[str, int] = {}
+    cache_added = {}
+    for report, tagged, distribution, added in tag_libraries(libraries, dry_run, jobs, use_cache, idf):
+        print(report, end="")
+        cache_added.update(added)
         total_tagged += tagged
-        total_unique = max(total_unique, unique)
+        total_unique = max(total_unique, len(distribution))
+        for tag, count in distribution.items():
+            total_distribution[tag] = total_distribution.get(tag, 0) + count
 
     print(f"\n{'=' * 60}")
     print(f"Total chapters {'would be ' if dry_run else ''}tagged: {total_tagged}")
     print(f"Maximum unique tags in a single library: {total_unique}")
 
+    # Workers only read the cache; their new entries are saved here, once
+    if cache_added and not dry_run:
+        cache = TagCache.for_tagger(__file__, TAG_VOCABULARY_PATH)
+        cache.update(cache_added)
+        cache.save()
+
+    if len(libraries) > 1 and total_distribution:
+        print(f"Tag diversity across all libraries: {len(total_distribution)} unique tags")
+        print("Top 20 tags:")
+        for tag, count in sorted(total_distribution.items(), key=lambda x: (-x[1], x[0]))[:20]:
+            print(f"  {tag}: {count}")
+
 if __name__ == "__main__":
     main()
@@ -6,6 +6,10 @@ Automatically applies 4 vocabulary-compliant tags to each chapter in standalone
 Usage:
     python book-auto-tagger.py <book_file.json>
     python book-auto-tagger.py --dry-run <book_file.json>   # Preview without saving
+    python book-auto-tagger.py --all                        # Tag all standalone books
+    python book-auto-tagger.py --all --jobs 8               # Tag books on 8 processes
+    python book-auto-tagger.py --all --no-cache             # Retag every chapter, ignoring the tag cache
+    python book-auto-tagger.py --all --tfidf                # Score keywords by TF-IDF over the catalog (needs NumPy)
 
 This tagger works with the new standalone book format:
 {
@@ -22,11 +26,21 @@ Tag Strategy (4 tags per chapter):
     Tag 4 (Specific): Precise identifier - the most specific applicable tag
 """
 
+import io
 import json
 import sys
 import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 from pathlib import Path
-from typing import Dict, List, Set, Optional
+from typing import Dict, List, Set, Optional, Tuple
+
+import _paths  # noqa: F401 - puts tools/ on sys.path
+from quarex_catalog import SNAPSHOT_PATH, load_catalog, read_json, walk_library_files
+from quarex_json_stream import is_legacy_library
+from quarex_tag_cache import TagCache
+from quarex_tag_matcher import MatchText, find_best_tag, find_multiple_tags, keyword_matcher
+from quarex_tag_tfidf import HAS_NUMPY, TfidfScorer, learn_idf
 
 # =============================================================================
 # CONFIGURATION
@@ -55,17 +69,17 @@ SPECIFIC_TAG_KEYWORDS = {
     "physics": ["physics", "physical", "force", "energy", "motion", "wave"],
     "quantum-mechanics": ["quantum", "quanta", "wave function", "heisenberg", "superposition"],
     "thermodynamics": ["thermodynamic", "heat", "entropy", "thermal", "temperature"],
-    "electromagnetism": ["electromagnetic", "electric", "magnetic", "maxwell", "faraday"],
+    "electromagnetism": ["electromagnetic", "electric*", "magnetic", "maxwell", "faraday"],
     "mechanics": ["mechanics", "newton", "momentum", "velocity", "acceleration"],
     "chemistry": ["chemistry", "chemical", "molecule", "reaction", "element"],
     "biology": ["biology", "biological", "organism", "life", "living"],
-    "neuroscience": ["neuro", "brain", "neuron", "synapse", "cognitive", "neural"],
+    "neuroscience": ["neuro*", "brain", "neuron", "synapse", "cognitive", "neural"],
     "geology": ["geology", "geological", "rock", "mineral", "tectonic", "volcano"],
     "meteorology": ["meteorology", "weather", "atmospheric", "climate", "storm"],
     "astronomy": ["astronomy", "star", "planet", "galaxy", "telescope", "celestial"],
 
     # Technology
-    "computer-science": ["computer science", "algorithm", "data structure", "computation"],
+    "computer-science": ["computer science", "algorithm*", "data structure", "computation*"],
     "software-engineering": ["software", "programming", "code", "developer"],
     "ai-ml": ["artificial intelligence", "machine learning", "neural network", "deep learning"],
     "robotics": ["robot", "robotic", "autonomous", "automation"],
@@ -84,7 +98,7 @@ SPECIFIC_TAG_KEYWORDS = {
 
     # Politics and social
     "us-politics": ["american politics", "congress", "senate", "white house"],
-    "elections": ["election", "vote", "ballot", "campaign", "candidate", "polling"],
+    "elections": ["election", "vote*", "ballot", "campaign", "candidate", "polling"],
     "immigration": ["immigration", "immigrant", "border", "visa", "asylum"],
     "journalism": ["journalism", "journalist", "reporter", "news media", "press"],
     "civil-rights": ["civil rights", "equality", "discrimination", "voting rights"],
@@ -96,74 +110,81 @@ SPECIFIC_TAG_KEYWORDS = {
 
     # Arts
     "visual-arts": ["visual art", "painting", "sculpture", "drawing", "gallery"],
-    "music": ["music", "musician", "composer", "symphony", "orchestra"],
+    "music": ["music*", "musician", "composer", "symphony", "orchestra"],
     "film": ["film", "cinema", "movie", "director", "screenplay"],
     "theater": ["theater", "theatre", "drama", "stage", "playwright"],
 
     # Regions
-    "americas": ["america", "usa", "united states", "canada", "mexico", "brazil"],
-    "europe": ["europe", "european", "eu", "germany", "france", "uk"],
-    "asia": ["asia", "asian", "china", "japan", "india", "korea"],
-    "africa": ["africa", "african", "nigeria", "egypt", "south africa"],
-    "middle-east": ["middle east", "arab", "iran", "israel", "saudi"],
+    "americas": ["america*", "usa", "united states", "canada", "mexico", "brazil"],
+    "europe": ["europe*", "european", "eu", "germany", "france", "uk"],
+    "asia": ["asia*", "asian", "china", "japan*", "india", "korea*"],
+    "africa": ["africa*", "african", "nigeria", "egypt*", "south africa"],
+    "middle-east": ["middle east", "arab*", "iran", "israel*", "saudi"],
 }
 
 MEDIUM_TAG_KEYWORDS = {
     "critical-thinking": ["critical thinking", "analyze", "evaluate", "reasoning", "logic"],
     "systems-thinking": ["systems thinking", "interconnected", "holistic", "complexity"],
     "epistemology": ["epistemology", "knowledge", "truth", "belief", "justification"],
-    "methodology": ["methodology", "method", "approach", "framework", "systematic"],
-    "theory": ["theory", "theoretical", "conceptual", "model", "framework"],
+    "methodology": ["methodology", "method", "approach", "framework", "systematic*"],
+    "theory": ["theory", "theoretical", "conceptual", "model*", "framework"],
     "application": ["application", "applied", "practical", "real-world"],
     "analysis": ["analysis", "examine", "investigate", "breakdown"],
     "innovation": ["innovation", "innovative", "new", "breakthrough", "pioneering"],
-    "tradition": ["tradition", "traditional", "heritage", "classical"],
+    "tradition": ["tradition*", "traditional", "heritage", "classical"],
     "democracy": ["democracy", "democratic", "voting", "representation"],
-    "governance": ["governance", "govern", "administration", "oversight", "regulation"],
+    "governance": ["governance", "govern*", "administration", "oversight", "regulation"],
     "human-rights": ["human rights", "rights", "freedom", "liberty", "dignity"],
     "justice": ["justice", "fair", "equitable", "remedy", "court"],
     "accountability": ["accountability", "accountable", "responsible"],
     "transparency": ["transparency", "transparent", "open", "disclosure"],
     "activism": ["activism", "activist", "movement", "protest", "advocacy"],
     "identity": ["identity", "belonging", "self", "who we are"],
-    "cultural-heritage": ["heritage", "legacy", "tradition", "cultural"],
+    "cultural-heritage": ["heritage", "legacy", "tradition*", "cultural"],
     "sustainability": ["sustainability", "sustainable", "renewable", "green", "eco"],
     "energy": ["energy", "power", "electricity", "fuel"],
     "development": ["development", "growth", "progress", "advancement"],
     "regulation": ["regulation", "regulate", "rule", "standard", "compliance"],
     "mental-health": ["mental health", "psychological", "therapy", "wellbeing"],
     "interpersonal-dynamics": ["relationship", "interpersonal", "social", "connection"],
-    "digital-life": ["digital", "online", "virtual", "internet", "cyber"],
+    "digital-life": ["digital", "online", "virtual", "internet", "cyber*"],
     "communication": ["communication", "communicate", "message", "convey"],
     "cognition": ["cognition", "cognitive", "mental", "thinking", "mind"],
-    "engineering": ["engineering", "engineer", "design", "build", "construct"],
-    "measurement": ["measurement", "measure", "quantify", "metric"],
+    "engineering": ["engineering", "engineer*", "design*", "build*", "construct*"],
+    "measurement": ["measurement", "measure*", "quantify", "metric"],
     "federalism": ["federal", "state", "federalism", "interstate"],
     "sociology": ["sociology", "social", "society", "community"],
     "finance": ["finance", "financial", "money", "investment", "banking"],
 }
 
 BROAD_TAG_KEYWORDS = {
-    "science": ["science", "scientific", "research", "study", "experiment"],
+    "science": ["science", "scientific", "research*", "study", "experiment*"],
     "technology": ["technology", "tech", "digital", "computer", "software", "engineering"],
     "arts": ["art", "artistic", "creative", "visual", "aesthetic"],
-    "history": ["history", "historical", "past", "ancient", "medieval"],
+    "history": ["history", "historical*", "past", "ancient", "medieval"],
     "politics": ["politics", "political", "government", "policy", "legislature"],
-    "economics": ["economics", "economic", "market", "trade", "finance"],
-    "ethics": ["ethics", "ethical", "moral", "value", "right and wrong"],
+    "economics": ["economics", "economic*", "market*", "trade", "finance"],
+    "ethics": ["ethics", "ethical", "moral*", "value", "right and wrong"],
     "society": ["society", "social", "community", "culture", "people"],
-    "geography": ["geography", "geographic", "region", "country", "territory"],
-    "health": ["health", "medical", "medicine", "disease", "wellness"],
-    "education": ["education", "educational", "learning", "teaching"],
-    "law": ["law", "legal", "court", "legislation", "judicial"],
-    "conflict": ["conflict", "war", "military", "battle", "combat"],
-    "environment": ["environment", "environmental", "ecology", "climate", "nature"],
-    "media": ["media", "journalism", "news", "press", "broadcast"],
+    "geography": ["geography", "geographic", "region*", "country", "territory"],
+    "health": ["health*", "medical", "medicine", "disease", "wellness"],
+    "education": ["education*", "educational", "learning", "teaching"],
+    "law": ["law", "legal*", "court", "legislation", "judicial"],
+    "conflict": ["conflict", "war", "military", "battle*", "combat"],
+    "environment": ["environment*", "environmental", "ecology", "climate", "nature"],
+    "media": ["media", "journalism", "news*", "press", "broadcast"],
     "philosophy": ["philosophy", "philosophical", "metaphysics", "logic"],
-    "religion": ["religion", "religious", "faith", "sacred", "spiritual"],
+    "religion": ["religion", "religious", "faith", "sacred", "spiritual*"],
     "psychology": ["psychology", "psychological", "mental", "cognitive", "behavior"],
 }
 
+# Keyword maps by vocabulary tier; a trailing * marks a stem (see quarex_tag_matcher)
+TIER_KEYWORDS = {
+    "broad": BROAD_TAG_KEYWORDS,
+    "medium": MEDIUM_TAG_KEYWORDS,
+    "specific": SPECIFIC_TAG_KEYWORDS,
+}
+
 # =============================================================================
 # HELPER FUNCTIONS
 # =============================================================================
@@ -189,68 +210,35 @@ def detect_library_type(file_path: str) -> str:
                 return lib_type
     return "knowledge"
 
-def normalize_text(text: str) -> str:
-    """Normalize text for matching."""
-    return text.lower().strip()
-
-def find_best_tag(text: str, keyword_map: Dict[str, List[str]], valid_tags: Set[str]) -> Optional[str]:
-    """Find the best matching tag from a keyword map."""
-    text_lower = normalize_text(text)
-    scores = {}
-
-    for tag, keywords in keyword_map.items():
-        if tag not in valid_tags:
-            continue
-        score = 0
-        for keyword in keywords:
-            if keyword.lower() in text_lower:
-                score += len(keyword.split())
-        if score > 0:
-            scores[tag] = score
-
-    if scores:
-        return max(scores, key=scores.get)
-    return None
-
-def find_multiple_tags(text: str, keyword_map: Dict[str, List[str]], valid_tags: Set[str],
-                       exclude: Set[str] = None, limit: int = 3) -> List[str]:
-    """Find multiple matching tags, excluding already-used ones."""
-    if exclude is None:
-        exclude = set()
-
-    text_lower = normalize_text(text)
-    scores = {}
-
-    for tag, keywords in keyword_map.items():
-        if tag not in valid_tags or tag in exclude:
-            continue
-        score = 0
-        for keyword in keywords:
-            if keyword.lower() in text_lower:
-                score += len(keyword.split())
-        if score > 0:
-            scores[tag] = score
-
-    sorted_tags = sorted(scores.keys(), key=lambda t: scores[t], reverse=True)
-    return sorted_tags[:limit]
-
 # =============================================================================
 # MAIN TAGGING LOGIC
 # =============================================================================
 
+def chapter_text(book_name: str, chapter_name: str, topics: List[str]) -> MatchText:
+    """All the text a chapter is tagged from, split into words once."""
+    topics_text = " ".join(topics) if topics else ""
+    return MatchText(f"{book_name} {chapter_name} {topics_text}")
+
 def generate_tags(library_type: str, book_name: str, chapter_name: str,
-                  topics: List[str], valid_tags: Dict[str, Set[str]]) -> List[str]:
-    """Generate 4 diverse tags for a chapter."""
+                  topics: List[str], valid_tags: Dict[str, Set[str]],
+                  scores: Optional[Dict[str, Dict[str, float]]] = None) -> List[str]:
+    """Generate 4 diverse tags for a chapter.
 
-    # Combine all text for matching
-    topics_text = " ".join(topics) if topics else ""
-    combined_text = f"{book_name} {chapter_name} {topics_text}"
+    `scores` ({tier: {tag: score}}, e.g. from TfidfScorer) replaces the
+    default keyword-count scoring when given.
+    """
+
+    # Combine all text for matching, split it into words once and score every tier
+    if scores is None:
+        combined_text = chapter_text(book_name, chapter_name, topics)
+        scores = {tier: keyword_matcher(rules).scores(combined_text)
+                  for tier, rules in TIER_KEYWORDS.items()}
 
     used_tags: Set[str] = set()
     final_tags: List[str] = []
 
     # TAG 1: Broad domain tag
-    broad_tag = find_best_tag(combined_text, BROAD_TAG_KEYWORDS, valid_tags["broad"])
+    broad_tag = find_best_tag(scores["broad"], valid_tags["broad"])
     if not broad_tag:
         type_to_broad = {
             "geography": "geography",
@@ -267,7 +255,7 @@ def generate_tags(library_type: str, book_name: str, chapter_name: str,
     used_tags.add(broad_tag)
 
     # TAG 2: Medium conceptual lens
-    medium_tag = find_best_tag(combined_text, MEDIUM_TAG_KEYWORDS, valid_tags["medium"])
+    medium_tag = find_best_tag(scores["medium"], valid_tags["medium"])
     if medium_tag and medium_tag not in used_tags:
         final_tags.append(medium_tag)
         used_tags.add(medium_tag)
@@ -286,13 +274,13 @@ def generate_tags(library_type: str, book_name: str, chapter_name: str,
         used_tags.add(fallback)
 
     # TAG 3: Specific tag
-    specific_tag = find_best_tag(combined_text, SPECIFIC_TAG_KEYWORDS, valid_tags["specific"])
+    specific_tag = find_best_tag(scores["specific"], valid_tags["specific"])
     if specific_tag and specific_tag not in used_tags:
         final_tags.append(specific_tag)
         used_tags.add(specific_tag)
     else:
         # Try another medium tag
-        medium_alts = find_multiple_tags(combined_text, MEDIUM_TAG_KEYWORDS, valid_tags["medium"], used_tags)
+        medium_alts = find_multiple_tags(scores["medium"], valid_tags["medium"], used_tags)
         if medium_alts:
             final_tags.append(medium_alts[0])
             used_tags.add(medium_alts[0])
@@ -301,7 +289,7 @@ def generate_tags(library_type: str, book_name: str, chapter_name: str,
             used_tags.add("methodology")
 
     # TAG 4: Another specific or cross-library tag
-    specific_alts = find_multiple_tags(combined_text, SPECIFIC_TAG_KEYWORDS, valid_tags["specific"], used_tags)
+    specific_alts = find_multiple_tags(scores["specific"], valid_tags["specific"], used_tags)
     if specific_alts:
         final_tags.append(specific_alts[0])
         used_tags.add(specific_alts[0])
@@ -327,43 +315,169 @@ def generate_tags(library_type: str, book_name: str, chapter_name: str,
 # MAIN PROCESSING
 # =============================================================================
 
-def process_book(file_path: str, dry_run: bool = False) -> int:
-    """Process a standalone book file and add tags to all chapters."""
-    vocabulary = load_tag_vocabulary()
-    valid_tags = get_valid_tags(vocabulary)
+# Book files handed to each worker process at a time
+BOOK_CHUNKSIZE = 16
+
+
+def process_book(file_path: str, dry_run: bool = False,
+                 valid_tags: Optional[Dict[str, Set[str]]] = None,
+                 cache: Optional[TagCache] = None,
+                 scorer: Optional[TfidfScorer] = None) -> Tuple[int, Dict[str, int]]:
+    """Process a standalone book file and add tags to all chapters.
+
+    Chapters whose inputs are in `cache` take their tags from it, and the
+    file is only rewritten if some chapter's tags changed. With a `scorer`,
+    the remaining chapters are scored by TF-IDF in one batch. Returns the
+    number of chapters tagged and how often each tag was used.
+    """
+    if valid_tags is None:
+        valid_tags = get_valid_tags(load_tag_vocabulary())
     library_type = detect_library_type(file_path)
 
     print(f"\nProcessing: {file_path}")
     print(f"Library type: {library_type}")
 
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = read_json(file_path)
 
     book_name = data.get("name", "Unknown")
     chapters_tagged = 0
+    chapters_cached = 0
+    chapters_changed = 0
+    tag_distribution: Dict[str, int] = {}
 
+    scoring = ("tfidf", scorer.version) if scorer else ("keywords",)
+
+    # Tags of chapters whose inputs were tagged before, None for the rest
+    entries = []
     for chapter in data.get("chapters", []):
+        key = cache.key(library_type, book_name, chapter.get("name", ""),
+                        chapter.get("topics", []), *scoring) if cache else None
+        entries.append((chapter, key, cache.get(key) if cache else None))
+
+    # Score every chapter still to tag in one batch
+    batch_scores = {}
+    if scorer:
+        pending = [i for i, entry in enumerate(entries) if entry[2] is None]
+        texts = [chapter_text(book_name, entries[i][0].get("name", ""), entries[i][0].get("topics", []))
+                 for i in pending]
+        batch_scores = dict(zip(pending, scorer.score(texts)))
+
+    for i, (chapter, key, new_tags) in enumerate(entries):
         chapter_name = chapter.get("name", "")
         topics = chapter.get("topics", [])
 
-        new_tags = generate_tags(library_type, book_name, chapter_name, topics, valid_tags)
+        if new_tags is None:
+            new_tags = generate_tags(library_type, book_name, chapter_name, topics, valid_tags,
+                                     batch_scores.get(i))
+            if cache:
+                cache.put(key, new_tags)
+        else:
+            chapters_cached += 1
+
+        for tag in new_tags:
+            tag_distribution[tag] = tag_distribution.get(tag, 0) + 1
 
         if dry_run:
             print(f"  {chapter_name}")
             print(f"    -> {new_tags}")
-        else:
+        elif chapter.get("tags") != new_tags:
             chapter["tags"] = new_tags
+            chapters_changed += 1
 
         chapters_tagged += 1
 
-    if not dry_run:
+    if cache:
+        print(f"Cached: {chapters_cached} of {chapters_tagged} chapters")
+    if dry_run:
+        print(f"Dry run: {chapters_tagged} chapters would be tagged")
+    elif chapters_changed:
         with open(file_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
-        print(f"Saved: {chapters_tagged} chapters tagged")
+        print(f"Saved: {chapters_tagged} chapters tagged, {chapters_changed} changed")
     else:
-        print(f"Dry run: {chapters_tagged} chapters would be tagged")
+        print(f"Unchanged: {chapters_tagged} chapters already tagged, file not rewritten")
+
+    return chapters_tagged, tag_distribution
+
+def find_all_books() -> List[str]:
+    """Find all standalone book JSON files to process."""
+    books = []
 
-    return chapters_tagged
+    for json_file, _, _, _ in walk_library_files():
+        # Skip inventory and other meta files
+        name = json_file.name.lower()
+        if "inventory" in name or "questions" in name or "bare" in name:
+            continue
+        if not is_legacy_library(json_file):
+            books.append(str(json_file))
+
+    return sorted(books)
+
+def catalog_idf(dry_run: bool = False):
+    """IDF of every tier keyword, learned from all chapters of the catalog.
+
+    A dry run reads the catalog from JSON and leaves its snapshot alone.
+    """
+    catalog = load_catalog(with_topics=True, snapshot_path=None if dry_run else SNAPSHOT_PATH)
+    texts = [chapter_text(book.name, chapter.name, chapter.topics)
+             for library in catalog.values()
+             for shelf in library.shelves.values()
+             for book in shelf.books
+             for chapter in book.chapters]
+    print(f"Learning keyword IDF from {len(texts)} catalog chapters")
+    return learn_idf(TIER_KEYWORDS, texts)
+
+# Vocabulary, tag cache and TF-IDF scorer loaded once per worker process by init_worker()
+_worker_valid_tags: Optional[Dict[str, Set[str]]] = None
+_worker_cache: Optional[TagCache] = None
+_worker_scorer: Optional[TfidfScorer] = None
+
+
+def init_worker(use_cache: bool = True, idf=None):
+    """Load the vocabulary, tag cache and keyword matchers once per process.
+
+    `idf` ({tier: array}, from catalog_idf() in the main process) switches
+    the worker to TF-IDF scoring.
+    """
+    global _worker_valid_tags, _worker_cache, _worker_scorer
+    _worker_valid_tags = get_valid_tags(load_tag_vocabulary())
+    _worker_cache = TagCache.for_tagger(__file__, TAG_VOCABULARY_PATH) if use_cache else None
+    for rules in TIER_KEYWORDS.values():
+        keyword_matcher(rules)
+    _worker_scorer = TfidfScorer(TIER_KEYWORDS, idf, _worker_valid_tags) if idf is not None else None
+
+
+def tag_book_file(task: Tuple[str, bool]) -> Tuple[str, int, Dict[str, int], Dict]:
+    """Pool task: tag one book file, returning its report, tag counts and new cache entries."""
+    file_path, dry_run = task
+    report = io.StringIO()
+    with redirect_stdout(report):
+        tagged, distribution = process_book(file_path, dry_run, _worker_valid_tags,
+                                            _worker_cache, _worker_scorer)
+    added = _worker_cache.take_added() if _worker_cache else {}
+    return report.getvalue(), tagged, distribution, added
+
+
+def tag_books(books: List[str], dry_run: bool, jobs: int, use_cache: bool = True, idf=None):
+    """Tag book files, on `jobs` processes, yielding results in file order.
+
+    Each result is (report, chapters tagged, tag distribution, new cache
+    entries); a worker's report is printed only when its file is done, so
+    the output reads the same whatever the number of processes.
+    """
+    if jobs <= 1 or len(books) <= 1:
+        init_worker(use_cache, idf)
+        for file_path in books:
+            tagged, distribution = process_book(file_path, dry_run, _worker_valid_tags,
+                                                _worker_cache, _worker_scorer)
+            added = _worker_cache.take_added() if _worker_cache else {}
+            yield "", tagged, distribution, added
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                             initargs=(use_cache, idf)) as pool:
+        yield from pool.map(tag_book_file, [(path, dry_run) for path in books],
+                            chunksize=BOOK_CHUNKSIZE)
 
 def main():
     if len(sys.argv) < 2:
@@ -371,22 +485,66 @@ def main():
         sys.exit(1)
 
     dry_run = "--dry-run" in sys.argv
-    args = [a for a in sys.argv[1:] if not a.startswith("--")]
-
-    if not args:
-        print("Error: No file specified")
-        sys.exit(1)
-
-    file_path = args[0]
-
-    if not os.path.exists(file_path):
-        print(f"File not found: {file_path}")
-        sys.exit(1)
-
-    tagged = process_book(file_path, dry_run)
+    use_cache = "--no-cache" not in sys.argv
+    tfidf = "--tfidf" in sys.argv
+    jobs = os.cpu_count() or 1
+    args = []
+    argv = iter(sys.argv[1:])
+    for arg in argv:
+        if arg == "--jobs":
+            jobs = int(next(argv, "1"))
+        elif arg.startswith("--jobs="):
+            jobs = int(arg.split("=", 1)[1])
+        elif not arg.startswith("--"):
+            args.append(arg)
+
+    if "--all" in sys.argv:
+        books = find_all_books()
+        print(f"Found {len(books)} books to process")
+    else:
+        if not args:
+            print("Error: No file specified")
+            sys.exit(1)
+
+        file_path = args[0]
+
+        if not os.path.exists(file_path):
+            print(f"File not found: {file_path}")
+            sys.exit(1)
+
+        books = [file_path]
+
+    idf = None
+    if tfidf:
+        if not HAS_NUMPY:
+            print("Error: --tfidf needs NumPy (pip install numpy)")
+            sys.exit(1)
+        idf = catalog_idf(dry_run)
+
+    total_tagged = 0
+    total_distribution: Dict[str, int] = {}
+    cache_added = {}
+    for report, tagged, distribution, added in tag_books(books, dry_run, jobs, use_cache, idf):
+        print(report, end="")
+        cache_added.update(added)
+        total_tagged += tagged
+        for tag, count in distribution.items():
+            total_distribution[tag] = total_distribution.get(tag, 0) + count
 
     print(f"\n{'=' * 60}")
-    print(f"Done! {'Would tag' if dry_run else 'Tagged'} {tagged} chapters.")
+    print(f"Done! {'Would tag' if dry_run else 'Tagged'} {total_tagged} chapters.")
+
+    # Workers only read the cache; their new entries are saved here, once
+    if cache_added and not dry_run:
+        cache = TagCache.for_tagger(__file__, TAG_VOCABULARY_PATH)
+        cache.update(cache_added)
+        cache.save()
+
+    if len(books) > 1 and total_distribution:
+        print(f"Tag diversity across all books: {len(total_distribution)} unique tags")
+        print("Top 20 tags:")
+        for tag, count in sorted(total_distribution.items(), key=lambda x: (-x[1], x[0]))[:20]:
+            print(f"  {tag}: {count}")
 
 if __name__ == "__main__":
     main()
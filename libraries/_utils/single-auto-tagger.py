@@ -10,7 +10,7 @@ Usage:
 import json
 import os
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 # Import all the tagging logic from auto-tagger
 from pathlib import Path
@@ -19,6 +19,12 @@ import sys
 # Add parent directory to path for imports
 SCRIPT_DIR = Path(__file__).parent
 
+import _paths  # noqa: F401 - puts tools/ on sys.path
+from quarex_catalog import read_json, walk_library_files
+from quarex_json_stream import is_legacy_library
+from quarex_tag_cache import TagCache
+from quarex_tag_matcher import MatchText, keyword_matcher
+
 # =============================================================================
 # CONFIGURATION (copied from auto-tagger.py)
 # =============================================================================
@@ -108,29 +114,29 @@ ANCHOR_TAGS = {
 
 GEOGRAPHY_DIFFERENTIATORS = {
     "history": {
-        "ancient-history": ["peru", "mexico", "egypt", "china", "india", "greece", "italy", "iraq", "iran", "turkey", "guatemala", "bolivia"],
-        "cold-war": ["chile", "cuba", "korea", "vietnam", "germany", "poland", "hungary", "czechoslovakia", "afghanistan"],
-        "migration": ["australia", "argentina", "uruguay", "usa", "united states", "canada", "new zealand", "brazil", "israel"],
-        "world-wars": ["germany", "japan", "poland", "france", "uk", "united kingdom", "russia", "austria"],
+        "ancient-history": ["peru*", "mexico", "egypt*", "china", "india", "greece", "italy", "iraq", "iran", "turkey", "guatemala*", "bolivia"],
+        "cold-war": ["chile*", "cuba*", "korea*", "vietnam", "germany", "poland", "hungary", "czechoslovakia", "afghanistan"],
+        "migration": ["australia", "argentina", "uruguay", "usa", "united states", "canada", "new zealand", "brazil", "israel*"],
+        "world-wars": ["germany", "japan*", "poland", "france", "uk", "united kingdom", "russia*", "austria"],
         "colonialism": [],
     },
     "government": {
-        "authoritarianism": ["venezuela", "china", "russia", "cuba", "north korea", "iran", "syria", "belarus", "myanmar", "eritrea", "turkmenistan"],
+        "authoritarianism": ["venezuela*", "china", "russia*", "cuba*", "north korea", "iran", "syria", "belarus", "myanmar", "eritrea", "turkmenistan"],
         "federalism": ["usa", "united states", "germany", "brazil", "india", "australia", "canada", "mexico", "argentina", "switzerland"],
         "human-rights": ["sweden", "norway", "denmark", "netherlands", "new zealand", "finland"],
         "democracy": [],
     },
     "national overview": {
-        "inequality": ["brazil", "south africa", "colombia", "mexico", "chile", "india"],
+        "inequality": ["brazil", "south africa", "colombia*", "mexico", "chile*", "india"],
         "development": ["china", "india", "vietnam", "ethiopia", "bangladesh", "indonesia"],
-        "migration": ["argentina", "uruguay", "australia", "usa", "united states", "canada", "israel"],
+        "migration": ["argentina", "uruguay", "australia", "usa", "united states", "canada", "israel*"],
         "globalization": ["singapore", "netherlands", "switzerland", "hong kong", "ireland", "belgium"],
         "sustainability": ["costa rica", "bhutan", "norway", "sweden", "denmark", "iceland"],
     },
     "travel": {
-        "cultural-heritage": ["italy", "france", "japan", "china", "india", "peru", "mexico", "egypt", "greece", "spain", "morocco"],
-        "sustainability": ["costa rica", "norway", "new zealand", "iceland", "bhutan", "galapagos", "ecuador"],
-        "infrastructure": ["usa", "united states", "japan", "germany", "uk", "united kingdom", "france", "australia", "canada"],
+        "cultural-heritage": ["italy", "france", "japan*", "china", "india", "peru*", "mexico", "egypt*", "greece", "spain", "morocco"],
+        "sustainability": ["costa rica", "norway", "new zealand", "iceland", "bhutan", "galapagos", "ecuador*"],
+        "infrastructure": ["usa", "united states", "japan*", "germany", "uk", "united kingdom", "france", "australia", "canada"],
         "security": [],
     },
 }
@@ -138,10 +144,10 @@ GEOGRAPHY_DIFFERENTIATORS = {
 KNOWLEDGE_DIFFERENTIATORS = {
     "arts": {
         "visual-arts": ["painting", "sculpture", "drawing", "printmaking", "photography", "ceramics"],
-        "performing-arts": ["theater", "dance", "music", "opera", "ballet", "circus"],
+        "performing-arts": ["theater", "dance", "music*", "opera", "ballet", "circus"],
         "media-arts": ["film", "video", "digital", "animation", "gaming"],
         "literary-arts": ["poetry", "prose", "drama", "fiction", "novel", "essay"],
-        "architecture": ["architecture", "building", "design", "urban"],
+        "architecture": ["architecture", "building", "design*", "urban*"],
     },
     "science": {
         "natural-sciences": ["biology", "chemistry", "physics", "geology", "ecology"],
@@ -150,7 +156,7 @@ KNOWLEDGE_DIFFERENTIATORS = {
         "applied-sciences": ["engineering", "medicine", "technology"],
     },
     "philosophy": {
-        "ethics": ["ethics", "moral", "values", "virtue", "duty"],
+        "ethics": ["ethics", "moral*", "values", "virtue", "duty"],
         "epistemology": ["knowledge", "truth", "belief", "justification"],
         "metaphysics": ["reality", "existence", "being", "ontology"],
         "logic": ["logic", "reasoning", "argument", "fallacy"],
@@ -163,36 +169,36 @@ PERSPECTIVES_DIFFERENTIATORS = {
         "cognition": ["cognitive", "thinking", "mental", "brain", "psychological"],
         "bias": ["bias", "prejudice", "stereotype", "discrimination"],
         "social-dynamics": ["social", "group", "conformity", "peer"],
-        "media-literacy": ["media", "news", "source", "information"],
+        "media-literacy": ["media", "news*", "source", "information"],
     },
     "debate": {
         "human-rights": ["rights", "freedom", "liberty", "equality"],
-        "climate-change": ["climate", "environment", "carbon", "warming"],
+        "climate-change": ["climate", "environment*", "carbon", "warming"],
         "security": ["security", "safety", "defense", "military"],
-        "economics": ["economic", "market", "trade", "fiscal"],
+        "economics": ["economic*", "market*", "trade", "fiscal"],
         "governance": ["government", "policy", "regulation", "law"],
     },
 }
 
 EVENT_DIFFERENTIATORS = {
     "conflict": {
-        "geopolitics": ["territorial", "border", "international", "power", "influence"],
+        "geopolitics": ["territorial", "border", "international", "power", "influence*"],
         "humanitarian": ["refugee", "civilian", "aid", "crisis", "humanitarian"],
-        "terrorism": ["terror", "extremist", "insurgent", "radical"],
+        "terrorism": ["terror*", "extremist", "insurgent", "radical*"],
         "diplomacy": ["negotiation", "treaty", "agreement", "talks"],
     },
     "political": {
-        "democracy": ["election", "vote", "democratic", "reform"],
-        "authoritarianism": ["authoritarian", "dictator", "regime", "crackdown"],
+        "democracy": ["election", "vote*", "democratic", "reform*"],
+        "authoritarianism": ["authoritarian*", "dictator*", "regime", "crackdown"],
         "activism": ["protest", "movement", "activist", "uprising"],
     },
 }
 
 REGION_TAGS = {
-    "americas": ["argentina", "bolivia", "brazil", "canada", "chile", "colombia", "costa rica",
-                 "cuba", "dominican republic", "ecuador", "el salvador", "guatemala", "haiti",
-                 "honduras", "mexico", "nicaragua", "panama", "paraguay", "peru", "puerto rico",
-                 "uruguay", "usa", "united states", "venezuela", "jamaica", "trinidad", "guyana",
+    "americas": ["argentina", "bolivia", "brazil", "canada", "chile*", "colombia*", "costa rica",
+                 "cuba*", "dominican republic", "ecuador*", "el salvador", "guatemala*", "haiti",
+                 "honduras", "mexico", "nicaragua*", "panama", "paraguay", "peru*", "puerto rico",
+                 "uruguay", "usa", "united states", "venezuela*", "jamaica", "trinidad", "guyana",
                  "suriname", "belize", "bahamas", "barbados", "antigua", "grenada", "saint"],
     "europe": ["albania", "austria", "belgium", "bosnia", "bulgaria", "croatia", "czech",
                "denmark", "estonia", "finland", "france", "germany", "greece", "hungary",
@@ -200,15 +206,15 @@ REGION_TAGS = {
                "netherlands", "norway", "poland", "portugal", "romania", "serbia", "slovakia",
                "slovenia", "spain", "sweden", "switzerland", "uk", "united kingdom", "ukraine"],
     "asia": ["afghanistan", "bangladesh", "bhutan", "cambodia", "china", "india", "indonesia",
-             "japan", "kazakhstan", "korea", "laos", "malaysia", "mongolia", "myanmar", "nepal",
+             "japan*", "kazakhstan", "korea*", "laos", "malaysia", "mongolia", "myanmar", "nepal",
              "pakistan", "philippines", "singapore", "sri lanka", "taiwan", "thailand", "vietnam"],
-    "africa": ["algeria", "angola", "botswana", "cameroon", "congo", "egypt", "ethiopia",
+    "africa": ["algeria", "angola", "botswana", "cameroon", "congo", "egypt*", "ethiopia",
                "ghana", "kenya", "libya", "madagascar", "mali", "morocco", "mozambique",
                "namibia", "nigeria", "rwanda", "senegal", "somalia", "south africa", "sudan",
                "tanzania", "tunisia", "uganda", "zambia", "zimbabwe"],
     "oceania": ["australia", "fiji", "kiribati", "marshall", "micronesia", "nauru", "new zealand",
                 "palau", "papua", "samoa", "solomon", "tonga", "tuvalu", "vanuatu"],
-    "middle-east": ["bahrain", "iran", "iraq", "israel", "jordan", "kuwait", "lebanon",
+    "middle-east": ["bahrain", "iran", "iraq", "israel*", "jordan", "kuwait", "lebanon",
                     "oman", "palestine", "qatar", "saudi", "syria", "turkey", "uae", "yemen"],
 }
 
@@ -216,25 +222,129 @@ SUBJECT_TAGS = {
     "painting": ["painting", "painter", "oil", "watercolor", "acrylic", "canvas"],
     "sculpture": ["sculpture", "sculptor", "carving", "bronze", "marble", "clay"],
     "photography": ["photography", "photographer", "camera", "lens", "exposure"],
-    "music": ["music", "musician", "composer", "symphony", "orchestra"],
+    "music": ["music*", "musician", "composer", "symphony", "orchestra"],
     "theater": ["theater", "theatre", "drama", "stage", "playwright"],
     "film": ["film", "cinema", "movie", "director", "screenplay"],
-    "dance": ["dance", "dancer", "choreograph", "ballet"],
-    "architecture": ["architecture", "architect", "building", "structure"],
+    "dance": ["dance", "dancer", "choreograph*", "ballet"],
+    "architecture": ["architecture", "architect*", "building", "structure"],
     "drawing": ["drawing", "sketch", "pencil", "charcoal"],
-    "printmaking": ["print", "etching", "lithograph", "woodcut"],
+    "printmaking": ["print*", "etching", "lithograph", "woodcut"],
     "digital-art": ["digital art", "computer art", "generative", "nft"],
-    "biology": ["biology", "organism", "cell", "genetics", "evolution"],
+    "biology": ["biology", "organism", "cell", "genetics", "evolution*"],
     "physics": ["physics", "quantum", "relativity", "particle", "mechanics"],
     "chemistry": ["chemistry", "chemical", "molecule", "reaction", "element"],
     "psychology": ["psychology", "psychological", "cognitive", "behavior"],
     "sociology": ["sociology", "social", "society", "community"],
     "philosophy": ["philosophy", "philosophical", "philosopher"],
-    "ethics": ["ethics", "ethical", "moral", "morality"],
+    "ethics": ["ethics", "ethical", "moral*", "morality"],
     "logic": ["logic", "logical", "reasoning", "argument"],
     "cooking": ["cooking", "recipe", "kitchen", "culinary", "food"],
     "personal-finance": ["finance", "budget", "invest", "saving", "money"],
-    "travel": ["travel", "tourism", "tourist", "visitor", "destination"],
+    "travel": ["travel*", "tourism", "tourist", "visitor", "destination"],
+}
+
+# Ordered rule tables for the chains below: the first label with a
+# matching keyword wins. A trailing * marks a stem (see quarex_tag_matcher).
+
+CHAPTER_TYPE_RULES = {
+    "national overview": ["national overview", "overview", "about", "introduction"],
+    "history": ["history", "historical*", "timeline", "origins"],
+    "government": ["government", "political", "politics", "governance"],
+    "travel": ["travel*", "tourism", "visiting", "destinations"],
+    "culture": ["culture", "cultural", "traditions", "customs"],
+    "economy": ["economy", "economic*", "trade", "industry"],
+    "techniques": ["technique", "method", "how to", "process*"],
+    "theory": ["theory", "concept*", "principle", "fundamental*"],
+    "movements": ["movement", "period", "era", "school of"],
+    "biography": ["biography", "life of", "artist*", "composer"],
+    "bias": ["bias", "cognitive", "fallacy", "thinking error"],
+    "logic": ["logic", "reasoning", "argument", "critical"],
+    "media": ["media", "news*", "source", "information"],
+    "debate": ["debate", "controversy", "perspective", "viewpoint"],
+    "conflict": ["conflict", "war", "battle*", "military"],
+    "humanitarian": ["humanitarian", "refugee", "aid", "crisis"],
+    "senate": ["senate"],
+    "house": ["house"],
+    "governor": ["governor"],
+    "architecture": ["architecture", "design*", "structure"],
+    "operations": ["operation*", "running", "management"],
+    "security": ["security", "protection", "safety"],
+    "failure": ["failure", "risk", "incident", "outage"],
+}
+
+KNOWLEDGE_BROAD_RULES = {
+    "arts": ["art", "paint*", "sculpt*", "music*", "theater", "film", "dance"],
+    "science": ["science", "physics", "chemistry", "biology", "math*"],
+    "philosophy": ["philosophy", "ethics", "logic", "epistemology"],
+    "history": ["history", "historical*"],
+    "technology": ["technology", "computer", "software", "ai", "robot"],
+}
+
+INFRASTRUCTURE_DIFFERENTIATORS = {
+    "sustainability": ["energy", "power", "cooling"],
+    "security": ["security", "protection"],
+    "accountability": ["redundan*", "failover", "backup"],
+}
+
+CURRENT_EVENT_TAGS = {
+    "russia-ukraine": ["ukraine", "russia*", "kremlin", "putin", "kyiv", "moscow"],
+    "israel-palestine": ["israel*", "palestine", "gaza", "hamas", "netanyahu", "west bank"],
+    "china-taiwan": ["taiwan", "china", "strait", "beijing", "taipei", "ccp"],
+    "nato": ["nato", "atlantic", "alliance"],
+    "trump": ["trump", "maga", "january 6", "jan 6"],
+    "climate-science": ["climate", "carbon", "warming", "emission", "green"],
+    "immigration": ["immigration", "border", "migrant", "refugee", "asylum"],
+    "policing": ["police", "policing", "criminal justice", "incarceration"],
+    "journalism": ["media", "news*", "journalism", "press", "misinformation"],
+    "civil-rights": ["speech", "censorship", "expression", "first amendment",
+                     "equality", "civil rights", "discrimination", "race", "gender*"],
+    "economics-theory": ["economic*", "economy", "trade", "fiscal", "monetary"],
+    "technology": ["technology", "digital", "ai", "algorithm*", "platform"],
+}
+
+CROSS_LIBRARY_TAGS = {
+    "physics": ["physics", "electromagnetic", "thermodynamic", "frequency",
+                "voltage", "inertia", "fusion", "fission", "superconducting"],
+    "chemistry": ["battery", "lithium", "chemical", "hydrogen"],
+    "climate-science": ["climate", "carbon", "renewable", "fossil", "emission",
+                        "wildfire", "weather", "flood", "hurricane"],
+    "security": ["cyber*", "security", "attack*", "failure", "outage",
+                 "blackout", "resilience", "reliability", "nuclear"],
+    "ai-ml": ["ai", "machine learning", "digital twin", "predictive",
+              "smart grid", "algorithm*", "forecast"],
+    "economics-theory": ["market*", "economic*", "dispatch", "cost", "pricing",
+                         "trading", "net metering", "subsidy"],
+    "governance": ["policy", "regulation", "political", "cross-border",
+                   "permitting", "coordination"],
+    "human-rights": ["indigenous", "community", "social", "land rights",
+                     "consultation", "equity"],
+    "development": ["global*", "inequality", "developing", "rural",
+                    "remote", "access", "electrification"],
+    "architecture": ["architecture", "design*", "substation", "topology",
+                     "urban*", "building", "infrastructure"],
+    "data-centers": ["data center", "backup", "ups", "power quality"],
+    "psychology": ["human factors", "operator", "decision", "training"],
+    "ethics": ["ethical", "philosophical", "equity", "progress"],
+}
+
+INFRASTRUCTURE_LIBRARY_TAGS = {
+    "energy": ["power", "energy", "electrical", "grid", "transmission"],
+    "data-centers": ["data center", "server", "cooling"],
+}
+
+KNOWLEDGE_LIBRARY_TAGS = {
+    "visual-arts": ["art", "paint*", "sculpt*", "music*", "theater", "film", "dance", "visual"],
+    "science": ["physics", "chemistry", "biology", "science"],
+    "philosophy": ["philosophy", "ethics", "logic"],
+    "ai-ml": ["ai", "artificial intelligence", "machine learning", "robot"],
+    "technology": ["software", "programming", "computer", "technology"],
+    "history": ["history", "historical*"],
+}
+
+PRACTICAL_LIBRARY_TAGS = {
+    "personal-finance": ["finance", "money", "budget", "invest"],
+    "security": ["safety", "security", "fact-check"],
+    "technology": ["git", "software", "programming"],
 }
 
 
@@ -260,59 +370,9 @@ def detect_library_type(file_path: str) -> str:
                 return lib_type
     return "knowledge"
 
-def normalize_text(text: str) -> str:
-    return text.lower().strip()
-
 def get_chapter_type(chapter_name: str, book_name: str = "") -> str:
-    combined = normalize_text(f"{chapter_name} {book_name}")
-
-    if any(kw in combined for kw in ["national overview", "overview", "about", "introduction"]):
-        return "national overview"
-    if any(kw in combined for kw in ["history", "historical", "timeline", "origins"]):
-        return "history"
-    if any(kw in combined for kw in ["government", "political", "politics", "governance"]):
-        return "government"
-    if any(kw in combined for kw in ["travel", "tourism", "visiting", "destinations"]):
-        return "travel"
-    if any(kw in combined for kw in ["culture", "cultural", "traditions", "customs"]):
-        return "culture"
-    if any(kw in combined for kw in ["economy", "economic", "trade", "industry"]):
-        return "economy"
-    if any(kw in combined for kw in ["technique", "method", "how to", "process"]):
-        return "techniques"
-    if any(kw in combined for kw in ["theory", "concept", "principle", "fundamental"]):
-        return "theory"
-    if any(kw in combined for kw in ["movement", "period", "era", "school of"]):
-        return "movements"
-    if any(kw in combined for kw in ["biography", "life of", "artist", "composer"]):
-        return "biography"
-    if any(kw in combined for kw in ["bias", "cognitive", "fallacy", "thinking error"]):
-        return "bias"
-    if any(kw in combined for kw in ["logic", "reasoning", "argument", "critical"]):
-        return "logic"
-    if any(kw in combined for kw in ["media", "news", "source", "information"]):
-        return "media"
-    if any(kw in combined for kw in ["debate", "controversy", "perspective", "viewpoint"]):
-        return "debate"
-    if any(kw in combined for kw in ["conflict", "war", "battle", "military"]):
-        return "conflict"
-    if any(kw in combined for kw in ["humanitarian", "refugee", "aid", "crisis"]):
-        return "humanitarian"
-    if "senate" in combined:
-        return "senate"
-    if "house" in combined:
-        return "house"
-    if "governor" in combined:
-        return "governor"
-    if any(kw in combined for kw in ["architecture", "design", "structure"]):
-        return "architecture"
-    if any(kw in combined for kw in ["operation", "running", "management"]):
-        return "operations"
-    if any(kw in combined for kw in ["security", "protection", "safety"]):
-        return "security"
-    if any(kw in combined for kw in ["failure", "risk", "incident", "outage"]):
-        return "failure"
-    return "default"
+    text = MatchText(f"{chapter_name} {book_name}")
+    return keyword_matcher(CHAPTER_TYPE_RULES).first(text) or "default"
 
 
 # =============================================================================
@@ -321,18 +381,8 @@ def get_chapter_type(chapter_name: str, book_name: str = "") -> str:
 
 def get_broad_tag(library_type: str, shelf_name: str, book_name: str, valid_tags: Dict) -> str:
     if library_type == "knowledge":
-        combined = normalize_text(f"{shelf_name} {book_name}")
-        if any(kw in combined for kw in ["art", "paint", "sculpt", "music", "theater", "film", "dance"]):
-            return "arts"
-        if any(kw in combined for kw in ["science", "physics", "chemistry", "biology", "math"]):
-            return "science"
-        if any(kw in combined for kw in ["philosophy", "ethics", "logic", "epistemology"]):
-            return "philosophy"
-        if any(kw in combined for kw in ["history", "historical"]):
-            return "history"
-        if any(kw in combined for kw in ["technology", "computer", "software", "ai", "robot"]):
-            return "technology"
-        return "education"
+        text = MatchText(f"{shelf_name} {book_name}")
+        return keyword_matcher(KNOWLEDGE_BROAD_RULES).first(text) or "education"
     if library_type == "perspectives":
         return "philosophy"
     if library_type == "event":
@@ -350,15 +400,14 @@ def get_anchor_tag(library_type: str, chapter_type: str, valid_tags: Dict) -> st
 
 def get_differentiator_tag(library_type: str, chapter_type: str, book_name: str,
                            chapter_name: str, valid_tags: Dict) -> str:
-    combined = normalize_text(f"{book_name} {chapter_name}")
+    text = MatchText(f"{book_name} {chapter_name}")
+    allowed = set(valid_tags["medium"]) | set(valid_tags["specific"])
 
     if library_type == "geography":
-        diff_rules = GEOGRAPHY_DIFFERENTIATORS.get(chapter_type, {})
-        for tag, countries in diff_rules.items():
-            for country in countries:
-                if country.lower() in combined:
-                    if tag in valid_tags["medium"] or tag in valid_tags["specific"]:
-                        return tag
+        diff_rules = GEOGRAPHY_DIFFERENTIATORS.get(chapter_type)
+        tag = keyword_matcher(diff_rules).first(text, allowed) if diff_rules else None
+        if tag:
+            return tag
         if chapter_type == "history":
             return "colonialism"
         if chapter_type == "government":
@@ -370,97 +419,52 @@ def get_differentiator_tag(library_type: str, chapter_type: str, book_name: str,
         return "cultural-heritage"
 
     if library_type == "knowledge":
-        for tag, keywords in KNOWLEDGE_DIFFERENTIATORS.get("arts", {}).items():
-            if any(kw in combined for kw in keywords):
-                if tag in valid_tags["medium"] or tag in valid_tags["specific"]:
-                    return tag
-        for tag, keywords in KNOWLEDGE_DIFFERENTIATORS.get("philosophy", {}).items():
-            if any(kw in combined for kw in keywords):
-                if tag in valid_tags["medium"] or tag in valid_tags["specific"]:
-                    return tag
+        for category in ["arts", "philosophy"]:
+            tag = keyword_matcher(KNOWLEDGE_DIFFERENTIATORS[category]).first(text, allowed)
+            if tag:
+                return tag
         return "innovation"
 
     if library_type == "perspectives":
-        for category, rules in PERSPECTIVES_DIFFERENTIATORS.items():
-            for tag, keywords in rules.items():
-                if any(kw in combined for kw in keywords):
-                    if tag in valid_tags["medium"] or tag in valid_tags["specific"]:
-                        return tag
+        for rules in PERSPECTIVES_DIFFERENTIATORS.values():
+            tag = keyword_matcher(rules).first(text, allowed)
+            if tag:
+                return tag
         return "critical-thinking"
 
     if library_type == "event":
-        for category, rules in EVENT_DIFFERENTIATORS.items():
-            for tag, keywords in rules.items():
-                if any(kw in combined for kw in keywords):
-                    if tag in valid_tags["medium"] or tag in valid_tags["specific"]:
-                        return tag
+        for rules in EVENT_DIFFERENTIATORS.values():
+            tag = keyword_matcher(rules).first(text, allowed)
+            if tag:
+                return tag
         return "geopolitics"
 
     if library_type == "candidate":
         return "federalism"
 
     if library_type == "infrastructure":
-        if any(kw in combined for kw in ["energy", "power", "cooling"]):
-            return "sustainability"
-        if any(kw in combined for kw in ["security", "protection"]):
-            return "security"
-        if any(kw in combined for kw in ["redundan", "failover", "backup"]):
-            return "accountability"
-        return "innovation"
+        return keyword_matcher(INFRASTRUCTURE_DIFFERENTIATORS).first(text) or "innovation"
 
     return "identity"
 
 def get_specific_tag(library_type: str, book_name: str, chapter_name: str,
                      shelf_name: str, library_name: str, valid_tags: Dict) -> str:
-    combined = normalize_text(f"{book_name} {chapter_name} {shelf_name} {library_name}")
+    text = MatchText(f"{book_name} {chapter_name} {shelf_name} {library_name}")
 
     if library_type == "geography":
-        for region, countries in REGION_TAGS.items():
-            for country in countries:
-                if country.lower() in combined:
-                    return region
-        return "geography"
+        return keyword_matcher(REGION_TAGS).first(text) or "geography"
 
     if library_type in ["perspectives", "event"]:
-        if any(kw in combined for kw in ["ukraine", "russia", "kremlin", "putin", "kyiv", "moscow"]):
-            return "russia-ukraine"
-        if any(kw in combined for kw in ["israel", "palestine", "gaza", "hamas", "netanyahu", "west bank"]):
-            return "israel-palestine"
-        if any(kw in combined for kw in ["taiwan", "china", "strait", "beijing", "taipei", "ccp"]):
-            return "china-taiwan"
-        if any(kw in combined for kw in ["nato", "atlantic", "alliance"]):
-            return "nato"
-        if any(kw in combined for kw in ["trump", "maga", "january 6", "jan 6"]):
-            return "trump"
-        if any(kw in combined for kw in ["climate", "carbon", "warming", "emission", "green"]):
-            return "climate-science"
-        if any(kw in combined for kw in ["immigration", "border", "migrant", "refugee", "asylum"]):
-            return "immigration"
-        if any(kw in combined for kw in ["police", "policing", "criminal justice", "incarceration"]):
-            return "policing"
-        if any(kw in combined for kw in ["media", "news", "journalism", "press", "misinformation"]):
-            return "journalism"
-        if any(kw in combined for kw in ["speech", "censorship", "expression", "first amendment"]):
-            return "civil-rights"
-        if any(kw in combined for kw in ["equality", "civil rights", "discrimination", "race", "gender"]):
-            return "civil-rights"
-        if any(kw in combined for kw in ["economic", "economy", "trade", "fiscal", "monetary"]):
-            return "economics-theory"
-        if any(kw in combined for kw in ["technology", "digital", "ai", "algorithm", "platform"]):
-            return "technology"
-        for region, countries in REGION_TAGS.items():
-            for country in countries:
-                if country.lower() in combined:
-                    return region
-        return "geopolitics"
+        return (keyword_matcher(CURRENT_EVENT_TAGS).first(text)
+                or keyword_matcher(REGION_TAGS).first(text)
+                or "geopolitics")
 
-    for tag, keywords in SUBJECT_TAGS.items():
-        if any(kw in combined for kw in keywords):
-            if tag in valid_tags["specific"]:
-                return tag
+    tag = keyword_matcher(SUBJECT_TAGS).first(text, valid_tags["specific"])
+    if tag:
+        return tag
 
     if library_type == "knowledge":
-        if "art" in combined:
+        if text.has_word("art"):
             return "visual-arts"
         return "art-history"
     if library_type == "practical":
@@ -476,68 +480,14 @@ def get_specific_tag(library_type: str, book_name: str, chapter_name: str,
 def get_cross_library_tag(library_type: str, book_name: str, chapter_name: str,
                           shelf_name: str, library_name: str, valid_tags: Dict) -> str:
     """Determine cross-library connector tag (Tag 4) - connects outward to other libraries."""
-    combined = normalize_text(f"{book_name} {chapter_name} {shelf_name} {library_name}")
-
-    # Physics connections
-    if any(kw in combined for kw in ["physics", "electromagnetic", "thermodynamic", "frequency",
-                                      "voltage", "inertia", "fusion", "fission", "superconducting"]):
-        return "physics"
-
-    # Chemistry connections
-    if any(kw in combined for kw in ["battery", "lithium", "chemical", "hydrogen"]):
-        return "chemistry"
-
-    # Climate/environment connections
-    if any(kw in combined for kw in ["climate", "carbon", "renewable", "fossil", "emission",
-                                      "wildfire", "weather", "flood", "hurricane"]):
-        return "climate-science"
-
-    # Security connections
-    if any(kw in combined for kw in ["cyber", "security", "attack", "failure", "outage",
-                                      "blackout", "resilience", "reliability", "nuclear"]):
-        return "security"
-
-    # AI/ML connections
-    if any(kw in combined for kw in ["ai", "machine learning", "digital twin", "predictive",
-                                      "smart grid", "algorithm", "forecast"]):
-        return "ai-ml"
-
-    # Economics connections
-    if any(kw in combined for kw in ["market", "economic", "dispatch", "cost", "pricing",
-                                      "trading", "net metering", "subsidy"]):
-        return "economics-theory"
-
-    # Governance/policy connections
-    if any(kw in combined for kw in ["policy", "regulation", "political", "cross-border",
-                                      "permitting", "coordination"]):
-        return "governance"
-
-    # Human rights connections
-    if any(kw in combined for kw in ["indigenous", "community", "social", "land rights",
-                                      "consultation", "equity"]):
-        return "human-rights"
-
-    # Development connections
-    if any(kw in combined for kw in ["global", "inequality", "developing", "rural",
-                                      "remote", "access", "electrification"]):
-        return "development"
-
-    # Architecture connections
-    if any(kw in combined for kw in ["architecture", "design", "substation", "topology",
-                                      "urban", "building", "infrastructure"]):
-        return "architecture"
+    text = MatchText(f"{book_name} {chapter_name} {shelf_name} {library_name}")
 
-    # Data centers connection
-    if any(kw in combined for kw in ["data center", "backup", "ups", "power quality"]):
-        return "data-centers"
-
-    # Psychology connections
-    if any(kw in combined for kw in ["human factors", "operator", "decision", "training"]):
-        return "psychology"
-
-    # Ethics connections
-    if any(kw in combined for kw in ["ethical", "philosophical", "equity", "progress"]):
-        return "ethics"
+    # Physics, chemistry, climate, security, AI, economics, governance, human
+    # rights, development, architecture, data center, psychology and ethics
+    # connections, in that order
+    tag = keyword_matcher(CROSS_LIBRARY_TAGS).first(text)
+    if tag:
+        return tag
 
     # Fallback by library type
     if library_type == "infrastructure":
@@ -558,50 +508,23 @@ def get_library_tag(library_type: str, shelf_name: str, book_name: str, library_
     This is the 'identity' tag that allows other libraries to discover this content.
     Returns the tag that best represents the library's domain.
     """
-    combined = normalize_text(f"{shelf_name} {book_name} {library_name}")
+    text = MatchText(f"{shelf_name} {book_name} {library_name}")
 
     # Infrastructure libraries
     if library_type == "infrastructure":
-        if any(kw in combined for kw in ["power", "energy", "electrical", "grid", "transmission"]):
-            return "energy"
-        if any(kw in combined for kw in ["data center", "server", "cooling"]):
-            return "data-centers"
-        return "technology"
+        return keyword_matcher(INFRASTRUCTURE_LIBRARY_TAGS).first(text) or "technology"
 
     # Knowledge libraries - return the subject area
     if library_type == "knowledge":
-        if any(kw in combined for kw in ["art", "paint", "sculpt", "music", "theater", "film", "dance", "visual"]):
-            return "visual-arts"
-        if any(kw in combined for kw in ["physics", "chemistry", "biology", "science"]):
-            return "science"
-        if any(kw in combined for kw in ["philosophy", "ethics", "logic"]):
-            return "philosophy"
-        if any(kw in combined for kw in ["ai", "artificial intelligence", "machine learning", "robot"]):
-            return "ai-ml"
-        if any(kw in combined for kw in ["software", "programming", "computer", "technology"]):
-            return "technology"
-        if any(kw in combined for kw in ["history", "historical"]):
-            return "history"
-        return "education"
+        return keyword_matcher(KNOWLEDGE_LIBRARY_TAGS).first(text) or "education"
 
-    # Geography libraries
+    # Geography libraries - the region
     if library_type == "geography":
-        # Check for region
-        for region, countries in REGION_TAGS.items():
-            for country in countries:
-                if country.lower() in combined:
-                    return region
-        return "geography"
+        return keyword_matcher(REGION_TAGS).first(text) or "geography"
 
     # Practical libraries
     if library_type == "practical":
-        if any(kw in combined for kw in ["finance", "money", "budget", "invest"]):
-            return "personal-finance"
-        if any(kw in combined for kw in ["safety", "security", "fact-check"]):
-            return "security"
-        if any(kw in combined for kw in ["git", "software", "programming"]):
-            return "technology"
-        return "society"
+        return keyword_matcher(PRACTICAL_LIBRARY_TAGS).first(text) or "society"
 
     # Perspectives libraries
     if library_type == "perspectives":
@@ -657,26 +580,26 @@ def generate_tags(library_type: str, shelf_name: str, book_name: str,
 # =============================================================================
 
 def find_all_libraries() -> List[str]:
-    """Find all library JSON files."""
+    """Find all nested-shelves library JSON files to process."""
     libraries = []
-    base_dir = SCRIPT_DIR
-
-    for lib_type in LIBRARY_TYPE_PATTERNS.keys():
-        lib_dir = base_dir / f"{lib_type}-libraries"
-        if lib_dir.exists():
-            for json_file in lib_dir.glob("*.json"):
-                if "inventory" in json_file.name.lower():
-                    continue
-                if "questions" in json_file.name.lower():
-                    continue
-                if "bare" in json_file.name.lower():
-                    continue
-                libraries.append(str(json_file))
+
+    for json_file, _, _, _ in walk_library_files():
+        # Skip inventory and other meta files
+        name = json_file.name.lower()
+        if "inventory" in name or "questions" in name or "bare" in name:
+            continue
+        if is_legacy_library(json_file):
+            libraries.append(str(json_file))
 
     return sorted(libraries)
 
-def process_library(file_path: str, dry_run: bool = False) -> Tuple[int, int]:
-    """Process a library file and add tags to all chapters."""
+def process_library(file_path: str, dry_run: bool = False,
+                    cache: Optional[TagCache] = None) -> Tuple[int, int]:
+    """Process a library file and add tags to all chapters.
+
+    Chapters whose inputs are in `cache` take their tags from it (and count
+    as skipped); the file is only rewritten if some chapter's tags changed.
+    """
     vocabulary = load_tag_vocabulary()
     valid_tags = get_valid_tags(vocabulary)
     library_type = detect_library_type(file_path)
@@ -684,11 +607,11 @@ def process_library(file_path: str, dry_run: bool = False) -> Tuple[int, int]:
     print(f"\nProcessing: {file_path}")
     print(f"Library type: {library_type}")
 
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = read_json(file_path)
 
     chapters_tagged = 0
     chapters_skipped = 0
+    chapters_changed = 0
 
     library_name = data.get("library", "Unknown")
 
@@ -701,23 +624,36 @@ def process_library(file_path: str, dry_run: bool = False) -> Tuple[int, int]:
             for chapter in book.get("chapters", []):
                 chapter_name = chapter.get("name", "")
 
-                new_tags = generate_tags(library_type, shelf_name, book_name,
-                                        chapter_name, library_name, valid_tags)
+                key = cache.key(library_type, shelf_name, book_name, chapter_name,
+                                library_name) if cache else None
+                new_tags = cache.get(key) if cache else None
+                if new_tags is None:
+                    new_tags = generate_tags(library_type, shelf_name, book_name,
+                                            chapter_name, library_name, valid_tags)
+                    if cache:
+                        cache.put(key, new_tags)
+                else:
+                    chapters_skipped += 1
 
                 if dry_run:
                     print(f"  [{book_name}] {chapter_name}")
                     print(f"    -> {new_tags}")
-                else:
+                elif chapter.get("tags") != new_tags:
                     chapter["tags"] = new_tags
+                    chapters_changed += 1
 
                 chapters_tagged += 1
 
-    if not dry_run:
+    if cache:
+        print(f"Cached: {chapters_skipped} of {chapters_tagged} chapters")
+    if dry_run:
+        print(f"Dry run: {chapters_tagged} chapters would be tagged")
+    elif chapters_changed:
         with open(file_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
-        print(f"Saved: {chapters_tagged} chapters tagged")
+        print(f"Saved: {chapters_tagged} chapters tagged, {chapters_changed} changed")
     else:
-        print(f"Dry run: {chapters_tagged} chapters would be tagged")
+        print(f"Unchanged: {chapters_tagged} chapters already tagged, file not rewritten")
 
     return chapters_tagged, chapters_skipped
 
@@ -767,7 +703,10 @@ def main():
 
     # Process the file
     print()
-    tagged, skipped = process_library(selected_file, dry_run)
+    cache = TagCache.for_tagger(__file__, TAG_VOCABULARY_PATH)
+    tagged, skipped = process_library(selected_file, dry_run, cache)
+    if not dry_run:
+        cache.save()
 
     print(f"\n{'=' * 60}")
     print(f"Done! {'Would tag' if dry_run else 'Tagged'} {tagged} chapters.")
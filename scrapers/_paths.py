@@ -0,0 +1,16 @@
+"""
+Puts tools/ on sys.path for the scripts in this directory.
+
+The shared catalog modules (quarex_catalog, quarex_json_stream, the tag
+matcher and cache) live in tools/. Scripts here are run directly, so
+their own directory is on sys.path and `import _paths` finds this file
+before they import those modules.
+"""
+
+import sys
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).resolve().parents[1] / "tools"
+
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.insert(0, str(TOOLS_DIR))
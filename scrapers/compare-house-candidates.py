@@ -7,35 +7,34 @@ Usage: python compare-house-candidates.py [old_file] [new_file]
 Defaults to comparing Feb 12 backup vs current file.
 """
 
-import json
 import sys
 from pathlib import Path
 from collections import defaultdict
 
+import _paths  # noqa: F401 - puts tools/ on sys.path
+from quarex_catalog import load_file_books
+
 # Default file paths
 OLD_FILE = Path(r"E:\projects\websites\Quarex\libraries\politician-libraries as of 2-12-26\us-house-2026-complete\us_house_2026_complete.json")
 NEW_FILE = Path(r"E:\projects\websites\Quarex\libraries\politician-libraries\us-house-2026-complete\us_house_2026_complete.json")
 
 
-def extract_candidates(data):
+def extract_candidates(file_path):
     """Extract all candidates as a dict: {district: {party: set(candidates)}}"""
     candidates = defaultdict(lambda: defaultdict(set))
 
-    for shelf in data.get('shelves', []):
-        for book in shelf.get('books', []):
-            district = book['name']
-            for chapter in book.get('chapters', []):
-                party = chapter['name']
-                for candidate in chapter.get('topics', []):
-                    candidates[district][party].add(candidate)
+    for _, book in load_file_books(file_path, with_topics=True):
+        district = book.name
+        for chapter in book.chapters:
+            candidates[district][chapter.name].update(chapter.topics)
 
     return candidates
 
 
-def compare_candidates(old_data, new_data):
-    """Compare two candidate datasets and return added/removed."""
-    old_candidates = extract_candidates(old_data)
-    new_candidates = extract_candidates(new_data)
+def compare_candidates(old_file, new_file):
+    """Compare two candidate files and return added/removed."""
+    old_candidates = extract_candidates(old_file)
+    new_candidates = extract_candidates(new_file)
 
     # Get all districts from both
     all_districts = set(old_candidates.keys()) | set(new_candidates.keys())
@@ -76,15 +75,8 @@ def main():
     print(f"NEW: {new_file.name}")
     print()
 
-    # Load files
-    with open(old_file, 'r', encoding='utf-8') as f:
-        old_data = json.load(f)
-
-    with open(new_file, 'r', encoding='utf-8') as f:
-        new_data = json.load(f)
-
     # Compare
-    added, removed = compare_candidates(old_data, new_data)
+    added, removed = compare_candidates(old_file, new_file)
 
     # Report added
     print("-" * 70)
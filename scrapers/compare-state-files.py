@@ -12,6 +12,9 @@ import sys
 from pathlib import Path
 from collections import defaultdict
 
+import _paths  # noqa: F401 - puts tools/ on sys.path
+from quarex_catalog import load_book
+
 # Default directories
 OLD_DIR = Path(r"E:\projects\websites\Quarex\libraries\politician-libraries as of 2-12-26\us-house-2026-complete\2026-states")
 NEW_DIR = Path(r"E:\projects\websites\Quarex\libraries\politician-libraries\us-house-2026-complete\2026-states")
@@ -22,15 +25,12 @@ def extract_candidates_from_state_file(filepath):
     candidates = defaultdict(set)
 
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        for chapter in data.get('chapters', []):
-            district = chapter['name']
-            for candidate in chapter.get('topics', []):
-                candidates[district].add(candidate)
+        book = load_book(filepath, with_topics=True)
     except (FileNotFoundError, json.JSONDecodeError):
-        pass
+        return candidates
+
+    for chapter in (book.chapters if book else []):
+        candidates[chapter.name].update(chapter.topics)
 
     return candidates
 
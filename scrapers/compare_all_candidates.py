@@ -8,6 +8,9 @@ import json
 from pathlib import Path
 from datetime import datetime
 
+import _paths  # noqa: F401 - puts tools/ on sys.path
+from quarex_catalog import read_json
+
 # Paths
 BASE_DIR = Path(r"E:\projects\websites\Quarex")
 BACKUP_DIR = BASE_DIR / "libraries" / "politician-libraries as of 2-6-26"
@@ -40,8 +43,7 @@ ELECTIONS = {
 def load_json_file(filepath):
     """Load a JSON file and return its data."""
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return read_json(filepath)
     except Exception as e:
         print(f"Error loading {filepath}: {e}")
         return {}
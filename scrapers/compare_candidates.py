@@ -1,26 +1,19 @@
-import json
 from datetime import datetime
 
-def load_candidates(filepath):
-    with open(filepath, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+import _paths  # noqa: F401 - puts tools/ on sys.path
+from quarex_catalog import load_book, load_file_books
+from quarex_json_stream import is_legacy_library
 
+def load_candidates(filepath):
     candidates = {}
 
-    if 'shelves' in data:
-        for shelf in data['shelves']:
-            for book in shelf.get('books', []):
-                state = book['name']
-                candidates[state] = set()
-                for chapter in book.get('chapters', []):
-                    for topic in chapter.get('topics', []):
-                        candidates[state].add(topic)
-    elif 'chapters' in data:
-        for chapter in data['chapters']:
-            state = chapter['name']
-            candidates[state] = set()
-            for topic in chapter.get('topics', []):
-                candidates[state].add(topic)
+    if is_legacy_library(filepath):
+        for _, book in load_file_books(filepath, with_topics=True):
+            candidates[book.name] = {topic for chapter in book.chapters for topic in chapter.topics}
+    else:
+        book = load_book(filepath, with_topics=True)
+        for chapter in (book.chapters if book else []):
+            candidates[chapter.name] = set(chapter.topics)
 
     return candidates
 
@@ -4,10 +4,12 @@ Compare Senate candidate data between server and local versions.
 Generates an HTML report showing additions, removals, and changes.
 """
 
-import json
 from pathlib import Path
 from datetime import datetime
 
+import _paths  # noqa: F401 - puts tools/ on sys.path
+from quarex_catalog import load_book
+
 # Paths
 BASE_DIR = Path(r"E:\projects\websites\Quarex")
 OLD_DIR = Path(r"C:\Users\peter\Downloads\class-2-regular-elections")  # Server version
@@ -18,14 +20,11 @@ OUTPUT_FILE = BASE_DIR / "reports" / "election" / "senate-results.html"
 def load_state_file(filepath):
     """Load a state JSON file and return normalized candidate data."""
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        book = load_book(filepath, with_topics=True)
 
         candidates = {}
-        for chapter in data.get('chapters', []):
-            party = chapter.get('name', 'Unknown')
-            topics = chapter.get('topics', [])
-            candidates[party] = [t for t in topics if t != "No candidates declared"]
+        for chapter in (book.chapters if book else []):
+            candidates[chapter.name] = [t for t in chapter.topics if t != "No candidates declared"]
 
         return candidates
     except Exception as e:
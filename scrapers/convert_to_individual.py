@@ -16,6 +16,9 @@ import os
 import re
 from datetime import datetime
 
+import _paths  # noqa: F401 - puts tools/ on sys.path
+from quarex_catalog import read_json
+
 # Paths
 CANDIDATE_DIR = os.path.join(os.path.dirname(__file__), "..", "libraries", "politician-libraries")
 
@@ -39,8 +42,7 @@ def convert_senate():
         print(f"ERROR: Compendium file not found: {compendium_path}")
         return False
 
-    with open(compendium_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = read_json(compendium_path)
 
     os.makedirs(output_dir, exist_ok=True)
 
@@ -94,8 +96,7 @@ def convert_governor():
         print(f"ERROR: Compendium file not found: {compendium_path}")
         return False
 
-    with open(compendium_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = read_json(compendium_path)
 
     os.makedirs(output_dir, exist_ok=True)
 
@@ -138,8 +139,7 @@ def convert_house():
         print(f"ERROR: Compendium file not found: {compendium_path}")
         return False
 
-    with open(compendium_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = read_json(compendium_path)
 
     os.makedirs(states_dir, exist_ok=True)
 
@@ -244,8 +244,7 @@ def update_manifest(shelf_dir):
     books = []
     for filename in sorted(json_files):
         filepath = os.path.join(shelf_dir, filename)
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = read_json(filepath)
 
         book_name = data.get("book", filename.replace('.json', '').replace('-', ' ').title())
         books.append({
@@ -11,14 +11,15 @@ Examples:
     python add-books-to-db.py --shelf libraries/perspectives-libraries/contested-issues/labor-and-work
 """
 
-import json
-import os
 import sqlite3
 import sys
 import argparse
 from pathlib import Path
 from datetime import datetime
 
+from quarex_catalog import load_file_books, walk_library_files
+from quarex_db_common import HierarchyResolver, SummaryTracker
+
 # Configuration
 BASE_PATH = Path(r"E:\projects\websites\Quarex")
 DB_PATH = BASE_PATH / "database" / "quarex-catalog.db"
@@ -57,137 +58,46 @@ def load_tag_map(conn):
     return {row[0]: row[1] for row in cursor.fetchall()}
 
 
-def get_or_create_library_type(conn, name):
-    """Get or create a library type."""
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM library_types WHERE name = ?", (name,))
-    row = cursor.fetchone()
-    if row:
-        return row[0]
-    cursor.execute("INSERT INTO library_types (name) VALUES (?)", (name,))
-    conn.commit()
-    return cursor.lastrowid
-
-
-def get_or_create_library(conn, library_type_id, name, slug=None, description=None):
-    """Get or create a library."""
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id FROM libraries WHERE library_type_id = ? AND name = ?
-    """, (library_type_id, name))
-    row = cursor.fetchone()
-    if row:
-        return row[0]
-    cursor.execute("""
-        INSERT INTO libraries (library_type_id, name, slug, description)
-        VALUES (?, ?, ?, ?)
-    """, (library_type_id, name, slug, description))
-    conn.commit()
-    return cursor.lastrowid
-
-
-def get_or_create_shelf(conn, library_id, name, slug=None):
-    """Get or create a shelf."""
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id FROM shelves WHERE library_id = ? AND name = ?
-    """, (library_id, name))
-    row = cursor.fetchone()
-    if row:
-        return row[0]
-    cursor.execute("""
-        INSERT INTO shelves (library_id, name, slug) VALUES (?, ?, ?)
-    """, (library_id, name, slug))
-    conn.commit()
-    return cursor.lastrowid
-
-
-def name_to_slug(name):
-    """Convert a name to a slug."""
-    import re
-    slug = name.lower()
-    slug = re.sub(r'[^a-z0-9\s-]', '', slug)
-    slug = re.sub(r'\s+', '-', slug)
-    slug = re.sub(r'-+', '-', slug)
-    return slug.strip('-')
-
-
-def add_book(conn, file_path, library_type_name, library_name, shelf_name, tag_map):
+def add_book(conn, book, library_type_name, library_name, shelf_name, tag_map, hierarchy, summaries):
     """Add a single book to the database."""
     cursor = conn.cursor()
 
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except json.JSONDecodeError as e:
-        stats["errors"].append(f"JSON error in {file_path}: {e}")
-        return False
-    except Exception as e:
-        stats["errors"].append(f"Error reading {file_path}: {e}")
-        return False
-
-    # Skip manifest files
-    filename = file_path.name
-    if filename.startswith('_'):
-        return False
-
-    # Get book data
-    book_name = data.get('name', filename.replace('.json', '').replace('-', ' ').title())
-    created_by = data.get('created_by', None)
-    chapters = data.get('chapters', [])
-
-    # Skip if no chapters
-    if not chapters:
-        return False
-
-    # Skip older nested format
-    if 'shelves' in data:
-        return False
-
     # Get file stats
-    file_stat = file_path.stat()
+    file_stat = book.path.stat()
     file_modified = datetime.fromtimestamp(file_stat.st_mtime).isoformat()
     file_size = file_stat.st_size
 
     # Get or create hierarchy
-    library_type_id = get_or_create_library_type(conn, library_type_name)
-    library_id = get_or_create_library(conn, library_type_id, library_name,
-                                        name_to_slug(library_name))
-    shelf_id = get_or_create_shelf(conn, library_id, shelf_name,
-                                    name_to_slug(shelf_name))
+    shelf_id = hierarchy.resolve(library_type_name, library_name, shelf_name)
 
     # Insert book
     cursor.execute("""
-        INSERT INTO books (shelf_id, name, created_by, file_path, file_modified, file_size_bytes)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (shelf_id, book_name, created_by, str(file_path), file_modified, file_size))
+        INSERT INTO books (shelf_id, name, created_by, file_path, file_modified, file_size_bytes,
+                           chapter_count)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (shelf_id, book.name, book.created_by, str(book.path), file_modified, file_size,
+          len(book.chapters)))
     book_id = cursor.lastrowid
     stats["books_added"] += 1
 
     # Insert into FTS
-    cursor.execute("INSERT INTO books_fts (rowid, name) VALUES (?, ?)", (book_id, book_name))
+    cursor.execute("INSERT INTO books_fts (rowid, name) VALUES (?, ?)", (book_id, book.name))
 
     # Insert chapters
-    for i, chapter in enumerate(chapters):
-        if isinstance(chapter, dict):
-            chapter_name = chapter.get('name', f'Chapter {i+1}')
-            chapter_tags = chapter.get('tags', [])
-        else:
-            chapter_name = str(chapter)
-            chapter_tags = []
-
+    tag_ids = set()
+    for i, chapter in enumerate(book.chapters):
         cursor.execute("""
             INSERT INTO chapters (book_id, name, sort_order) VALUES (?, ?, ?)
-        """, (book_id, chapter_name, i))
+        """, (book_id, chapter.name, i))
         chapter_id = cursor.lastrowid
         stats["chapters_added"] += 1
 
         # Insert into FTS
         cursor.execute("INSERT INTO chapters_fts (rowid, name) VALUES (?, ?)",
-                      (chapter_id, chapter_name))
+                      (chapter_id, chapter.name))
 
         # Insert chapter tags
-        for tag_slug in chapter_tags:
+        for tag_slug in chapter.tags:
             tag_slug_normalized = tag_slug.lower().replace(' ', '-')
             if tag_slug_normalized in tag_map:
                 tag_id = tag_map[tag_slug_normalized]
@@ -195,55 +105,49 @@ def add_book(conn, file_path, library_type_name, library_name, shelf_name, tag_m
                     INSERT OR IGNORE INTO chapter_tags (chapter_id, tag_id)
                     VALUES (?, ?)
                 """, (chapter_id, tag_id))
+                tag_ids.add(tag_id)
 
-    conn.commit()
-    print(f"  Added: {book_name} ({len(chapters)} chapters)")
+    summaries.touch(shelf_id, tag_ids)
+
+    print(f"  Added: {book.name} ({len(book.chapters)} chapters)")
     return True
 
 
 def scan_for_new_books(conn, existing_books, tag_map, specific_shelf=None):
     """Scan libraries for books not in the database."""
-
-    for lib_path in LIBRARY_PATHS:
-        if not lib_path.exists():
-            continue
-
-        library_type_name = lib_path.name.replace('-libraries', '').replace('-', ' ').title()
-
-        for library_dir in lib_path.iterdir():
-            if not library_dir.is_dir() or library_dir.name.startswith('_'):
+    hierarchy = HierarchyResolver(conn)
+    summaries = SummaryTracker(conn)
+    current_shelf = None
+
+    for book_file, library_type_name, library_name, shelf_name in walk_library_files(LIBRARY_PATHS):
+        # If specific shelf requested, skip others
+        if specific_shelf:
+            shelf_rel_path = book_file.parent.relative_to(BASE_PATH)
+            if str(shelf_rel_path).replace('\\', '/') != specific_shelf.replace('\\', '/'):
                 continue
 
-            library_name = library_dir.name.replace('-', ' ').title()
-
-            for shelf_dir in library_dir.iterdir():
-                if not shelf_dir.is_dir() or shelf_dir.name.startswith('_'):
-                    continue
-
-                # If specific shelf requested, skip others
-                if specific_shelf:
-                    shelf_rel_path = shelf_dir.relative_to(BASE_PATH)
-                    if str(shelf_rel_path).replace('\\', '/') != specific_shelf.replace('\\', '/'):
-                        continue
-
-                shelf_name = shelf_dir.name.replace('-', ' ').title()
-                found_new = False
+        if str(book_file) in existing_books:
+            stats["books_skipped"] += 1
+            continue
 
-                for book_file in shelf_dir.glob('*.json'):
-                    if book_file.name.startswith('_'):
-                        continue
+        try:
+            file_books = load_file_books(book_file)
+        except (OSError, ValueError) as e:
+            stats["errors"].append(f"Error reading {book_file}: {e}")
+            continue
 
-                    file_path_str = str(book_file)
-                    if file_path_str in existing_books:
-                        stats["books_skipped"] += 1
-                        continue
+        # Nested-shelves files carry their own shelf names
+        for file_shelf_name, book in file_books:
+            shelf = (library_type_name, library_name, file_shelf_name or shelf_name)
+            if shelf != current_shelf:
+                print(f"\n{shelf[0]} > {shelf[1]} > {shelf[2]}:")
+                current_shelf = shelf
 
-                    if not found_new:
-                        print(f"\n{library_type_name} > {library_name} > {shelf_name}:")
-                        found_new = True
+            add_book(conn, book, *shelf, tag_map, hierarchy, summaries)
 
-                    add_book(conn, book_file, library_type_name,
-                            library_name, shelf_name, tag_map)
+    # All new books, hierarchy rows and recounts go in as one transaction
+    summaries.refresh()
+    conn.commit()
 
 
 def main():
@@ -261,6 +165,14 @@ def main():
 
     conn = sqlite3.connect(str(DB_PATH))
 
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM pragma_table_info('books') WHERE name = 'chapter_count'")
+    if cursor.fetchone() is None:
+        print(f"Error: {DB_PATH} predates book chapter counts.")
+        print("Run build-quarex-db.py to rebuild the database.")
+        conn.close()
+        return 1
+
     try:
         existing_books = get_existing_books(conn)
         print(f"Existing books in database: {len(existing_books)}")
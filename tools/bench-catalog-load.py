@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark catalog loading: cold JSON parse vs. warm snapshot.
+
+Loads the whole libraries tree through quarex_catalog.load_catalog() three
+ways and prints the best time of each:
+
+    cold JSON      - every file decoded from JSON, snapshot not used
+    snapshot build - first load with an empty snapshot (JSON + write)
+    warm snapshot  - later loads with nothing changed on disk
+
+The snapshot is written to a temporary file, so the real one in
+database/ is left alone.
+
+Usage:
+    python bench-catalog-load.py [--runs N]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from quarex_catalog import load_catalog
+
+
+def count_catalog(libraries):
+    """Return (books, chapters, topics) for a loaded catalog."""
+    books = chapters = topics = 0
+    for library in libraries.values():
+        for shelf in library.shelves.values():
+            for book in shelf.books:
+                books += 1
+                chapters += len(book.chapters)
+                topics += sum(len(chapter.topics) for chapter in book.chapters)
+    return books, chapters, topics
+
+
+def best_of(runs, load):
+    """Run load() `runs` times and return (best seconds, last result)."""
+    best = None
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = load()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Quarex catalog loading')
+    parser.add_argument('--runs', type=int, default=5, help='Timed runs per mode (default 5)')
+    args = parser.parse_args()
+
+    print("Quarex Catalog Load Benchmark")
+    print("-" * 40)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        snapshot_path = Path(tmp_dir) / "catalog-snapshot.pickle"
+
+        cold, libraries = best_of(args.runs, lambda: load_catalog(with_topics=True, snapshot_path=None))
+        books, chapters, topics = count_catalog(libraries)
+        print(f"Catalog: {len(libraries)} libraries, {books} books, "
+              f"{chapters} chapters, {topics} topics")
+
+        def build():
+            snapshot_path.unlink(missing_ok=True)
+            return load_catalog(snapshot_path=snapshot_path)
+
+        build_time, _ = best_of(args.runs, build)
+        warm, libraries = best_of(args.runs, lambda: load_catalog(snapshot_path=snapshot_path))
+        snapshot_size = snapshot_path.stat().st_size
+
+        if count_catalog(libraries) != (books, chapters, topics):
+            print("Error: snapshot load does not match the JSON load")
+            return 1
+
+    print(f"\nBest of {args.runs} runs:")
+    print(f"  Cold JSON:      {cold * 1000:8.1f} ms")
+    print(f"  Snapshot build: {build_time * 1000:8.1f} ms")
+    print(f"  Warm snapshot:  {warm * 1000:8.1f} ms  ({cold / warm:.1f}x faster than JSON)")
+    print(f"  Snapshot size:  {snapshot_size / 1024:8.1f} KiB")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+Load-test the explorer server and report its latency and throughput.
+
+Builds a catalog with build-quarex-db.py, starts quarex-db-server.py on it
+and replays a mix of the calls the explorer page makes:
+
+    /api/search           - name search, tag filters, library filters
+    /api/search-topics    - full-text topic search, with and without tags
+    /api/available-tags   - tag facets for one or two selected tags
+    /api/book             - one book with its chapters, tags and topics
+
+The catalog comes from the real libraries tree, or with --scale N from a
+synthetic tree holding N copies of every book (same libraries and shelves,
+N times the books, chapters and topics). Search words, tags and book ids
+are drawn from the built catalog, so every request hits real data.
+
+Each --concurrency level runs against a freshly started server, so the
+response cache starts cold every time; requests repeat at random like a
+real audience, and the repeats are served from the cache.
+
+Results are printed as JSON (or written to --output): p50/p95/p99 latency
+overall and per endpoint, throughput and error counts for every level,
+plus the catalog size and the server mode, so runs can be compared over
+time. Everything is built in a temporary folder; the real database is
+left alone.
+
+Usage:
+    python bench-explorer-server.py [--scale N] [--concurrency 1,8,32]
+                                    [--requests N] [--asyncio] [--db FILE]
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import queue
+import random
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from datetime import datetime
+from pathlib import Path
+
+from quarex_catalog import LIBRARIES_DIR, default_library_paths, walk_library_files
+from quarex_json_stream import is_legacy_library
+
+TOOLS_DIR = Path(__file__).resolve().parent
+BUILDER_PATH = TOOLS_DIR / 'build-quarex-db.py'
+SERVER_PATH = TOOLS_DIR / 'quarex-db-server.py'
+
+# Share of each endpoint in the replayed traffic
+REQUEST_MIX = {
+    '/api/search': 40,
+    '/api/search-topics': 25,
+    '/api/available-tags': 15,
+    '/api/book': 20,
+}
+
+# Sample size of each kind of request value drawn from the catalog
+SAMPLE_WORDS = 500
+SAMPLE_TAGS = 100
+SAMPLE_BOOKS = 5000
+
+# Seconds to wait for the server to load its facet index and answer
+SERVER_START_TIMEOUT = 120
+REQUEST_TIMEOUT = 60
+
+PERCENTILES = (50, 95, 99)
+
+
+# =============================================================================
+# CATALOG
+# =============================================================================
+
+def copy_name(path, copy):
+    """File name of the n-th synthetic copy of a book file."""
+    return path if copy == 0 else path.with_name(f"{path.stem}--copy{copy}.json")
+
+
+def make_synthetic_tree(source, target, scale):
+    """Write `scale` copies of every book file under source/ into target/."""
+    vocab = source / '_utils' / 'tag-vocabulary.json'
+    if vocab.exists():
+        (target / '_utils').mkdir(parents=True, exist_ok=True)
+        (target / '_utils' / vocab.name).write_bytes(vocab.read_bytes())
+
+    files = 0
+    for book_file, _, _, _ in walk_library_files(default_library_paths(source)):
+        dest = target / book_file.relative_to(source)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        raw = book_file.read_bytes()
+
+        # Nested-shelves libraries are copied verbatim; their books repeat by name
+        if b'"shelves"' in raw and is_legacy_library(book_file):
+            for copy in range(scale):
+                copy_name(dest, copy).write_bytes(raw)
+            files += scale
+            continue
+
+        try:
+            data = json.loads(raw.decode('utf-8'))
+        except (json.JSONDecodeError, ValueError):
+            continue
+        if not isinstance(data, dict) or not data.get('chapters'):
+            continue
+
+        name = data.get('name', book_file.stem.replace('-', ' ').title())
+        for copy in range(scale):
+            if copy:
+                data['name'] = f"{name} ({copy + 1})"
+            with open(copy_name(dest, copy), 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+        files += scale
+    return files
+
+
+def build_catalog(libraries_dir, db_path, jobs, log_path):
+    """Run build-quarex-db.py on a libraries folder; return the build seconds."""
+    command = [sys.executable, str(BUILDER_PATH), '--libraries', str(libraries_dir),
+               '--db', str(db_path), '--jobs', str(jobs)]
+    start = time.perf_counter()
+    with open(log_path, 'w', encoding='utf-8') as log:
+        result = subprocess.run(command, cwd=TOOLS_DIR, stdout=log, stderr=subprocess.STDOUT)
+    if result.returncode != 0 or not db_path.exists():
+        raise RuntimeError(f"build-quarex-db.py failed, see {log_path}")
+    return time.perf_counter() - start
+
+
+def catalog_counts(db_path):
+    """The catalog_counts table of a built database, as a dict."""
+    conn = sqlite3.connect(db_path.resolve().as_uri() + '?mode=ro', uri=True)
+    try:
+        return dict(conn.execute("SELECT name, count FROM catalog_counts ORDER BY rowid"))
+    finally:
+        conn.close()
+
+
+# =============================================================================
+# REQUESTS
+# =============================================================================
+
+def sample_values(db_path, rng):
+    """Search words, tag slugs, library ids and book ids drawn from the catalog."""
+    conn = sqlite3.connect(db_path.resolve().as_uri() + '?mode=ro', uri=True)
+    try:
+        cursor = conn.cursor()
+        words = set()
+        for (name,) in cursor.execute("SELECT name FROM books"):
+            words.update(word.lower() for word in re.findall(r'[A-Za-z]{4,}', name))
+        tags = [row[0] for row in cursor.execute("""
+            SELECT t.slug FROM tag_usage tu JOIN tags t ON t.id = tu.tag_id
+            WHERE tu.usage_count > 0
+            ORDER BY tu.usage_count DESC LIMIT ?
+        """, (SAMPLE_TAGS,))]
+        libraries = [row[0] for row in cursor.execute("SELECT id FROM libraries")]
+        books = [row[0] for row in cursor.execute("SELECT id FROM books")]
+    finally:
+        conn.close()
+
+    if not (words and tags and books):
+        raise RuntimeError(f"{db_path} has no books or tags to query")
+    return {
+        'words': rng.sample(sorted(words), min(SAMPLE_WORDS, len(words))),
+        'tags': tags,
+        'libraries': libraries,
+        'books': rng.sample(books, min(SAMPLE_BOOKS, len(books))),
+    }
+
+
+def random_request(endpoint, values, rng):
+    """A (path, query dict) for one call to an endpoint, like the explorer makes."""
+    word = rng.choice(values['words'])
+    tags = values['tags']
+
+    if endpoint == '/api/search':
+        kind = rng.randrange(4)
+        if kind == 0:
+            query = {'q': word}
+        elif kind == 1:
+            query = {'q': word, 'tags': rng.choice(tags)}
+        elif kind == 2:
+            query = {'tags': ','.join(rng.sample(tags, 2))}
+        else:
+            query = {'q': word, 'library': rng.choice(values['libraries'])}
+    elif endpoint == '/api/search-topics':
+        query = {'q': word}
+        if rng.random() < 0.3:
+            query['tags'] = rng.choice(tags)
+    elif endpoint == '/api/available-tags':
+        query = {'selected': ','.join(rng.sample(tags, rng.randint(1, 2)))}
+    else:
+        query = {'id': rng.choice(values['books'])}
+    return endpoint, query
+
+
+def request_plan(values, count, rng):
+    """`count` request URLs, endpoints weighted by REQUEST_MIX."""
+    endpoints = list(REQUEST_MIX)
+    weights = [REQUEST_MIX[endpoint] for endpoint in endpoints]
+    plan = []
+    for endpoint in rng.choices(endpoints, weights, k=count):
+        path, query = random_request(endpoint, values, rng)
+        plan.append((path, path + '?' + urllib.parse.urlencode(query)))
+    return plan
+
+
+# =============================================================================
+# SERVER
+# =============================================================================
+
+def free_port():
+    """A port nothing is listening on right now."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('localhost', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(db_path, port, server_args, log_path):
+    """Start quarex-db-server.py and wait until it answers."""
+    command = [sys.executable, str(SERVER_PATH), '--db', str(db_path), '--port', str(port)]
+    log = open(log_path, 'w', encoding='utf-8')
+    process = subprocess.Popen(command + server_args, cwd=TOOLS_DIR,
+                               stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"quarex-db-server.py exited, see {log_path}")
+        try:
+            conn = http.client.HTTPConnection('localhost', port, timeout=5)
+            conn.request('GET', '/api/stats')
+            conn.getresponse().read()
+            conn.close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+
+    stop_server(process)
+    raise RuntimeError(f"quarex-db-server.py did not start in {SERVER_START_TIMEOUT}s")
+
+
+def stop_server(process):
+    """Stop the server process."""
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+# =============================================================================
+# LOAD
+# =============================================================================
+
+def replay(port, plan, concurrency):
+    """Send the planned requests from `concurrency` keep-alive clients.
+
+    Returns (wall seconds, [(endpoint, seconds, ok), ...]).
+    """
+    pending = queue.SimpleQueue()
+    for item in plan:
+        pending.put(item)
+    samples = []
+    lock = threading.Lock()
+
+    def client():
+        conn = http.client.HTTPConnection('localhost', port, timeout=REQUEST_TIMEOUT)
+        results = []
+        while True:
+            try:
+                endpoint, url = pending.get_nowait()
+            except queue.Empty:
+                break
+            start = time.perf_counter()
+            try:
+                conn.request('GET', url, headers={'Accept-Encoding': 'gzip'})
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                ok = False
+                conn.close()
+            results.append((endpoint, time.perf_counter() - start, ok))
+        conn.close()
+        with lock:
+            samples.extend(results)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, samples
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def latency_summary(seconds):
+    """Count, mean, percentiles and max of a list of latencies, in ms."""
+    values = sorted(s * 1000 for s in seconds)
+    summary = {'count': len(values)}
+    if values:
+        summary['mean_ms'] = round(sum(values) / len(values), 3)
+        for percent in PERCENTILES:
+            summary[f'p{percent}_ms'] = round(percentile(values, percent), 3)
+        summary['max_ms'] = round(values[-1], 3)
+    return summary
+
+
+def run_level(db_path, server_args, values, args, concurrency, rng, log_path):
+    """Benchmark one concurrency level on a fresh server; return its report."""
+    port = free_port()
+    process = start_server(db_path, port, server_args, log_path)
+    try:
+        if args.warmup:
+            replay(port, request_plan(values, args.warmup, rng), concurrency)
+        wall, samples = replay(port, request_plan(values, args.requests, rng), concurrency)
+    finally:
+        stop_server(process)
+
+    ok = [seconds for _, seconds, good in samples if good]
+    report = {
+        'concurrency': concurrency,
+        'requests': len(samples),
+        'errors': len(samples) - len(ok),
+        'seconds': round(wall, 3),
+        'throughput_rps': round(len(ok) / wall, 1) if wall else None,
+        'latency': latency_summary(ok),
+        'endpoints': {},
+    }
+    for endpoint in REQUEST_MIX:
+        report['endpoints'][endpoint] = latency_summary(
+            [seconds for name, seconds, good in samples if name == endpoint and good])
+    return report
+
+
+def parse_levels(text):
+    """'1,8,32' -> [1, 8, 32]."""
+    try:
+        levels = [int(part) for part in text.split(',') if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a list of numbers: {text}")
+    if not levels or min(levels) < 1:
+        raise argparse.ArgumentTypeError("concurrency levels must be 1 or more")
+    return levels
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description='Load-test the Quarex explorer server')
+    parser.add_argument('--scale', type=int, default=1,
+                        help='Copies of every book in a synthetic catalog (default 1: the real tree)')
+    parser.add_argument('--libraries', type=Path, default=LIBRARIES_DIR,
+                        help=f'Libraries folder to build from (default {LIBRARIES_DIR})')
+    parser.add_argument('--db', type=Path,
+                        help='Benchmark an existing catalog database instead of building one')
+    parser.add_argument('--concurrency', type=parse_levels, default=[1, 8, 32],
+                        help='Comma-separated numbers of concurrent clients (default 1,8,32)')
+    parser.add_argument('--requests', type=int, default=2000,
+                        help='Timed requests per concurrency level (default 2000)')
+    parser.add_argument('--warmup', type=int, default=200,
+                        help='Untimed requests before each level (default 200)')
+    parser.add_argument('--workers', type=int,
+                        help="Server --workers (default: the server's own)")
+    parser.add_argument('--asyncio', action='store_true',
+                        help='Run the server with --asyncio')
+    parser.add_argument('--immutable', action='store_true',
+                        help='Run the server with --immutable')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Parser processes for the catalog build (default: all cores)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for the request mix')
+    parser.add_argument('--output', type=Path, help='Write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    if args.scale < 1 or args.requests < 1:
+        parser.error('--scale and --requests must be 1 or more')
+
+    server_args = []
+    if args.workers:
+        server_args += ['--workers', str(args.workers)]
+    if args.asyncio:
+        server_args.append('--asyncio')
+    if args.immutable:
+        server_args.append('--immutable')
+
+    rng = random.Random(args.seed)
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'server': {
+            'mode': 'asyncio' if args.asyncio else 'threaded',
+            'args': server_args,
+        },
+        'mix': REQUEST_MIX,
+        'seed': args.seed,
+    }
+
+    with tempfile.TemporaryDirectory(prefix='quarex-bench-') as tmp:
+        tmp_dir = Path(tmp)
+        catalog = {'scale': args.scale}
+
+        if args.db:
+            db_path = args.db
+            if not db_path.exists():
+                print(f"Error: Database not found at {db_path}", file=sys.stderr)
+                return 1
+            catalog['source'] = str(db_path)
+        else:
+            libraries_dir = args.libraries
+            if args.scale > 1:
+                print(f"Writing {args.scale}x synthetic libraries tree...", file=sys.stderr)
+                start = time.perf_counter()
+                libraries_dir = tmp_dir / 'libraries'
+                catalog['book_files'] = make_synthetic_tree(args.libraries, libraries_dir, args.scale)
+                catalog['tree_seconds'] = round(time.perf_counter() - start, 3)
+            catalog['source'] = str(args.libraries)
+
+            print("Building catalog...", file=sys.stderr)
+            db_path = tmp_dir / 'quarex-catalog.db'
+            catalog['build_seconds'] = round(
+                build_catalog(libraries_dir, db_path, args.jobs, tmp_dir / 'build.log'), 3)
+
+        catalog['db_bytes'] = db_path.stat().st_size
+        catalog['counts'] = catalog_counts(db_path)
+        report['catalog'] = catalog
+        values = sample_values(db_path, rng)
+
+        report['levels'] = []
+        for concurrency in args.concurrency:
+            print(f"Replaying {args.requests} requests with {concurrency} clients...",
+                  file=sys.stderr)
+            level = run_level(db_path, server_args, values, args, concurrency, rng,
+                              tmp_dir / f'server-{concurrency}.log')
+            report['levels'].append(level)
+            latency = level['latency']
+            print(f"  {level['throughput_rps']} req/s, p50 {latency.get('p50_ms')} ms, "
+                  f"p95 {latency.get('p95_ms')} ms, p99 {latency.get('p99_ms')} ms, "
+                  f"{level['errors']} errors", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + '\n', encoding='utf-8')
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    return 1 if any(level['errors'] for level in report['levels']) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,25 +4,52 @@ Quarex Catalog Database Builder
 Scans all Quarex JSON files and builds a normalized SQLite database.
 
 Usage:
-    python build-quarex-db.py
+    python build-quarex-db.py                 # Full rebuild
+    python build-quarex-db.py --incremental   # Only re-ingest changed files
+    python build-quarex-db.py --jobs 8        # Parse book files on 8 processes
+    python build-quarex-db.py --libraries DIR --db FILE   # Another tree or output
 
 Output:
     database/quarex-catalog.db
 """
 
+import argparse
+import hashlib
 import json
 import os
 import sqlite3
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
+from quarex_catalog import default_library_paths, walk_library_files
+from quarex_db_common import HierarchyResolver, SummaryTracker, create_summary_tables
+from quarex_json_stream import is_legacy_library, iter_legacy_books
+
 # Configuration
 BASE_PATH = Path(r"E:\projects\websites\Quarex")
 DB_PATH = BASE_PATH / "database" / "quarex-catalog.db"
 TAG_VOCAB_PATH = BASE_PATH / "libraries" / "_utils" / "tag-vocabulary.json"
 CURRICULUM_PATH = BASE_PATH / "publicstudies" / "curriculum-index.json"
 
+# Book files handed to each parser process at a time
+PARSE_CHUNKSIZE = 16
+
+# Placeholder returned by the parser for nested-shelves library files,
+# which the writer streams itself instead of loading them whole
+LEGACY_LIBRARY = 'legacy-library'
+
+# Buffered topic rows that force a flush before the shelf is finished
+BATCH_ROWS = 50000
+
+# Page cache for builds, in KiB (256 MB)
+BUILD_CACHE_KIB = 256 * 1024
+
+# Attempts at renaming the finished build over the live database
+SWAP_RETRIES = 5
+
 LIBRARY_PATHS = [
     BASE_PATH / "libraries" / "event-libraries",
     BASE_PATH / "libraries" / "geography-libraries",
@@ -38,6 +65,9 @@ LIBRARY_PATHS = [
 stats = {
     "files_processed": 0,
     "files_skipped": 0,
+    "files_unchanged": 0,
+    "legacy_files": 0,
+    "books_removed": 0,
     "library_types": 0,
     "libraries": 0,
     "shelves": 0,
@@ -52,12 +82,17 @@ stats = {
 
 
 def create_database(conn):
-    """Create database schema with tables, indexes, and views."""
+    """Create database schema with tables and views.
+
+    Secondary indexes are left to create_indexes(), which runs after the
+    data load so SQLite builds each index once instead of row by row.
+    """
     cursor = conn.cursor()
 
     # Drop existing tables (for clean rebuild)
     tables = ['chapter_tags', 'topics', 'chapters', 'books', 'shelves', 'libraries',
-              'library_types', 'tags', 'curricula', 'curriculum_courses']
+              'library_types', 'tags', 'curricula', 'curriculum_courses', 'build_manifest',
+              'catalog_counts', 'tag_usage', 'shelf_stats', 'library_stats']
     for table in tables:
         cursor.execute(f"DROP TABLE IF EXISTS {table}")
 
@@ -101,6 +136,7 @@ def create_database(conn):
             file_path TEXT,
             file_modified TEXT,
             file_size_bytes INTEGER,
+            chapter_count INTEGER NOT NULL DEFAULT 0,
             FOREIGN KEY (shelf_id) REFERENCES shelves(id)
         )
     """)
@@ -170,15 +206,18 @@ def create_database(conn):
         )
     """)
 
-    # Create indexes
-    cursor.execute("CREATE INDEX idx_tags_slug ON tags(slug)")
-    cursor.execute("CREATE INDEX idx_chapter_tags_chapter ON chapter_tags(chapter_id)")
-    cursor.execute("CREATE INDEX idx_chapter_tags_tag ON chapter_tags(tag_id)")
-    cursor.execute("CREATE INDEX idx_books_shelf ON books(shelf_id)")
-    cursor.execute("CREATE INDEX idx_chapters_book ON chapters(book_id)")
-    cursor.execute("CREATE INDEX idx_topics_chapter ON topics(chapter_id)")
-    cursor.execute("CREATE INDEX idx_libraries_type ON libraries(library_type_id)")
-    cursor.execute("CREATE INDEX idx_shelves_library ON shelves(library_id)")
+    # One fingerprint per scanned file, used by --incremental
+    cursor.execute("""
+        CREATE TABLE build_manifest (
+            file_path TEXT PRIMARY KEY,
+            file_mtime REAL NOT NULL,
+            file_size INTEGER NOT NULL,
+            content_hash TEXT NOT NULL
+        )
+    """)
+
+    # Materialized counts, kept up to date by SummaryTracker
+    create_summary_tables(conn)
 
     # Create full-text search
     cursor.execute("""
@@ -213,13 +252,11 @@ def create_database(conn):
             lt.name as library_type,
             l.name as library,
             s.name as shelf,
-            COUNT(c.id) as chapter_count
+            b.chapter_count
         FROM books b
         JOIN shelves s ON b.shelf_id = s.id
         JOIN libraries l ON s.library_id = l.id
         JOIN library_types lt ON l.library_type_id = lt.id
-        LEFT JOIN chapters c ON c.book_id = b.id
-        GROUP BY b.id
     """)
 
     cursor.execute("""
@@ -228,10 +265,9 @@ def create_database(conn):
             t.slug,
             t.label,
             t.tier,
-            COUNT(ct.chapter_id) as usage_count
+            COALESCE(tu.usage_count, 0) as usage_count
         FROM tags t
-        LEFT JOIN chapter_tags ct ON t.id = ct.tag_id
-        GROUP BY t.id
+        LEFT JOIN tag_usage tu ON tu.tag_id = t.id
         ORDER BY usage_count DESC
     """)
 
@@ -263,14 +299,11 @@ def create_database(conn):
         SELECT
             lt.name as library_type,
             l.name as library,
-            COUNT(DISTINCT b.id) as book_count,
-            COUNT(c.id) as chapter_count
+            ls.book_count,
+            ls.chapter_count
         FROM library_types lt
         JOIN libraries l ON l.library_type_id = lt.id
-        LEFT JOIN shelves s ON s.library_id = l.id
-        LEFT JOIN books b ON b.shelf_id = s.id
-        LEFT JOIN chapters c ON c.book_id = b.id
-        GROUP BY lt.id, l.id
+        JOIN library_stats ls ON ls.library_id = l.id
         ORDER BY lt.name, l.name
     """)
 
@@ -278,124 +311,148 @@ def create_database(conn):
     print("Database schema created.")
 
 
-def load_tags(conn):
-    """Load tags from tag-vocabulary.json."""
-    cursor = conn.cursor()
+def create_indexes(conn):
+    """Create secondary indexes (no-op for ones that already exist).
 
-    if not TAG_VOCAB_PATH.exists():
-        print(f"Warning: Tag vocabulary not found at {TAG_VOCAB_PATH}")
-        return {}
+    The UNIQUE constraints on libraries and shelves already give covering
+    (parent id, name, id) indexes for the type -> library -> shelf path,
+    and the chapter_tags primary key covers lookups by chapter.
+    """
+    cursor = conn.cursor()
+    # Superseded by the covering and ordered indexes below
+    for name in ('idx_chapter_tags_chapter', 'idx_chapter_tags_tag', 'idx_books_shelf',
+                 'idx_chapters_book', 'idx_topics_chapter', 'idx_libraries_type',
+                 'idx_shelves_library'):
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tags_slug ON tags(slug)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tags_tier ON tags(tier)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chapter_tags_tag_chapter ON chapter_tags(tag_id, chapter_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_books_name ON books(name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_books_shelf_name ON books(shelf_id, name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_books_file_path ON books(file_path)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chapters_book_order ON chapters(book_id, sort_order)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_topics_chapter_order ON topics(chapter_id, sort_order)")
+    conn.commit()
 
-    with open(TAG_VOCAB_PATH, 'r', encoding='utf-8') as f:
-        data = json.load(f)
 
-    tag_map = {}  # slug -> id
+def apply_build_pragmas(conn):
+    """Trade durability for speed on a private temp file nobody else reads."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA journal_mode = OFF")
+    cursor.execute("PRAGMA synchronous = OFF")
+    cursor.execute(f"PRAGMA cache_size = -{BUILD_CACHE_KIB}")
+    cursor.execute("PRAGMA locking_mode = EXCLUSIVE")
+    cursor.execute("PRAGMA temp_store = MEMORY")
 
-    for tier, tags_list in data.get('tags', {}).items():
-        for tag in tags_list:
-            slug = tag.get('id', '')
-            label = tag.get('label', '')
-            description = tag.get('description', '')
 
-            if slug:
-                cursor.execute("""
-                    INSERT OR IGNORE INTO tags (slug, label, tier, description)
-                    VALUES (?, ?, ?, ?)
-                """, (slug, label, tier, description))
+def apply_incremental_pragmas(conn):
+    """Faster settings that are still safe on the live database."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA synchronous = NORMAL")
+    cursor.execute(f"PRAGMA cache_size = -{BUILD_CACHE_KIB}")
+    cursor.execute("PRAGMA temp_store = MEMORY")
 
-                cursor.execute("SELECT id FROM tags WHERE slug = ?", (slug,))
-                tag_map[slug] = cursor.fetchone()[0]
-                stats["tags"] += 1
 
+def finalize_database(conn):
+    """Refresh planner statistics once the data is in."""
+    cursor = conn.cursor()
+    cursor.execute("ANALYZE")
+    cursor.execute("PRAGMA optimize")
     conn.commit()
-    print(f"Loaded {stats['tags']} tags from vocabulary.")
-    return tag_map
 
 
-def get_or_create_library_type(conn, name):
-    """Get or create a library type."""
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM library_types WHERE name = ?", (name,))
-    row = cursor.fetchone()
-    if row:
-        return row[0]
-
-    cursor.execute("INSERT INTO library_types (name) VALUES (?)", (name,))
-    conn.commit()
-    stats["library_types"] += 1
-    return cursor.lastrowid
+def swap_database(build_path):
+    """Atomically replace the live database with a freshly built one."""
+    # Windows refuses to replace a file another process has open. The
+    # explorer server closes its connections after a couple of idle
+    # seconds, so retry for a while before giving up.
+    for attempt in range(SWAP_RETRIES):
+        try:
+            os.replace(build_path, DB_PATH)
+            return True
+        except PermissionError:
+            time.sleep(1)
+    print(f"Error: could not replace {DB_PATH} - it is still open in another process.")
+    print(f"The new build is at {build_path}. Stop the explorer server (or whatever")
+    print(f"else has the database open) and move it over {DB_PATH.name} by hand,")
+    print("or run the build again.")
+    return False
 
 
-def get_or_create_library(conn, library_type_id, name, slug=None, description=None):
-    """Get or create a library."""
+def load_tags(conn):
+    """Load tags from tag-vocabulary.json and return a slug -> id map."""
     cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id FROM libraries
-        WHERE library_type_id = ? AND name = ?
-    """, (library_type_id, name))
-    row = cursor.fetchone()
-    if row:
-        return row[0]
 
-    cursor.execute("""
-        INSERT INTO libraries (library_type_id, name, slug, description)
-        VALUES (?, ?, ?, ?)
-    """, (library_type_id, name, slug, description))
-    conn.commit()
-    stats["libraries"] += 1
-    return cursor.lastrowid
+    if TAG_VOCAB_PATH.exists():
+        with open(TAG_VOCAB_PATH, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    else:
+        print(f"Warning: Tag vocabulary not found at {TAG_VOCAB_PATH}")
+        data = {}
 
+    rows = []
+    for tier, tags_list in data.get('tags', {}).items():
+        for tag in tags_list:
+            slug = tag.get('id', '')
+            if slug:
+                rows.append((slug, tag.get('label', ''), tier, tag.get('description', '')))
 
-def get_or_create_shelf(conn, library_id, name, slug=None):
-    """Get or create a shelf."""
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id FROM shelves
-        WHERE library_id = ? AND name = ?
-    """, (library_id, name))
-    row = cursor.fetchone()
-    if row:
-        return row[0]
+    cursor.executemany("""
+        INSERT INTO tags (slug, label, tier, description)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(slug) DO UPDATE SET
+            label = excluded.label,
+            tier = excluded.tier,
+            description = excluded.description
+    """, rows)
+    stats["tags"] += len(rows)
 
-    cursor.execute("""
-        INSERT INTO shelves (library_id, name, slug)
-        VALUES (?, ?, ?)
-    """, (library_id, name, slug))
-    conn.commit()
-    stats["shelves"] += 1
-    return cursor.lastrowid
+    # Include tags created outside the vocabulary by earlier (incremental) builds
+    cursor.execute("SELECT slug, id FROM tags")
+    tag_map = {row[0]: row[1] for row in cursor.fetchall()}
 
+    conn.commit()
+    print(f"Loaded {stats['tags']} tags from vocabulary.")
+    return tag_map
 
-def name_to_slug(name):
-    """Convert a name to a slug."""
-    import re
-    slug = name.lower()
-    slug = re.sub(r'[^a-z0-9\s-]', '', slug)
-    slug = re.sub(r'\s+', '-', slug)
-    slug = re.sub(r'-+', '-', slug)
-    return slug.strip('-')
 
+def parse_book_file(task):
+    """Read and normalize one book file into plain tuples.
 
-def process_book_file(conn, file_path, library_type_name, library_name, shelf_name, tag_map):
-    """Process a single book JSON file."""
-    cursor = conn.cursor()
+    Runs in the parser pool, so it must not touch the database or the
+    global stats. Returns (task, fingerprint, book, error):
+        fingerprint: (mtime, size, content_hash), or None if unreadable
+        book: (book_name, created_by, file_modified, file_size, chapters),
+              None for non-book files, or LEGACY_LIBRARY for the older
+              nested-shelves format; each chapter is a
+              (chapter_name, topics, [(tag_slug, tag_label), ...]) tuple
+        error: message for the error log, or None
+    """
+    file_path = task[0]
 
     try:
+        # Hashed in chunks, so a large compendium is never held in memory whole
+        file_stat = file_path.stat()
+        fingerprint = (file_stat.st_mtime, file_stat.st_size, file_content_hash(file_path))
+
+        # Skip manifest and meta files
+        filename = file_path.name
+        if filename.startswith('_') or filename in ['_manifest.json', '_meta.json']:
+            return task, fingerprint, None, None
+
+        # Older format with nested shelves - leave it to the streaming writer
+        if is_legacy_library(file_path):
+            return task, fingerprint, LEGACY_LIBRARY, None
+
         with open(file_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
-    except json.JSONDecodeError as e:
-        stats["errors"].append(f"JSON error in {file_path}: {e}")
-        stats["files_skipped"] += 1
-        return
+    except (json.JSONDecodeError, ValueError) as e:
+        return task, None, None, f"JSON error in {file_path}: {e}"
     except Exception as e:
-        stats["errors"].append(f"Error reading {file_path}: {e}")
-        stats["files_skipped"] += 1
-        return
+        return task, None, None, f"Error reading {file_path}: {e}"
 
-    # Skip manifest and meta files
-    filename = file_path.name
-    if filename.startswith('_') or filename in ['_manifest.json', '_meta.json']:
-        return
+    if not isinstance(data, dict):
+        return task, None, None, f"JSON error in {file_path}: not a JSON object"
 
     # Get book data
     book_name = data.get('name', filename.replace('.json', '').replace('-', ' ').title())
@@ -403,141 +460,405 @@ def process_book_file(conn, file_path, library_type_name, library_name, shelf_na
     chapters = data.get('chapters', [])
 
     # Skip if no chapters (not a book file)
-    if not chapters and 'shelves' not in data:
-        return
-
-    # Handle older format with nested shelves
-    if 'shelves' in data:
-        # This is an older format - skip for now or process differently
-        return
+    if not chapters:
+        return task, fingerprint, None, None
 
-    # Get file stats
-    file_stat = file_path.stat()
     file_modified = datetime.fromtimestamp(file_stat.st_mtime).isoformat()
-    file_size = file_stat.st_size
+    book = (book_name, created_by, file_modified, file_stat.st_size, normalize_chapters(chapters))
+    return task, fingerprint, book, None
 
-    # Get or create hierarchy
-    library_type_id = get_or_create_library_type(conn, library_type_name)
-    library_id = get_or_create_library(conn, library_type_id, library_name,
-                                        name_to_slug(library_name))
-    shelf_id = get_or_create_shelf(conn, library_id, shelf_name,
-                                    name_to_slug(shelf_name))
 
-    # Insert book
-    cursor.execute("""
-        INSERT INTO books (shelf_id, name, created_by, file_path, file_modified, file_size_bytes)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (shelf_id, book_name, created_by, str(file_path), file_modified, file_size))
-    book_id = cursor.lastrowid
-    stats["books"] += 1
+def _as_list(value):
+    """A JSON value that should be an array, or [] if it is anything else."""
+    return value if isinstance(value, list) else []
 
-    # Insert into FTS
-    cursor.execute("INSERT INTO books_fts (rowid, name) VALUES (?, ?)", (book_id, book_name))
 
-    # Insert chapters
+def normalize_chapters(chapters):
+    """Turn a book's chapter list into (chapter_name, topics, tags) tuples."""
+    chapter_rows = []
     for i, chapter in enumerate(chapters):
         if isinstance(chapter, dict):
             chapter_name = chapter.get('name', f'Chapter {i+1}')
-            chapter_tags = chapter.get('tags', [])
+            topics = [topic.strip() for topic in _as_list(chapter.get('topics'))
+                      if isinstance(topic, str) and topic.strip()]
+            tags = [(tag.lower().replace(' ', '-'), tag) for tag in _as_list(chapter.get('tags'))
+                    if isinstance(tag, str)]
         else:
             chapter_name = str(chapter)
-            chapter_tags = []
+            topics = []
+            tags = []
+        chapter_rows.append((chapter_name, topics, tags))
+    return chapter_rows
+
+
+def write_legacy_library(file_path, library_type_name, library_name, writer):
+    """Stream the books of a nested-shelves library file into the batch writer.
 
+    Shelf names come from the file itself. Books are decoded one at a time,
+    so even the House compendium never has to be held in memory whole.
+    Entries that are not book objects are logged and skipped; a file that
+    fails partway through raises, and the caller discards what it queued.
+    """
+    file_stat = file_path.stat()
+    file_modified = datetime.fromtimestamp(file_stat.st_mtime).isoformat()
+
+    for i, (shelf_name, book) in enumerate(iter_legacy_books(file_path)):
+        if not isinstance(book, dict):
+            stats["errors"].append(f"Skipped book {i+1} of {file_path}: not a JSON object")
+            continue
+        chapters = _as_list(book.get('chapters'))
+        if not chapters:
+            continue
+        shelf_id = writer.hierarchy.resolve(library_type_name, library_name, shelf_name)
+        book_name = book.get('name', f'{shelf_name} Book {i+1}')
+        writer.add_book(shelf_id, file_path, (book_name, book.get('created_by'), file_modified,
+                                              file_stat.st_size, normalize_chapters(chapters)))
+
+
+class BatchWriter:
+    """Buffers parsed books and flushes them to SQLite with executemany.
+
+    Row ids are allocated here instead of being read back from lastrowid,
+    so a whole shelf of books, chapters, topics and tag links can be sent
+    in a handful of statements. Nothing is committed until populate_fts()
+    fills the FTS tables at the end; the caller commits once after that.
+    """
+
+    def __init__(self, conn, tag_map, summaries):
+        self.conn = conn
+        self.tag_map = tag_map
+        self.summaries = summaries
+        self.hierarchy = HierarchyResolver(conn)
+        self.next_id = {table: self._last_id(table) + 1
+                        for table in ('books', 'chapters', 'topics', 'tags')}
+        # Everything from these ids up was written by this run
+        self.first_id = dict(self.next_id)
+        self.shelf_id = None
+        self._reset()
+
+    def _last_id(self, table):
+        """Highest id ever handed out for an AUTOINCREMENT table."""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def _allocate(self, table):
+        row_id = self.next_id[table]
+        self.next_id[table] += 1
+        return row_id
+
+    def _reset(self):
+        self.fingerprints = []
+        self.tags = []
+        self.books = []
+        self.chapters = []
+        self.topics = []
+        self.chapter_tags = []
+
+    def add_fingerprint(self, file_path, fingerprint):
+        """Queue a build_manifest row for a scanned file."""
+        self.fingerprints.append((str(file_path), *fingerprint))
+
+    def add_book(self, shelf_id, file_path, book):
+        """Queue a parsed book and all of its rows."""
+        # Flush per shelf, or sooner if a shelf is very large
+        if shelf_id != self.shelf_id or len(self.topics) >= BATCH_ROWS:
+            self.flush()
+            self.shelf_id = shelf_id
+
+        book_name, created_by, file_modified, file_size, chapters = book
+        book_id = self._allocate('books')
+        self.books.append((book_id, shelf_id, book_name, created_by, str(file_path),
+                           file_modified, file_size, len(chapters)))
+        stats["books"] += 1
+
+        tag_ids = set()
+        for i, (chapter_name, topics, tags) in enumerate(chapters):
+            chapter_id = self._allocate('chapters')
+            self.chapters.append((chapter_id, book_id, chapter_name, i))
+            stats["chapters"] += 1
+
+            for j, question in enumerate(topics):
+                self.topics.append((self._allocate('topics'), chapter_id, question, j))
+            stats["topics"] += len(topics)
+
+            for tag_slug, tag_label in tags:
+                if tag_slug not in self.tag_map:
+                    # Create tag if not in vocabulary
+                    self.tag_map[tag_slug] = self._allocate('tags')
+                    self.tags.append((self.tag_map[tag_slug], tag_slug, tag_label))
+                self.chapter_tags.append((chapter_id, self.tag_map[tag_slug]))
+                tag_ids.add(self.tag_map[tag_slug])
+                stats["chapter_tags"] += 1
+
+        self.summaries.touch(shelf_id, tag_ids)
+
+    def flush(self):
+        """Write all buffered rows."""
+        cursor = self.conn.cursor()
+        cursor.executemany("""
+            INSERT OR REPLACE INTO build_manifest (file_path, file_mtime, file_size, content_hash)
+            VALUES (?, ?, ?, ?)
+        """, self.fingerprints)
+        cursor.executemany("""
+            INSERT INTO tags (id, slug, label, tier) VALUES (?, ?, ?, 'unknown')
+        """, self.tags)
+        cursor.executemany("""
+            INSERT INTO books (id, shelf_id, name, created_by, file_path, file_modified,
+                               file_size_bytes, chapter_count)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, self.books)
+        cursor.executemany("""
+            INSERT INTO chapters (id, book_id, name, sort_order) VALUES (?, ?, ?, ?)
+        """, self.chapters)
+        cursor.executemany("""
+            INSERT INTO topics (id, chapter_id, question, sort_order) VALUES (?, ?, ?, ?)
+        """, self.topics)
+        cursor.executemany("""
+            INSERT OR IGNORE INTO chapter_tags (chapter_id, tag_id) VALUES (?, ?)
+        """, self.chapter_tags)
+        self._reset()
+
+    def discard_file(self, file_path):
+        """Remove the rows and fingerprint this run wrote for one file.
+
+        For a library file that fails partway through: the books it got
+        to are dropped and it stays out of build_manifest, so the next
+        --incremental run tries it again. None of these rows are in the
+        FTS tables yet, and the shelves and tags were touched on add.
+        """
+        self.flush()
+        cursor = self.conn.cursor()
+        file_path = str(file_path)
+        params = (file_path, self.first_id['books'])
+        book_ids = "SELECT id FROM books WHERE file_path = ? AND id >= ?"
+        chapter_ids = f"SELECT id FROM chapters WHERE book_id IN ({book_ids})"
+
+        cursor.execute(f"DELETE FROM topics WHERE chapter_id IN ({chapter_ids})", params)
+        stats["topics"] -= cursor.rowcount
+        cursor.execute(f"DELETE FROM chapter_tags WHERE chapter_id IN ({chapter_ids})", params)
+        stats["chapter_tags"] -= cursor.rowcount
+        cursor.execute(f"DELETE FROM chapters WHERE book_id IN ({book_ids})", params)
+        stats["chapters"] -= cursor.rowcount
+        cursor.execute("DELETE FROM books WHERE file_path = ? AND id >= ?", params)
+        stats["books"] -= cursor.rowcount
+        cursor.execute("DELETE FROM build_manifest WHERE file_path = ?", (file_path,))
+
+    def populate_fts(self):
+        """Index every book, chapter and topic written by this run in one pass per table."""
+        self.flush()
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            INSERT INTO books_fts (rowid, name)
+            SELECT id, name FROM books WHERE id >= ?
+        """, (self.first_id['books'],))
         cursor.execute("""
-            INSERT INTO chapters (book_id, name, sort_order)
-            VALUES (?, ?, ?)
-        """, (book_id, chapter_name, i))
-        chapter_id = cursor.lastrowid
-        stats["chapters"] += 1
+            INSERT INTO chapters_fts (rowid, name)
+            SELECT id, name FROM chapters WHERE id >= ?
+        """, (self.first_id['chapters'],))
+        cursor.execute("""
+            INSERT INTO topics_fts (rowid, question, book_name, chapter_name)
+            SELECT tp.id, tp.question, b.name, c.name
+            FROM topics tp
+            JOIN chapters c ON tp.chapter_id = c.id
+            JOIN books b ON c.book_id = b.id
+            WHERE tp.id >= ?
+        """, (self.first_id['topics'],))
 
-        # Insert into FTS
-        cursor.execute("INSERT INTO chapters_fts (rowid, name) VALUES (?, ?)",
-                      (chapter_id, chapter_name))
+        for key, count in self.hierarchy.created.items():
+            stats[key] += count
 
-        # Insert topics
-        if isinstance(chapter, dict):
-            chapter_topics = chapter.get('topics', [])
-            for j, topic in enumerate(chapter_topics):
-                if isinstance(topic, str) and topic.strip():
-                    cursor.execute("""
-                        INSERT INTO topics (chapter_id, question, sort_order)
-                        VALUES (?, ?, ?)
-                    """, (chapter_id, topic.strip(), j))
-                    topic_id = cursor.lastrowid
-                    cursor.execute("INSERT INTO topics_fts (rowid, question, book_name, chapter_name) VALUES (?, ?, ?, ?)",
-                                  (topic_id, topic.strip(), book_name, chapter_name))
-                    stats["topics"] += 1
-
-        # Insert chapter tags
-        for tag_slug in chapter_tags:
-            tag_slug_normalized = tag_slug.lower().replace(' ', '-')
-            if tag_slug_normalized in tag_map:
-                tag_id = tag_map[tag_slug_normalized]
-                try:
-                    cursor.execute("""
-                        INSERT OR IGNORE INTO chapter_tags (chapter_id, tag_id)
-                        VALUES (?, ?)
-                    """, (chapter_id, tag_id))
-                    stats["chapter_tags"] += 1
-                except:
-                    pass
-            else:
-                # Create tag if not in vocabulary
-                cursor.execute("""
-                    INSERT OR IGNORE INTO tags (slug, label, tier)
-                    VALUES (?, ?, 'unknown')
-                """, (tag_slug_normalized, tag_slug))
-                cursor.execute("SELECT id FROM tags WHERE slug = ?", (tag_slug_normalized,))
-                row = cursor.fetchone()
-                if row:
-                    tag_map[tag_slug_normalized] = row[0]
-                    cursor.execute("""
-                        INSERT OR IGNORE INTO chapter_tags (chapter_id, tag_id)
-                        VALUES (?, ?)
-                    """, (chapter_id, row[0]))
-                    stats["chapter_tags"] += 1
 
-    conn.commit()
+def write_book_file(parsed, writer):
+    """Queue one parsed book file for the batch writer."""
+    task, fingerprint, book, error = parsed
+    file_path, library_type_name, library_name, shelf_name = task
+
+    if error:
+        stats["errors"].append(error)
+        stats["files_skipped"] += 1
+        return
+
+    # Fingerprint every file we could read, so --incremental can skip it next time
+    writer.add_fingerprint(file_path, fingerprint)
+
+    if book is None:
+        return
+
+    if book == LEGACY_LIBRARY:
+        error = None
+        try:
+            write_legacy_library(file_path, library_type_name, library_name, writer)
+        except ValueError as e:
+            error = f"JSON error in {file_path}: {e}"
+        except (OSError, TypeError, AttributeError) as e:
+            error = f"Error reading {file_path}: {e}"
+        if error:
+            # Leave no half-written library behind, and no fingerprint
+            writer.discard_file(file_path)
+            stats["errors"].append(error)
+            stats["files_skipped"] += 1
+            return
+        stats["legacy_files"] += 1
+        stats["files_processed"] += 1
+        return
+
+    shelf_id = writer.hierarchy.resolve(library_type_name, library_name, shelf_name)
+    writer.add_book(shelf_id, file_path, book)
     stats["files_processed"] += 1
 
 
-def scan_libraries(conn, tag_map):
-    """Scan all library directories for book files."""
+def file_content_hash(file_path):
+    """Return the SHA-1 hex digest of a file's contents."""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def record_fingerprint(conn, file_path, mtime, size, content_hash):
+    """Store the (mtime, size, hash) fingerprint of a scanned file."""
+    conn.execute("""
+        INSERT OR REPLACE INTO build_manifest (file_path, file_mtime, file_size, content_hash)
+        VALUES (?, ?, ?, ?)
+    """, (str(file_path), mtime, size, content_hash))
+
+
+def delete_books_for_file(conn, file_path, summaries):
+    """Remove every book ingested from a file, with its chapters, topics, tags and FTS rows."""
+    cursor = conn.cursor()
+    file_path = str(file_path)
+
+    # The shelves and tags losing rows need recounting
+    cursor.execute("""
+        SELECT DISTINCT b.shelf_id, ct.tag_id
+        FROM books b
+        LEFT JOIN chapters c ON c.book_id = b.id
+        LEFT JOIN chapter_tags ct ON ct.chapter_id = c.id
+        WHERE b.file_path = ?
+    """, (file_path,))
+    for shelf_id, tag_id in cursor.fetchall():
+        summaries.touch(shelf_id, [tag_id] if tag_id is not None else [])
+
+    # Contentless FTS tables need the original values to delete a row
+    cursor.execute("""
+        INSERT INTO topics_fts (topics_fts, rowid, question, book_name, chapter_name)
+        SELECT 'delete', tp.id, tp.question, b.name, c.name
+        FROM topics tp
+        JOIN chapters c ON tp.chapter_id = c.id
+        JOIN books b ON c.book_id = b.id
+        WHERE b.file_path = ?
+    """, (file_path,))
+    cursor.execute("""
+        INSERT INTO chapters_fts (chapters_fts, rowid, name)
+        SELECT 'delete', c.id, c.name
+        FROM chapters c
+        JOIN books b ON c.book_id = b.id
+        WHERE b.file_path = ?
+    """, (file_path,))
+    cursor.execute("""
+        INSERT INTO books_fts (books_fts, rowid, name)
+        SELECT 'delete', id, name FROM books WHERE file_path = ?
+    """, (file_path,))
+
+    chapter_ids = """
+        SELECT c.id FROM chapters c
+        JOIN books b ON c.book_id = b.id
+        WHERE b.file_path = ?
+    """
+    cursor.execute(f"DELETE FROM topics WHERE chapter_id IN ({chapter_ids})", (file_path,))
+    cursor.execute(f"DELETE FROM chapter_tags WHERE chapter_id IN ({chapter_ids})", (file_path,))
+    cursor.execute("""
+        DELETE FROM chapters
+        WHERE book_id IN (SELECT id FROM books WHERE file_path = ?)
+    """, (file_path,))
+    cursor.execute("DELETE FROM books WHERE file_path = ?", (file_path,))
+    stats["books_removed"] += cursor.rowcount
+
+
+def prune_empty_hierarchy(conn):
+    """Remove shelves, libraries and library types left empty by deletions."""
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM shelves WHERE id NOT IN (SELECT DISTINCT shelf_id FROM books)")
+    cursor.execute("DELETE FROM libraries WHERE id NOT IN (SELECT DISTINCT library_id FROM shelves)")
+    cursor.execute("""
+        DELETE FROM library_types
+        WHERE id NOT IN (SELECT DISTINCT library_type_id FROM libraries)
+    """)
+
+
+def iter_book_files():
+    """Return (book_file, library_type_name, library_name, shelf_name) for every candidate file."""
     for lib_path in LIBRARY_PATHS:
         if not lib_path.exists():
             print(f"Warning: Library path not found: {lib_path}")
-            continue
+    print("Scanning libraries...")
+    return walk_library_files(LIBRARY_PATHS)
+
+
+def parse_book_files(tasks, jobs):
+    """Parse book files across a process pool, yielding results in task order."""
+    # Not worth starting processes for a handful of files (e.g. --incremental)
+    if jobs <= 1 or len(tasks) <= PARSE_CHUNKSIZE:
+        yield from map(parse_book_file, tasks)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        yield from pool.map(parse_book_file, tasks, chunksize=PARSE_CHUNKSIZE)
+
+
+def scan_libraries(conn, tag_map, summaries, jobs=1):
+    """Scan all library directories for book files."""
+    writer = BatchWriter(conn, tag_map, summaries)
+    for parsed in parse_book_files(list(iter_book_files()), jobs):
+        write_book_file(parsed, writer)
+    writer.populate_fts()
+    conn.commit()
 
-        library_type_name = lib_path.name.replace('-libraries', '').replace('-', ' ').title()
-        print(f"Scanning {library_type_name}...")
 
-        # Walk the directory structure
-        for library_dir in lib_path.iterdir():
-            if not library_dir.is_dir() or library_dir.name.startswith('_'):
-                continue
+def sync_libraries(conn, tag_map, summaries, jobs=1):
+    """Re-ingest only the book files whose fingerprint changed since the last build."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT file_path, file_mtime, file_size, content_hash FROM build_manifest")
+    manifest = {row[0]: row[1:] for row in cursor.fetchall()}
+    seen = set()
+    changed = []
+
+    for book_file, library_type_name, library_name, shelf_name in iter_book_files():
+        path_str = str(book_file)
+        seen.add(path_str)
+        file_stat = book_file.stat()
+        previous = manifest.get(path_str)
+
+        # Cheap check first: unchanged mtime and size means unchanged file
+        if previous and previous[0] == file_stat.st_mtime and previous[1] == file_stat.st_size:
+            stats["files_unchanged"] += 1
+            continue
 
-            library_name = library_dir.name.replace('-', ' ').title()
+        # Touched but identical content - just refresh the fingerprint
+        content_hash = file_content_hash(book_file)
+        if previous and previous[2] == content_hash:
+            record_fingerprint(conn, book_file, file_stat.st_mtime, file_stat.st_size, content_hash)
+            stats["files_unchanged"] += 1
+            continue
 
-            for shelf_dir in library_dir.iterdir():
-                if not shelf_dir.is_dir() or shelf_dir.name.startswith('_'):
-                    continue
+        delete_books_for_file(conn, book_file, summaries)
+        changed.append((book_file, library_type_name, library_name, shelf_name))
 
-                shelf_name = shelf_dir.name.replace('-', ' ').title()
+    writer = BatchWriter(conn, tag_map, summaries)
+    for parsed in parse_book_files(changed, jobs):
+        write_book_file(parsed, writer)
+    writer.populate_fts()
 
-                # Process book files in shelf
-                for book_file in shelf_dir.glob('*.json'):
-                    if book_file.name.startswith('_'):
-                        continue
-                    process_book_file(conn, book_file, library_type_name,
-                                     library_name, shelf_name, tag_map)
+    # Files that disappeared from the tree
+    for path_str in manifest.keys() - seen:
+        delete_books_for_file(conn, path_str, summaries)
+        cursor.execute("DELETE FROM build_manifest WHERE file_path = ?", (path_str,))
 
-        # Also handle questions-libraries specially (flat structure)
-        if 'questions' in lib_path.name:
-            for book_file in lib_path.glob('*.json'):
-                if book_file.name.startswith('_'):
-                    continue
-                process_book_file(conn, book_file, "Questions",
-                                 "Questions", "General", tag_map)
+    prune_empty_hierarchy(conn)
+    conn.commit()
 
 
 def load_curricula(conn):
@@ -555,6 +876,10 @@ def load_curricula(conn):
         print(f"Error loading curricula: {e}")
         return
 
+    # Curricula are small - always reload them wholesale
+    cursor.execute("DELETE FROM curriculum_courses")
+    cursor.execute("DELETE FROM curricula")
+
     disciplines = data.get('disciplines', [])
 
     for disc in disciplines:
@@ -597,6 +922,9 @@ def print_summary():
     print("="*50)
     print(f"Files processed:  {stats['files_processed']}")
     print(f"Files skipped:    {stats['files_skipped']}")
+    print(f"Files unchanged:  {stats['files_unchanged']}")
+    print(f"Legacy libraries: {stats['legacy_files']}")
+    print(f"Books removed:    {stats['books_removed']}")
     print(f"Library types:    {stats['library_types']}")
     print(f"Libraries:        {stats['libraries']}")
     print(f"Shelves:          {stats['shelves']}")
@@ -618,31 +946,108 @@ def print_summary():
     print(f"\nDatabase saved to: {DB_PATH}")
 
 
+def has_build_manifest(conn):
+    """Check whether an existing database was built with file fingerprints."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'build_manifest'")
+    return cursor.fetchone() is not None
+
+
+def has_chapter_counts(conn):
+    """Check whether an existing database stores chapter counts on books."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM pragma_table_info('books') WHERE name = 'chapter_count'")
+    return cursor.fetchone() is not None
+
+
 def main():
     """Main entry point."""
+    global DB_PATH, LIBRARY_PATHS, TAG_VOCAB_PATH, CURRICULUM_PATH
+
+    parser = argparse.ArgumentParser(description='Build the Quarex catalog database')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only re-ingest book files that changed since the last build')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Number of parser processes (default: all cores, 1 disables the pool)')
+    parser.add_argument('--libraries', type=Path,
+                        help='Libraries folder to scan instead of the Quarex one')
+    parser.add_argument('--db', type=Path, default=DB_PATH,
+                        help=f'Database to build (default {DB_PATH})')
+    parser.add_argument('--curriculum', type=Path,
+                        help='Curriculum index to load (default: publicstudies/ next to the libraries)')
+    args = parser.parse_args()
+
+    DB_PATH = args.db
+    if args.libraries:
+        LIBRARY_PATHS = default_library_paths(args.libraries)
+        TAG_VOCAB_PATH = args.libraries / "_utils" / "tag-vocabulary.json"
+        CURRICULUM_PATH = args.libraries.parent / "publicstudies" / "curriculum-index.json"
+    if args.curriculum:
+        CURRICULUM_PATH = args.curriculum
+
     print("Quarex Catalog Database Builder")
     print("-" * 40)
 
     # Ensure database directory exists
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-    # Remove existing database
-    if DB_PATH.exists():
-        DB_PATH.unlink()
-        print("Removed existing database.")
+    incremental = args.incremental and DB_PATH.exists()
+    if incremental:
+        conn = sqlite3.connect(str(DB_PATH))
+        if not has_build_manifest(conn):
+            print("Existing database has no build manifest - doing a full rebuild.")
+            conn.close()
+            incremental = False
+        elif not has_chapter_counts(conn):
+            print("Existing database has no book chapter counts - doing a full rebuild.")
+            conn.close()
+            incremental = False
+    elif args.incremental:
+        print("No existing database - doing a full rebuild.")
+
+    if incremental:
+        # Update the live database in place, in a single transaction
+        try:
+            apply_incremental_pragmas(conn)
+            tag_map = load_tags(conn)
+            summaries = SummaryTracker(conn)
+            sync_libraries(conn, tag_map, summaries, args.jobs)
+            load_curricula(conn)
+            create_indexes(conn)
+            summaries.refresh()
+            conn.commit()
+            conn.execute("PRAGMA optimize")
+        finally:
+            conn.close()
+        print_summary()
+        return 0
+
+    # Build into a temp file next to the live database, then swap it in,
+    # so the explorer server never sees a missing or half-built catalog
+    build_path = DB_PATH.with_name(DB_PATH.name + '.build')
+    if build_path.exists():
+        build_path.unlink()
 
-    # Connect and build
-    conn = sqlite3.connect(str(DB_PATH))
+    conn = sqlite3.connect(str(build_path))
 
     try:
+        apply_build_pragmas(conn)
         create_database(conn)
         tag_map = load_tags(conn)
-        scan_libraries(conn, tag_map)
+        summaries = SummaryTracker(conn)
+        scan_libraries(conn, tag_map, summaries, args.jobs)
         load_curricula(conn)
-        print_summary()
+        create_indexes(conn)
+        summaries.refresh()
+        conn.commit()
+        finalize_database(conn)
     finally:
         conn.close()
 
+    if not swap_database(build_path):
+        return 1
+
+    print_summary()
     return 0
 
 
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Check that the explorer server's queries are answered from indexes.
+
+Calls each API endpoint of quarex-db-server.py against a catalog database,
+records every SQL statement it runs, and asks SQLite for the query plan.
+Any plan that reads a whole table - a bare SCAN, with no index - fails the
+check, apart from the listing endpoints that return the whole table anyway.
+
+Ids, tags and search words for the requests are taken from the database,
+so the check runs against whatever catalog was built last.
+
+Usage:
+    python check-query-plans.py [--db path/to/quarex-catalog.db] [--verbose]
+
+Exits with status 1 if any query falls back to a full scan.
+"""
+
+import argparse
+import importlib.util
+import re
+import sqlite3
+import sys
+from pathlib import Path
+
+SERVER_PATH = Path(__file__).with_name('quarex-db-server.py')
+
+# "SCAN b" (SQLite 3.36+) or "SCAN TABLE books AS b" - a table read end to end
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE \S+ AS )?(?:TABLE )?(\S+)$')
+
+# Statements FTS5 runs on its own shadow tables, which the trace also reports
+FTS_SHADOW = re.compile(r"'main'\.'\w+_fts_(?:config|data|idx|docsize|content)'")
+
+
+def load_server():
+    """Import quarex-db-server.py, whose file name is not a module name."""
+    spec = importlib.util.spec_from_file_location('quarex_db_server', SERVER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def sample_requests(conn):
+    """Return (path, query, tables allowed to be scanned) for every endpoint."""
+    cursor = conn.cursor()
+
+    def first(sql):
+        cursor.execute(sql)
+        row = cursor.fetchone()
+        return str(row[0]) if row else ''
+
+    book_id = first("SELECT id FROM books ORDER BY chapter_count DESC LIMIT 1")
+    shelf_id = first(f"SELECT shelf_id FROM books WHERE id = {book_id or 0}")
+    library_id = first(f"SELECT library_id FROM shelves WHERE id = {shelf_id or 0}")
+    library_type_id = first(f"SELECT library_type_id FROM libraries WHERE id = {library_id or 0}")
+    chapter_id = first(f"SELECT id FROM chapters WHERE book_id = {book_id or 0} LIMIT 1")
+    other_book_id = first(f"SELECT id FROM books WHERE id != {book_id or 0} LIMIT 1")
+    tier = first("SELECT tier FROM tags LIMIT 1")
+    tags = ','.join(row[0] for row in cursor.execute("""
+        SELECT t.slug FROM tag_usage tu JOIN tags t ON t.id = tu.tag_id
+        ORDER BY tu.usage_count DESC LIMIT 2
+    """))
+    word = (re.findall(r'\w+', first("SELECT name FROM books LIMIT 1")) or ['a'])[0]
+
+    return [
+        ('/api/library-types', {}, {'library_types'}),
+        ('/api/libraries', {}, {'l', 'lt'}),
+        ('/api/libraries', {'type': [library_type_id]}, set()),
+        ('/api/shelves', {}, {'s', 'l'}),
+        ('/api/shelves', {'library': [library_id]}, set()),
+        ('/api/tags', {}, {'t'}),
+        ('/api/tags', {'tier': [tier]}, set()),
+        ('/api/search', {}, set()),
+        ('/api/search', {'q': [word]}, set()),
+        ('/api/search', {'type': [library_type_id]}, set()),
+        ('/api/search', {'library': [library_id]}, set()),
+        ('/api/search', {'shelf': [shelf_id]}, set()),
+        ('/api/search', {'tags': [tags]}, set()),
+        ('/api/search', {'q': [word], 'library': [library_id], 'tags': [tags]}, set()),
+        ('/api/search-topics', {'q': [word]}, set()),
+        ('/api/search-topics', {'q': [word], 'tags': [tags]}, set()),
+        ('/api/topics', {'chapter': [chapter_id]}, set()),
+        ('/api/book', {'id': [book_id]}, set()),
+        ('/api/batch', {'books': [f"{book_id},{other_book_id}"], 'topics': [chapter_id],
+                        'shelves': [library_id]}, set()),
+        ('/api/stats', {}, {'catalog_counts'}),
+    ]
+
+
+def full_scans(conn, sql):
+    """Return (plan lines, names of tables the plan scans without an index)."""
+    cursor = conn.cursor()
+    cursor.execute("EXPLAIN QUERY PLAN " + sql)
+    lines = [row[3] for row in cursor.fetchall()]
+    scans = set()
+    for line in lines:
+        match = FULL_SCAN.match(line)
+        if match:
+            scans.add(match.group(1))
+    return lines, scans
+
+
+def main():
+    """Main entry point."""
+    server = load_server()
+
+    parser = argparse.ArgumentParser(description='Check the explorer server query plans')
+    parser.add_argument('--db', type=Path, default=server.DB_PATH,
+                        help=f'Catalog database (default {server.DB_PATH})')
+    parser.add_argument('--verbose', action='store_true',
+                        help='Print every plan, not just the failing ones')
+    args = parser.parse_args()
+
+    if not args.db.exists():
+        print(f"Error: Database not found at {args.db}")
+        return 1
+
+    # Never reaped, so the traced connection is the one every endpoint gets
+    server.pool = server.ConnectionPool(args.db, size=1, idle_timeout=None)
+    planner = sqlite3.connect(args.db.resolve().as_uri() + '?mode=ro', uri=True)
+
+    # One pooled connection, so every endpoint runs on the traced one
+    statements = []
+    with server.db_connection() as conn:
+        conn.set_trace_callback(statements.append)
+
+    failures = 0
+    for path, query, allowed in sample_requests(planner):
+        statements.clear()
+        server.catalog.get_api_data(path, query)
+        label = path + ('?' + '&'.join(f"{k}={v[0]}" for k, v in query.items()) if query else '')
+
+        for sql in statements:
+            if not sql.lstrip().upper().startswith('SELECT') or FTS_SHADOW.search(sql):
+                continue
+            lines, scans = full_scans(planner, sql)
+            bad = scans - allowed
+            if bad:
+                failures += 1
+                print(f"FAIL {label}: full scan of {', '.join(sorted(bad))}")
+            elif args.verbose:
+                print(f"ok   {label}")
+            if bad or args.verbose:
+                for line in lines:
+                    print(f"       {line}")
+
+    server.pool.close()
+    planner.close()
+
+    if failures:
+        print(f"\n{failures} queries fall back to a full scan.")
+        return 1
+    print("All explorer queries use indexes.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,29 +4,301 @@ Quarex Database Explorer Server
 A simple HTTP server to query the Quarex SQLite database.
 
 Usage:
-    python quarex-db-server.py
+    python quarex-db-server.py [--workers N] [--immutable] [--single-thread | --asyncio]
+                               [--db path/to/quarex-catalog.db] [--port N]
 
 Then open: http://localhost:8765
+
+Requests are served on threads and share a pool of long-lived read-only
+connections; --workers caps how many queries run at once. --immutable
+tells SQLite the file will not change while the server runs, which skips
+file locking; leave it off if the builder may replace the database.
+--asyncio serves connections on an event loop instead, so idle keep-alive
+and slow clients don't hold threads; queries still run on --workers threads.
+
+Every query is timed and its plan recorded; /api/_metrics reports latency
+histograms per endpoint and the slowest queries with their plans.
 """
 
+import argparse
+import asyncio
+import base64
+import email.utils
+import gzip
+import heapq
 import json
+import logging
+import mimetypes
+import os
+import queue
 import sqlite3
+import threading
+import time
 import urllib.parse
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import zlib
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from http import HTTPStatus
+from http.server import HTTPServer, SimpleHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 
+try:
+    import brotli
+except ImportError:
+    # gzip only; pip install brotli to also offer br
+    brotli = None
+
 # Configuration
 PORT = 8765
 BASE_PATH = Path(r"E:\projects\websites\Quarex")
 DB_PATH = BASE_PATH / "database" / "quarex-catalog.db"
 HTML_PATH = BASE_PATH / "tools" / "quarex-db-explorer.html"
+DEFAULT_WORKERS = 8
+RESPONSE_CACHE_ENTRIES = 1024
+COMPRESS_MIN_BYTES = 1024
+DEFAULT_BOOK_PAGE = 200
+DEFAULT_TOPIC_PAGE = 50
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_ROWS = 200
+STATEMENT_CACHE_SIZE = 256
+# Idle pooled connections are closed after this long, so the server does
+# not keep the database file open (and unreplaceable on Windows) between requests
+IDLE_CONNECTION_SECONDS = 2
+SLOW_QUERY_ENTRIES = 20
+KEEPALIVE_TIMEOUT = 60
+STATIC_CHUNK_BYTES = 64 * 1024
+# Upper bounds, in milliseconds, of the latency histogram buckets
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+logger = logging.getLogger('quarex-db-server')
+
+
+def db_file_version(db_path=DB_PATH):
+    """Identity of the database file; changes when the builder swaps in a new one."""
+    st = os.stat(db_path)
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class ConnectionPool:
+    """Long-lived read-only SQLite connections shared by the request threads.
+
+    At most `size` connections exist, so at most `size` queries run at
+    once; further requests wait for a connection to come back. When the
+    database file is replaced, idle connections to the old file are closed
+    and new ones are opened on the next checkout. Connections left idle for
+    `idle_timeout` seconds are closed by a background thread, so no file
+    handle outlives the last request by much and the builder can swap the
+    file in.
+    """
+
+    def __init__(self, db_path, size=DEFAULT_WORKERS, immutable=False,
+                 idle_timeout=IDLE_CONNECTION_SECONDS):
+        self.db_path = Path(db_path)
+        self.immutable = immutable
+        self.size = size
+        self.slots = threading.BoundedSemaphore(size)
+        # (file version, connection, time it was returned), newest on top
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.version = db_file_version(self.db_path)
+        self.idle_timeout = idle_timeout
+        self.stopped = threading.Event()
+        if idle_timeout:
+            threading.Thread(target=self._reap, name='quarex-db-reaper', daemon=True).start()
+
+    def _open(self):
+        uri = self.db_path.resolve().as_uri() + '?mode=ro'
+        if self.immutable:
+            uri += '&immutable=1'
+        # Connections move between request threads, but only one uses a
+        # connection at a time
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _reap(self):
+        """Close connections idle for longer than idle_timeout, until close()."""
+        while not self.stopped.wait(self.idle_timeout / 2):
+            self.close_idle(time.monotonic() - self.idle_timeout)
+
+    def close_idle(self, returned_before=None):
+        """Close idle connections returned before a time.monotonic() value (default: all)."""
+        keep = []
+        with self.lock:
+            while True:
+                try:
+                    entry = self.idle.get_nowait()
+                except queue.Empty:
+                    break
+                if returned_before is None or entry[2] < returned_before:
+                    entry[1].close()
+                else:
+                    keep.append(entry)
+            # Put the survivors back oldest first, so the newest stays on top
+            for entry in reversed(keep):
+                self.idle.put(entry)
+
+    def current_version(self):
+        """Return the file version, dropping idle connections if it changed."""
+        if self.immutable:
+            return self.version
+        try:
+            version = db_file_version(self.db_path)
+        except OSError:
+            return self.version
+        with self.lock:
+            changed = version != self.version
+            self.version = version
+        if changed:
+            self.close_idle()
+        return version
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a with-block."""
+        with self.slots:
+            version = self.current_version()
+            try:
+                conn_version, conn, _ = self.idle.get_nowait()
+            except queue.Empty:
+                conn_version, conn = version, self._open()
+            if conn_version != version:
+                conn.close()
+                conn_version, conn = version, self._open()
+            try:
+                yield conn
+            finally:
+                if conn_version == self.version:
+                    self.idle.put((conn_version, conn, time.monotonic()))
+                else:
+                    conn.close()
 
+    def close(self):
+        self.stopped.set()
+        self.close_idle()
+
+
+pool = None
+
+
+def db_connection():
+    """Check out a pooled connection: `with db_connection() as conn:`."""
+    return pool.connection()
+
+
+def _bitset(positions):
+    """Build an int with the given bit positions set."""
+    if not positions:
+        return 0
+    bits = bytearray(max(positions) // 8 + 1)
+    for pos in positions:
+        bits[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(bits, 'little')
+
+
+class FacetIndex:
+    """Per-tag bitsets of books and chapters for tag drill-down.
+
+    Books and chapters are numbered 0..n-1, with each book's chapters
+    numbered consecutively, and every tag gets one int bitset over books
+    and one over chapters. Narrowing to the books that carry all selected
+    tags is an AND per tag; counting a tag's chapters within those books
+    is an AND plus a popcount.
+    """
+
+    def __init__(self, conn):
+        rows = fetch_rows(conn, "SELECT id, slug, label, tier FROM tags ORDER BY tier, label, id")
+        # Response order for available-tags
+        self.tags = [dict_from_row(row) for row in rows]
+        self.tag_ids = {tag['slug']: tag['id'] for tag in self.tags}
+
+        rows = fetch_rows(conn, "SELECT id, book_id FROM chapters ORDER BY book_id, sort_order, id")
+        chapter_pos = {}
+        book_pos = {}
+        # Chapter bit range [start, end) of each book position
+        book_ranges = []
+        for chapter_id, book_id in rows:
+            if book_id not in book_pos:
+                book_pos[book_id] = len(book_ranges)
+                book_ranges.append([len(chapter_pos), len(chapter_pos)])
+            chapter_pos[chapter_id] = len(chapter_pos)
+            book_ranges[-1][1] = len(chapter_pos)
+        self.book_ranges = book_ranges
+        self.all_books = (1 << len(book_ranges)) - 1
+
+        chapter_bits = {}
+        book_bits = {}
+        rows = fetch_rows(conn, """
+            SELECT ct.tag_id, ct.chapter_id, c.book_id
+            FROM chapter_tags ct
+            JOIN chapters c ON c.id = ct.chapter_id
+        """)
+        for tag_id, chapter_id, book_id in rows:
+            chapter_bits.setdefault(tag_id, []).append(chapter_pos[chapter_id])
+            book_bits.setdefault(tag_id, []).append(book_pos[book_id])
+        self.tag_chapters = {tag_id: _bitset(positions) for tag_id, positions in chapter_bits.items()}
+        self.tag_books = {tag_id: _bitset(positions) for tag_id, positions in book_bits.items()}
+
+        # Tags in use, in response order, with their book and chapter bitsets
+        self.used_tags = [(tag, self.tag_books[tag['id']], self.tag_chapters[tag['id']])
+                          for tag in self.tags if tag['id'] in self.tag_chapters]
+
+        # Unfiltered response: every tag in use with its chapter count
+        self.all_tags = [{**tag, 'usage_count': chapter_bits.bit_count()}
+                         for tag, _, chapter_bits in self.used_tags]
+
+    def chapters_of(self, books):
+        """Chapter bitset covering every book in a book bitset."""
+        chapters = 0
+        # Walk runs of consecutive books; each run is one chapter range
+        while books:
+            low = books & -books
+            above = (books + low) & ~books
+            start = self.book_ranges[low.bit_length() - 1][0]
+            end = self.book_ranges[above.bit_length() - 2][1]
+            chapters |= ((1 << (end - start)) - 1) << start
+            books &= ~(above - low)
+        return chapters
+
+    def available_tags(self, selected_slugs):
+        """Tags on chapters of books that carry every selected tag, with chapter counts."""
+        if not selected_slugs:
+            return self.all_tags
+
+        books = self.all_books
+        for slug in selected_slugs:
+            tag_id = self.tag_ids.get(slug)
+            if tag_id is None:
+                return []
+            books &= self.tag_books.get(tag_id, 0)
+            if not books:
+                return []
+
+        chapters = self.chapters_of(books)
+        result = []
+        for tag, book_bits, chapter_bits in self.used_tags:
+            # The book bitsets are much shorter; skip tags outside the matching books
+            if book_bits & books:
+                result.append({**tag, 'usage_count': (chapter_bits & chapters).bit_count()})
+        return result
 
-def get_db_connection():
-    """Get a database connection."""
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
-    return conn
+
+facet_index = None
+facet_lock = threading.Lock()
+
+
+def get_facet_index():
+    """Return the facet index for the current database file, rebuilding it after a rebuild."""
+    global facet_index
+    version = pool.current_version()
+    with facet_lock:
+        if facet_index is None or facet_index[0] != version:
+            with db_connection() as conn:
+                facet_index = (version, FacetIndex(conn))
+        return facet_index[1]
 
 
 def dict_from_row(row):
@@ -34,6 +306,505 @@ def dict_from_row(row):
     return dict(zip(row.keys(), row))
 
 
+def in_list(values):
+    """Placeholders and parameters for `IN (...)`, padded to a power-of-two length.
+
+    Repeating the last value doesn't change the IN test, but it keeps the
+    number of distinct SQL strings - and so sqlite3 statement cache
+    entries - down to one per power of two.
+    """
+    size = 1 << (len(values) - 1).bit_length()
+    return ','.join('?' * size), list(values) + [values[-1]] * (size - len(values))
+
+
+class QueryMetrics:
+    """Latency histograms per endpoint, plus timings and plans per query.
+
+    Rows are counted per request on the thread that runs its queries. Each SQL
+    shape has its plan recorded the first time it runs; the slowest
+    individual queries are kept with their parameters.
+    """
+
+    def __init__(self, slow_entries=SLOW_QUERY_ENTRIES):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.slow_entries = slow_entries
+        self.endpoints = {}
+        self.queries = {}
+        self.plans = {}
+        # Min-heap of (seconds, sequence, sql, params)
+        self.slowest = []
+        self.sequence = 0
+
+    def begin_request(self):
+        self.local.rows = 0
+
+    def request_rows(self):
+        """Rows read on this thread since begin_request()."""
+        return getattr(self.local, 'rows', 0)
+
+    def end_request(self, path, seconds, rows):
+        """Add a finished request to its endpoint's histogram."""
+        ms = seconds * 1000
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if ms <= bound),
+                      len(LATENCY_BUCKETS_MS))
+        with self.lock:
+            endpoint = self.endpoints.get(path)
+            if endpoint is None:
+                endpoint = self.endpoints[path] = {
+                    'requests': 0, 'rows': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'histogram': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                }
+            endpoint['requests'] += 1
+            endpoint['rows'] += rows
+            endpoint['total_ms'] += ms
+            endpoint['max_ms'] = max(endpoint['max_ms'], ms)
+            endpoint['histogram'][bucket] += 1
+
+    def record_query(self, conn, sql, params, seconds, rows):
+        """Count one query, and look up its plan if this shape is new."""
+        self.local.rows = getattr(self.local, 'rows', 0) + rows
+        if sql not in self.plans:
+            cursor = conn.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plan = [row[3] for row in cursor.fetchall()]
+            with self.lock:
+                self.plans[sql] = plan
+
+        with self.lock:
+            stats = self.queries.get(sql)
+            if stats is None:
+                stats = self.queries[sql] = {'calls': 0, 'rows': 0, 'total_ms': 0.0}
+            stats['calls'] += 1
+            stats['rows'] += rows
+            stats['total_ms'] += seconds * 1000
+
+            self.sequence += 1
+            entry = (seconds, self.sequence, sql, list(params))
+            if len(self.slowest) < self.slow_entries:
+                heapq.heappush(self.slowest, entry)
+            elif seconds > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, entry)
+
+    def snapshot(self):
+        """Everything collected so far, for /api/_metrics."""
+        bounds = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        with self.lock:
+            endpoints = {
+                path: {
+                    'requests': e['requests'],
+                    'rows': e['rows'],
+                    'mean_ms': round(e['total_ms'] / e['requests'], 3),
+                    'max_ms': round(e['max_ms'], 3),
+                    'histogram': dict(zip(bounds, e['histogram'])),
+                }
+                for path, e in sorted(self.endpoints.items())
+            }
+            slowest = [
+                {'ms': round(seconds * 1000, 3), 'sql': ' '.join(sql.split()),
+                 'params': params, 'plan': self.plans.get(sql, [])}
+                for seconds, _, sql, params in sorted(self.slowest, reverse=True)
+            ]
+            return {
+                'endpoints': endpoints,
+                'query_shapes': len(self.queries),
+                'queries': sum(q['calls'] for q in self.queries.values()),
+                'slowest': slowest,
+            }
+
+
+metrics = QueryMetrics()
+
+
+def fetch_rows(conn, sql, params=()):
+    """Run a query and return all its rows, recording its time and plan."""
+    start = time.perf_counter()
+    rows = conn.execute(sql, params).fetchall()
+    metrics.record_query(conn, sql, params, time.perf_counter() - start, len(rows))
+    return rows
+
+
+# Endpoints that accept stream=1
+STREAM_PATHS = {'/api/search', '/api/search-topics'}
+
+API_PATHS = {
+    '/api/library-types',
+    '/api/libraries',
+    '/api/shelves',
+    '/api/tags',
+    '/api/available-tags',
+    '/api/search',
+    '/api/search-topics',
+    '/api/topics',
+    '/api/stats',
+    '/api/book',
+    '/api/batch',
+}
+
+# Resources /api/batch can resolve, and the most ids it takes per request
+BATCH_RESOURCES = ('books', 'topics', 'shelves')
+MAX_BATCH_IDS = 500
+
+
+def page_limit(query, default):
+    """Page size from the `limit` parameter, clamped to 1..MAX_PAGE_SIZE."""
+    try:
+        limit = int(query.get('limit', [default])[0])
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def batch_ids(query, name):
+    """Distinct integer ids from a comma-separated batch parameter."""
+    ids = []
+    for part in query.get(name, [''])[0].split(','):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            ids.append(int(part))
+        except ValueError:
+            raise ValueError(f"{name} must be a comma-separated list of ids")
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_BATCH_IDS:
+        raise ValueError(f"at most {MAX_BATCH_IDS} {name} per batch")
+    return ids
+
+
+def encode_cursor(key):
+    """Opaque token for a keyset position."""
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(query):
+    """Keyset position from the `cursor` parameter, or None for the first page."""
+    token = query.get('cursor', [''])[0]
+    if not token:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except ValueError:
+        raise ValueError("invalid cursor")
+    # (book name, id) or (score, topic id); anything else would reach SQLite
+    if not isinstance(key, list) or len(key) != 2:
+        raise ValueError("invalid cursor")
+    position, row_id = key
+    if (isinstance(position, bool) or not isinstance(position, (str, int, float))
+            or isinstance(row_id, bool) or not isinstance(row_id, int)):
+        raise ValueError("invalid cursor")
+    return tuple(key)
+
+
+def paginate(query, rows, keys, limit):
+    """Trim a limit+1 fetch to one page.
+
+    Plain requests get the bare list, as before; with `page=1` or a
+    `cursor` the page is wrapped as {"results": [...], "next_cursor": ...}.
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not (query.get('page', [''])[0] or query.get('cursor', [''])[0]):
+        return rows
+    next_cursor = encode_cursor(keys[limit - 1]) if has_more else None
+    return {'results': rows, 'next_cursor': next_cursor}
+
+
+def catalog_etag(version, encoding=None):
+    """ETag for every API response built from one database file."""
+    mtime_ns, size, _ = version
+    suffix = f'-{encoding}' if encoding else ''
+    return f'"{mtime_ns:x}-{size:x}{suffix}"'
+
+
+def choose_encoding(accept_encoding):
+    """Pick br or gzip from an Accept-Encoding header, or None for identity."""
+    accepted = set()
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q=') and params[2:] in ('0', '0.0', '0.00', '0.000'):
+            continue
+        accepted.add(name.strip().lower())
+    if brotli and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    """Compress a response body for a Content-Encoding."""
+    if encoding == 'br':
+        return brotli.compress(body)
+    # mtime=0 keeps the gzip bytes stable for a given body
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+class StaticAsset:
+    """A static file held in memory with a precompressed copy.
+
+    The file is re-read only when its mtime changes.
+    """
+
+    def __init__(self, path, content_type):
+        self.path = Path(path)
+        self.content_type = content_type
+        self.lock = threading.Lock()
+        self.mtime_ns = None
+        self.bodies = {}
+
+    def load(self):
+        """Return {encoding: bytes} for the current file, or None if it is missing."""
+        try:
+            mtime_ns = self.path.stat().st_mtime_ns
+        except OSError:
+            return None
+        with self.lock:
+            if mtime_ns != self.mtime_ns:
+                raw = self.path.read_bytes()
+                self.bodies = {None: raw, 'gzip': compress(raw, 'gzip')}
+                if brotli:
+                    self.bodies['br'] = compress(raw, 'br')
+                self.mtime_ns = mtime_ns
+            return self.bodies
+
+
+def cache_key(path, query_string):
+    """Path plus query parameters in a canonical order."""
+    return path + '?' + urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(query_string, keep_blank_values=True)))
+
+
+class ResponseCache:
+    """LRU cache of serialized API responses for one catalog version.
+
+    Entries are only valid for the database file they were built from;
+    the whole cache is dropped as soon as a different version is seen.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.version = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version, key):
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+            body = self.entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, version, key, body):
+        with self.lock:
+            if version != self.version:
+                return
+            self.entries[key] = body
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+response_cache = ResponseCache()
+explorer_page = StaticAsset(HTML_PATH, 'text/html; charset=utf-8')
+
+
+Response = namedtuple('Response', 'status headers body')
+Response.__doc__ = """A complete response; `body` is None for a 304."""
+
+StreamQuery = namedtuple('StreamQuery', 'build key after limit encoding drop')
+StreamQuery.__doc__ = """A search to be sent as a JSON array while its rows are fetched.
+
+`build(after)` returns the keyset query (without its LIMIT value) for the
+rows after a position; `key` names the columns that make up a position.
+"""
+
+
+def cache_headers(version, etag):
+    """Validators for a response built from one catalog version."""
+    return [
+        ('ETag', etag),
+        ('Last-Modified', email.utils.formatdate(version[0] / 1e9, usegmt=True)),
+        # Let browsers keep responses but revalidate them with If-None-Match
+        ('Cache-Control', 'no-cache'),
+    ]
+
+
+def body_headers(content_type, encoding=None):
+    """Headers shared by every full response (Content-Length is added on send)."""
+    headers = [('Content-Encoding', encoding)] if encoding else []
+    return headers + [('Vary', 'Accept-Encoding'), ('Content-Type', content_type)]
+
+
+def json_response(body, version=None, etag=None, encoding=None, status=200):
+    """Response for an already-serialized (and possibly compressed) JSON body."""
+    headers = [('Access-Control-Allow-Origin', '*')]
+    if etag:
+        headers += cache_headers(version, etag)
+    return Response(status, headers + body_headers('application/json', encoding), body)
+
+
+def error_response(message, status=400):
+    return json_response(json.dumps({"error": message}).encode('utf-8'), status=status)
+
+
+def api_response(path, query_string, accept_encoding='', if_none_match=''):
+    """Build the response to an API request, from the response cache when possible.
+
+    Returns a Response, or a StreamQuery for `stream=1` searches.
+    """
+    version = pool.current_version()
+    encoding = choose_encoding(accept_encoding)
+    etag = catalog_etag(version, encoding)
+
+    # The catalog is unchanged since the client's copy (of either encoding)
+    if etag in if_none_match or catalog_etag(version) in if_none_match:
+        return Response(304, cache_headers(version, etag), None)
+
+    query = urllib.parse.parse_qs(query_string)
+    if path in STREAM_PATHS and query.get('stream', [''])[0]:
+        return stream_query(path, query, encoding)
+
+    key = cache_key(path, query_string)
+    body = response_cache.get(version, (key, None))
+    if body is None:
+        try:
+            data = catalog.get_api_data(path, query)
+        except ValueError as e:
+            return error_response(str(e))
+        except Exception:
+            logger.exception("%s?%s failed", path, query_string)
+            return error_response("Internal server error", 500)
+        body = json.dumps(data).encode('utf-8')
+        response_cache.put(version, (key, None), body)
+
+    # Small payloads aren't worth the compression overhead
+    if encoding and len(body) < COMPRESS_MIN_BYTES:
+        encoding = None
+        etag = catalog_etag(version)
+    if encoding:
+        encoded = response_cache.get(version, (key, encoding))
+        if encoded is None:
+            encoded = compress(body, encoding)
+            response_cache.put(version, (key, encoding), encoded)
+        body = encoded
+
+    return json_response(body, version, etag, encoding)
+
+
+def stream_query(path, query, encoding):
+    """The StreamQuery for a `stream=1` search.
+
+    Streams skip the response cache and return every match unless a
+    `limit` is given; `cursor` still sets the starting position. Only
+    gzip is streamed.
+    """
+    try:
+        after = decode_cursor(query)
+        limit = page_limit(query, MAX_PAGE_SIZE) if 'limit' in query else -1
+    except ValueError as e:
+        return error_response(str(e))
+
+    encoding = 'gzip' if encoding else None
+    if path == '/api/search':
+        return StreamQuery(partial(catalog.book_search_sql, query), ('book_name', 'id'),
+                           after, limit, encoding, ())
+    if not query.get('q', [''])[0]:
+        return json_response(b'[]')
+    return StreamQuery(partial(catalog.topic_search_sql, query), ('score', 'topic_id'),
+                       after, limit, encoding, ('score',))
+
+
+def stream_headers(encoding, chunked):
+    """Headers for a streamed JSON array."""
+    headers = [
+        ('Access-Control-Allow-Origin', '*'),
+        ('Content-Type', 'application/json'),
+        ('Cache-Control', 'no-store'),
+        ('Vary', 'Accept-Encoding'),
+    ]
+    if encoding:
+        headers.append(('Content-Encoding', encoding))
+    if chunked:
+        headers.append(('Transfer-Encoding', 'chunked'))
+    return headers
+
+
+def iter_json_rows(stream):
+    """Yield a StreamQuery's rows as pieces of one JSON array, a batch at a time.
+
+    Every batch is its own keyset query, run on a pooled connection that
+    is checked out only while the batch is fetched. Nothing is held
+    between pieces, so a stream waiting on a slow reader never keeps a
+    connection from other requests.
+    """
+    yield '['
+    separator = ''
+    after = stream.after
+    remaining = stream.limit
+    while remaining != 0:
+        batch = STREAM_BATCH_ROWS if remaining < 0 else min(STREAM_BATCH_ROWS, remaining)
+        sql, params = stream.build(after)
+        with db_connection() as conn:
+            rows = fetch_rows(conn, sql, params + [batch])
+        if not rows:
+            break
+        names = [name for name in rows[0].keys() if name not in stream.drop]
+        yield separator + ', '.join(json.dumps({name: row[name] for name in names})
+                                    for row in rows)
+        separator = ', '
+        if len(rows) < batch:
+            break
+        if remaining > 0:
+            remaining -= len(rows)
+        after = tuple(rows[-1][name] for name in stream.key)
+    yield ']'
+
+
+class StreamEncoder:
+    """Frames a streamed body: optional gzip, then optional chunked encoding."""
+
+    def __init__(self, encoding, chunked):
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if encoding else None
+        self.chunked = chunked
+
+    def _frame(self, data):
+        if not data:
+            return b''
+        if self.chunked:
+            return b'%x\r\n%s\r\n' % (len(data), data)
+        return data
+
+    def encode(self, text):
+        data = text.encode('utf-8')
+        return self._frame(self.compressor.compress(data) if self.compressor else data)
+
+    def finish(self):
+        """Bytes that end the body."""
+        tail = self._frame(self.compressor.flush()) if self.compressor else b''
+        return tail + (b'0\r\n\r\n' if self.chunked else b'')
+
+
+def html_response(accept_encoding=''):
+    """Response for the explorer page, or None if the file is missing."""
+    bodies = explorer_page.load()
+    if bodies is None:
+        return None
+    encoding = choose_encoding(accept_encoding)
+    return Response(200, body_headers(explorer_page.content_type, encoding), bodies[encoding])
+
+
+def metrics_response():
+    return json_response(json.dumps(metrics.snapshot()).encode('utf-8'))
+
+
 class QuarexHandler(SimpleHTTPRequestHandler):
     """HTTP request handler for Quarex database queries."""
 
@@ -41,211 +812,188 @@ class QuarexHandler(SimpleHTTPRequestHandler):
         """Handle GET requests."""
         parsed = urllib.parse.urlparse(self.path)
         path = parsed.path
-        query = urllib.parse.parse_qs(parsed.query)
 
-        # API endpoints
+        if path in API_PATHS:
+            start = time.perf_counter()
+            metrics.begin_request()
+            self.send_api(path, parsed.query)
+            metrics.end_request(path, time.perf_counter() - start, metrics.request_rows())
+        elif path == '/api/_metrics':
+            self.send(metrics_response())
+        elif path == '/' or path == '/index.html':
+            self.serve_html()
+        else:
+            super().do_GET()
+
+    def send_api(self, path, query_string):
+        """Send an API response, streaming it if it is a StreamQuery."""
+        response = api_response(path, query_string,
+                                self.headers.get('Accept-Encoding', ''),
+                                self.headers.get('If-None-Match', ''))
+        if isinstance(response, StreamQuery):
+            self.stream_rows(response)
+        else:
+            self.send(response)
+
+    def send(self, response):
+        """Send a complete Response."""
+        self.send_response(response.status)
+        for name, value in response.headers:
+            self.send_header(name, value)
+        if response.body is not None:
+            self.send_header('Content-Length', str(len(response.body)))
+        self.end_headers()
+        if response.body is not None:
+            self.wfile.write(response.body)
+
+    def stream_rows(self, stream):
+        """Write a StreamQuery's rows as a JSON array in batches.
+
+        HTTP/1.1 clients get chunked transfer encoding; HTTP/1.0 clients
+        get the body up to connection close.
+        """
+        chunked = self.request_version == 'HTTP/1.1'
+        if chunked:
+            self.protocol_version = 'HTTP/1.1'
+        self.send_response(200)
+        for name, value in stream_headers(stream.encoding, chunked):
+            self.send_header(name, value)
+        self.send_header('Connection', 'close')
+        self.close_connection = True
+        self.end_headers()
+
+        encoder = StreamEncoder(stream.encoding, chunked)
+        pieces = iter_json_rows(stream)
+        try:
+            for piece in pieces:
+                self.wfile.write(encoder.encode(piece))
+            self.wfile.write(encoder.finish())
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away mid-stream
+            pass
+        finally:
+            pieces.close()
+
+    def serve_html(self):
+        """Serve the HTML explorer page."""
+        response = html_response(self.headers.get('Accept-Encoding', ''))
+        if response is None:
+            self.send_error(404, 'HTML file not found')
+            return
+        self.send(response)
+
+
+class CatalogAPI:
+    """The /api/* endpoints, shared by the threaded and asyncio servers."""
+
+    def get_api_data(self, path, query):
+        """Run the API endpoint for a path with parsed query parameters."""
         if path == '/api/library-types':
-            self.send_json(self.get_library_types())
+            return self.get_library_types()
         elif path == '/api/libraries':
             library_type = query.get('type', [None])[0]
-            self.send_json(self.get_libraries(library_type))
+            return self.get_libraries(library_type)
         elif path == '/api/shelves':
             library_id = query.get('library', [None])[0]
-            self.send_json(self.get_shelves(library_id))
+            return self.get_shelves(library_id)
         elif path == '/api/tags':
             tier = query.get('tier', [None])[0]
-            self.send_json(self.get_tags(tier))
+            return self.get_tags(tier)
         elif path == '/api/available-tags':
             selected = query.get('selected', [''])[0]
-            self.send_json(self.get_available_tags(selected))
+            return self.get_available_tags(selected)
         elif path == '/api/search':
-            self.send_json(self.search_books(query))
+            return self.search_books(query)
         elif path == '/api/search-topics':
-            self.send_json(self.search_topics(query))
+            return self.search_topics(query)
         elif path == '/api/topics':
             chapter_id = query.get('chapter', [None])[0]
-            self.send_json(self.get_topics(chapter_id))
+            return self.get_topics(chapter_id)
         elif path == '/api/stats':
-            self.send_json(self.get_stats())
+            return self.get_stats()
         elif path == '/api/book':
             book_id = query.get('id', [None])[0]
-            self.send_json(self.get_book(book_id))
-        elif path == '/' or path == '/index.html':
-            self.serve_html()
-        else:
-            super().do_GET()
-
-    def send_json(self, data):
-        """Send a JSON response."""
-        self.send_response(200)
-        self.send_header('Content-Type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode('utf-8'))
-
-    def serve_html(self):
-        """Serve the HTML explorer page."""
-        if HTML_PATH.exists():
-            self.send_response(200)
-            self.send_header('Content-Type', 'text/html')
-            self.end_headers()
-            self.wfile.write(HTML_PATH.read_bytes())
-        else:
-            self.send_error(404, 'HTML file not found')
+            return self.get_book(book_id)
+        elif path == '/api/batch':
+            return self.get_batch(query)
 
     def get_library_types(self):
         """Get all library types."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name FROM library_types ORDER BY name")
-        result = [dict_from_row(row) for row in cursor.fetchall()]
-        conn.close()
-        return result
+        with db_connection() as conn:
+            rows = fetch_rows(conn, "SELECT id, name FROM library_types ORDER BY name")
+        return [dict_from_row(row) for row in rows]
 
     def get_libraries(self, library_type_id=None):
         """Get libraries, optionally filtered by type."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        if library_type_id:
-            cursor.execute("""
-                SELECT id, name, slug, description
-                FROM libraries
-                WHERE library_type_id = ?
-                ORDER BY name
-            """, (library_type_id,))
-        else:
-            cursor.execute("""
-                SELECT l.id, l.name, l.slug, l.description, lt.name as type_name
-                FROM libraries l
-                JOIN library_types lt ON l.library_type_id = lt.id
-                ORDER BY lt.name, l.name
-            """)
-        result = [dict_from_row(row) for row in cursor.fetchall()]
-        conn.close()
-        return result
+        with db_connection() as conn:
+            if library_type_id:
+                rows = fetch_rows(conn, """
+                    SELECT id, name, slug, description
+                    FROM libraries
+                    WHERE library_type_id = ?
+                    ORDER BY name
+                """, (library_type_id,))
+            else:
+                rows = fetch_rows(conn, """
+                    SELECT l.id, l.name, l.slug, l.description, lt.name as type_name
+                    FROM libraries l
+                    JOIN library_types lt ON l.library_type_id = lt.id
+                    ORDER BY lt.name, l.name
+                """)
+        return [dict_from_row(row) for row in rows]
 
     def get_shelves(self, library_id=None):
         """Get shelves, optionally filtered by library."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        if library_id:
-            cursor.execute("""
-                SELECT id, name, slug
-                FROM shelves
-                WHERE library_id = ?
-                ORDER BY name
-            """, (library_id,))
-        else:
-            cursor.execute("""
-                SELECT s.id, s.name, s.slug, l.name as library_name
-                FROM shelves s
-                JOIN libraries l ON s.library_id = l.id
-                ORDER BY l.name, s.name
-            """)
-        result = [dict_from_row(row) for row in cursor.fetchall()]
-        conn.close()
-        return result
+        with db_connection() as conn:
+            if library_id:
+                rows = fetch_rows(conn, """
+                    SELECT id, name, slug
+                    FROM shelves
+                    WHERE library_id = ?
+                    ORDER BY name
+                """, (library_id,))
+            else:
+                rows = fetch_rows(conn, """
+                    SELECT s.id, s.name, s.slug, l.name as library_name
+                    FROM shelves s
+                    JOIN libraries l ON s.library_id = l.id
+                    ORDER BY l.name, s.name
+                """)
+        return [dict_from_row(row) for row in rows]
 
     def get_tags(self, tier=None):
         """Get tags, optionally filtered by tier."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        if tier:
-            cursor.execute("""
-                SELECT t.id, t.slug, t.label, t.tier, COUNT(ct.chapter_id) as usage_count
-                FROM tags t
-                LEFT JOIN chapter_tags ct ON t.id = ct.tag_id
-                WHERE t.tier = ?
-                GROUP BY t.id
-                ORDER BY usage_count DESC, t.label
-            """, (tier,))
-        else:
-            cursor.execute("""
-                SELECT t.id, t.slug, t.label, t.tier, COUNT(ct.chapter_id) as usage_count
-                FROM tags t
-                LEFT JOIN chapter_tags ct ON t.id = ct.tag_id
-                GROUP BY t.id
-                ORDER BY t.tier, usage_count DESC, t.label
-            """)
-        result = [dict_from_row(row) for row in cursor.fetchall()]
-        conn.close()
-        return result
+        with db_connection() as conn:
+            if tier:
+                rows = fetch_rows(conn, """
+                    SELECT t.id, t.slug, t.label, t.tier, COALESCE(tu.usage_count, 0) as usage_count
+                    FROM tags t
+                    LEFT JOIN tag_usage tu ON tu.tag_id = t.id
+                    WHERE t.tier = ?
+                    ORDER BY usage_count DESC, t.label
+                """, (tier,))
+            else:
+                rows = fetch_rows(conn, """
+                    SELECT t.id, t.slug, t.label, t.tier, COALESCE(tu.usage_count, 0) as usage_count
+                    FROM tags t
+                    LEFT JOIN tag_usage tu ON tu.tag_id = t.id
+                    ORDER BY t.tier, usage_count DESC, t.label
+                """)
+        return [dict_from_row(row) for row in rows]
 
     def get_available_tags(self, selected_tags_str):
         """Get tags that would return results given current selections.
 
         Returns tags that appear on chapters in books that have ALL the selected tags.
         """
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            selected_tags = [t.strip() for t in selected_tags_str.split(',') if t.strip()]
-            print(f"[DEBUG] get_available_tags called with: {selected_tags}")
-
-            if not selected_tags:
-                # No selection - return all tags with counts
-                cursor.execute("""
-                    SELECT t.id, t.slug, t.label, t.tier, COUNT(DISTINCT ct.chapter_id) as usage_count
-                    FROM tags t
-                    LEFT JOIN chapter_tags ct ON t.id = ct.tag_id
-                    GROUP BY t.id
-                    HAVING usage_count > 0
-                    ORDER BY t.tier, t.label
-                """)
-            else:
-                # Find books that have ALL selected tags
-                placeholders = ','.join(['?' for _ in selected_tags])
-
-                # First, get books that have chapters with ALL selected tags
-                cursor.execute(f"""
-                    SELECT DISTINCT b.id
-                    FROM books b
-                    JOIN chapters c ON c.book_id = b.id
-                    JOIN chapter_tags ct ON ct.chapter_id = c.id
-                    JOIN tags t ON t.id = ct.tag_id
-                    WHERE t.slug IN ({placeholders})
-                    GROUP BY b.id
-                    HAVING COUNT(DISTINCT t.slug) = ?
-                """, (*selected_tags, len(selected_tags)))
-
-                matching_book_ids = [row[0] for row in cursor.fetchall()]
-                print(f"[DEBUG] Found {len(matching_book_ids)} matching books")
-
-                if not matching_book_ids:
-                    conn.close()
-                    return []
-
-                # Now get all tags that appear in those books
-                book_placeholders = ','.join(['?' for _ in matching_book_ids])
-                cursor.execute(f"""
-                    SELECT t.id, t.slug, t.label, t.tier, COUNT(DISTINCT ct.chapter_id) as usage_count
-                    FROM tags t
-                    JOIN chapter_tags ct ON t.id = ct.tag_id
-                    JOIN chapters c ON c.id = ct.chapter_id
-                    WHERE c.book_id IN ({book_placeholders})
-                    GROUP BY t.id
-                    ORDER BY t.tier, t.label
-                """, matching_book_ids)
-
-            result = [dict_from_row(row) for row in cursor.fetchall()]
-            print(f"[DEBUG] Returning {len(result)} tags")
-            conn.close()
-            return result
-        except Exception as e:
-            print(f"[ERROR] get_available_tags failed: {e}")
-            import traceback
-            traceback.print_exc()
-            return {"error": str(e)}
-
-    def search_books(self, query):
-        """Search books with various filters."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        selected_tags = [t.strip() for t in selected_tags_str.split(',') if t.strip()]
+        return get_facet_index().available_tags(selected_tags)
 
+    def book_search_sql(self, query, after=None):
+        """Build the book search query; `after` is a (name, id) keyset position."""
         # Build query
         sql = """
-            SELECT DISTINCT
+            SELECT
                 b.id,
                 b.name as book_name,
                 b.created_by,
@@ -254,7 +1002,7 @@ class QuarexHandler(SimpleHTTPRequestHandler):
                 lt.name as library_type,
                 l.name as library,
                 s.name as shelf,
-                (SELECT COUNT(*) FROM chapters WHERE book_id = b.id) as chapter_count
+                b.chapter_count
             FROM books b
             JOIN shelves s ON b.shelf_id = s.id
             JOIN libraries l ON s.library_id = l.id
@@ -292,11 +1040,11 @@ class QuarexHandler(SimpleHTTPRequestHandler):
         tags = query.get('tags', [])
         tag_list = []
         if tags and tags[0]:
-            tag_list = [t.strip() for t in tags[0].split(',') if t.strip()]
+            tag_list = list(dict.fromkeys(t.strip() for t in tags[0].split(',') if t.strip()))
 
         if tag_list:
             # Use subquery to find books with ALL selected tags
-            placeholders = ','.join(['?' for _ in tag_list])
+            placeholders, tag_params = in_list(tag_list)
             tag_subquery = f"""
                 b.id IN (
                     SELECT b2.id
@@ -310,29 +1058,65 @@ class QuarexHandler(SimpleHTTPRequestHandler):
                 )
             """
             conditions.append(tag_subquery)
-            params.extend(tag_list)
+            params.extend(tag_params)
             params.append(len(tag_list))
 
+        if after is not None:
+            conditions.append("(b.name, b.id) > (?, ?)")
+            params.extend(after)
+
         if conditions:
             sql += " WHERE " + " AND ".join(conditions)
 
-        sql += " ORDER BY b.name LIMIT 200"
+        sql += " ORDER BY b.name, b.id LIMIT ?"
+        return sql, params
 
-        cursor.execute(sql, params)
-        result = [dict_from_row(row) for row in cursor.fetchall()]
-        conn.close()
-        return result
+    def search_books(self, query):
+        """Search books with various filters, one keyset page at a time."""
+        limit = page_limit(query, DEFAULT_BOOK_PAGE)
+        after = decode_cursor(query)
+        sql, params = self.book_search_sql(query, after)
+
+        with db_connection() as conn:
+            rows = [dict_from_row(row) for row in fetch_rows(conn, sql, params + [limit + 1])]
+
+        keys = [(row['book_name'], row['id']) for row in rows]
+        return paginate(query, rows, keys, limit)
 
     def get_book(self, book_id):
         """Get a single book with its chapters."""
-        if not book_id:
+        try:
+            book_id = int(book_id)
+        except (TypeError, ValueError):
             return None
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            return self.load_books(conn, [book_id])[book_id]
+
+    def get_batch(self, query):
+        """Resolve many books, topic lists and shelf lists on one connection.
+
+        ?books=<book ids>&topics=<chapter ids>&shelves=<library ids>; each
+        requested resource maps every id to what /api/book, /api/topics or
+        /api/shelves would return for it.
+        """
+        requested = {name: batch_ids(query, name) for name in BATCH_RESOURCES}
+        loaders = {'books': self.load_books, 'topics': self.load_topics,
+                   'shelves': self.load_shelves}
+
+        result = {}
+        with db_connection() as conn:
+            for name, ids in requested.items():
+                if ids:
+                    result[name] = loaders[name](conn, ids)
+        return result
+
+    def load_books(self, conn, book_ids):
+        """Books with their chapters, tags and topics, as {id: book or None}."""
+        placeholders, params = in_list(book_ids)
+        books = dict.fromkeys(book_ids)
 
-        # Get book info
-        cursor.execute("""
+        for row in fetch_rows(conn, f"""
             SELECT
                 b.id,
                 b.name,
@@ -345,75 +1129,93 @@ class QuarexHandler(SimpleHTTPRequestHandler):
             JOIN shelves s ON b.shelf_id = s.id
             JOIN libraries l ON s.library_id = l.id
             JOIN library_types lt ON l.library_type_id = lt.id
-            WHERE b.id = ?
-        """, (book_id,))
-
-        book_row = cursor.fetchone()
-        if not book_row:
-            conn.close()
-            return None
-
-        book = dict_from_row(book_row)
-
-        # Get chapters
-        cursor.execute("""
-            SELECT c.id, c.name, c.sort_order
+            WHERE b.id IN ({placeholders})
+        """, params):
+            books[row['id']] = dict_from_row(row)
+            books[row['id']]['chapters'] = []
+
+        # Chapters, then their tags and topics, for every book at once
+        chapters_by_id = {}
+        for row in fetch_rows(conn, f"""
+            SELECT c.book_id, c.id, c.name, c.sort_order
             FROM chapters c
-            WHERE c.book_id = ?
-            ORDER BY c.sort_order
-        """, (book_id,))
-        book['chapters'] = [dict_from_row(row) for row in cursor.fetchall()]
-
-        # Get tags and topics for each chapter
-        for chapter in book['chapters']:
-            cursor.execute("""
-                SELECT t.slug, t.label, t.tier
-                FROM tags t
-                JOIN chapter_tags ct ON t.id = ct.tag_id
-                WHERE ct.chapter_id = ?
-            """, (chapter['id'],))
-            chapter['tags'] = [dict_from_row(row) for row in cursor.fetchall()]
-
-            cursor.execute("""
-                SELECT id, question, sort_order
-                FROM topics
-                WHERE chapter_id = ?
-                ORDER BY sort_order
-            """, (chapter['id'],))
-            chapter['topics'] = [dict_from_row(row) for row in cursor.fetchall()]
-
-        conn.close()
-        return book
+            WHERE c.book_id IN ({placeholders})
+            ORDER BY c.book_id, c.sort_order
+        """, params):
+            chapter = {'id': row['id'], 'name': row['name'], 'sort_order': row['sort_order'],
+                       'tags': [], 'topics': []}
+            books[row['book_id']]['chapters'].append(chapter)
+            chapters_by_id[row['id']] = chapter
+
+        for chapter_id, slug, label, tier in fetch_rows(conn, f"""
+            SELECT ct.chapter_id, t.slug, t.label, t.tier
+            FROM chapters c
+            JOIN chapter_tags ct ON ct.chapter_id = c.id
+            JOIN tags t ON t.id = ct.tag_id
+            WHERE c.book_id IN ({placeholders})
+            ORDER BY ct.chapter_id, ct.tag_id
+        """, params):
+            chapters_by_id[chapter_id]['tags'].append(
+                {'slug': slug, 'label': label, 'tier': tier})
+
+        for chapter_id, topic_id, question, sort_order in fetch_rows(conn, f"""
+            SELECT tp.chapter_id, tp.id, tp.question, tp.sort_order
+            FROM chapters c
+            JOIN topics tp ON tp.chapter_id = c.id
+            WHERE c.book_id IN ({placeholders})
+            ORDER BY tp.chapter_id, tp.sort_order
+        """, params):
+            chapters_by_id[chapter_id]['topics'].append(
+                {'id': topic_id, 'question': question, 'sort_order': sort_order})
+
+        return books
+
+    def load_topics(self, conn, chapter_ids):
+        """Topics of several chapters, as {chapter id: [topic, ...]}."""
+        placeholders, params = in_list(chapter_ids)
+        topics = {chapter_id: [] for chapter_id in chapter_ids}
+        for row in fetch_rows(conn, f"""
+            SELECT chapter_id, id, question, sort_order
+            FROM topics
+            WHERE chapter_id IN ({placeholders})
+            ORDER BY chapter_id, sort_order
+        """, params):
+            topics[row['chapter_id']].append(
+                {'id': row['id'], 'question': row['question'], 'sort_order': row['sort_order']})
+        return topics
+
+    def load_shelves(self, conn, library_ids):
+        """Shelves of several libraries, as {library id: [shelf, ...]}."""
+        placeholders, params = in_list(library_ids)
+        shelves = {library_id: [] for library_id in library_ids}
+        for row in fetch_rows(conn, f"""
+            SELECT library_id, id, name, slug
+            FROM shelves
+            WHERE library_id IN ({placeholders})
+            ORDER BY library_id, name
+        """, params):
+            shelves[row['library_id']].append(
+                {'id': row['id'], 'name': row['name'], 'slug': row['slug']})
+        return shelves
 
     def get_topics(self, chapter_id=None):
         """Get topics for a chapter."""
         if not chapter_id:
             return []
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, question, sort_order
-            FROM topics
-            WHERE chapter_id = ?
-            ORDER BY sort_order
-        """, (chapter_id,))
-        result = [dict_from_row(row) for row in cursor.fetchall()]
-        conn.close()
-        return result
-
-    def search_topics(self, query):
-        """Search topics by full-text query. Returns topics with full lineage."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            rows = fetch_rows(conn, """
+                SELECT id, question, sort_order
+                FROM topics
+                WHERE chapter_id = ?
+                ORDER BY sort_order
+            """, (chapter_id,))
+        return [dict_from_row(row) for row in rows]
 
+    def topic_search_sql(self, query, after=None):
+        """Build the topic search query; `after` is a (score, topic id) keyset position."""
         search_text = query.get('q', [''])[0]
-        limit = int(query.get('limit', ['50'])[0])
         tags = query.get('tags', [''])[0]
 
-        if not search_text:
-            conn.close()
-            return []
-
         # Build the query
         sql = """
             SELECT
@@ -427,7 +1229,8 @@ class QuarexHandler(SimpleHTTPRequestHandler):
                 s.slug as shelf_slug,
                 l.name as library,
                 l.slug as library_slug,
-                lt.name as library_type
+                lt.name as library_type,
+                bm25(topics_fts) as score
             FROM topics_fts
             JOIN topics tp ON topics_fts.rowid = tp.id
             JOIN chapters c ON tp.chapter_id = c.id
@@ -443,7 +1246,7 @@ class QuarexHandler(SimpleHTTPRequestHandler):
         if tags:
             tag_list = [t.strip() for t in tags.split(',') if t.strip()]
             if tag_list:
-                placeholders = ','.join(['?' for _ in tag_list])
+                placeholders, tag_params = in_list(tag_list)
                 conditions.append(f"""
                     c.id IN (
                         SELECT ct.chapter_id FROM chapter_tags ct
@@ -451,75 +1254,334 @@ class QuarexHandler(SimpleHTTPRequestHandler):
                         WHERE t.slug IN ({placeholders})
                     )
                 """)
-                params.extend(tag_list)
+                params.extend(tag_params)
 
-        sql += " WHERE " + " AND ".join(conditions)
-        sql += f" ORDER BY rank LIMIT ?"
-        params.append(limit)
+        if after is not None:
+            conditions.append("(bm25(topics_fts), tp.id) > (?, ?)")
+            params.extend(after)
 
-        cursor.execute(sql, params)
-        result = [dict_from_row(row) for row in cursor.fetchall()]
-        conn.close()
-        return result
+        sql += " WHERE " + " AND ".join(conditions)
+        # bm25() is what ORDER BY rank uses; tp.id breaks ties for the keyset
+        sql += " ORDER BY score, tp.id LIMIT ?"
+        return sql, params
 
-    def get_stats(self):
-        """Get database statistics."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
+    def search_topics(self, query):
+        """Search topics by full-text query. Returns topics with full lineage."""
+        if not query.get('q', [''])[0]:
+            return []
 
-        stats = {}
+        limit = page_limit(query, DEFAULT_TOPIC_PAGE)
+        after = decode_cursor(query)
+        sql, params = self.topic_search_sql(query, after)
 
-        cursor.execute("SELECT COUNT(*) FROM library_types")
-        stats['library_types'] = cursor.fetchone()[0]
+        with db_connection() as conn:
+            rows = [dict_from_row(row) for row in fetch_rows(conn, sql, params + [limit + 1])]
 
-        cursor.execute("SELECT COUNT(*) FROM libraries")
-        stats['libraries'] = cursor.fetchone()[0]
+        keys = [(row.pop('score'), row['topic_id']) for row in rows]
+        return paginate(query, rows, keys, limit)
 
-        cursor.execute("SELECT COUNT(*) FROM shelves")
-        stats['shelves'] = cursor.fetchone()[0]
+    def get_stats(self):
+        """Get database statistics, as counted by the builder."""
+        with db_connection() as conn:
+            rows = fetch_rows(conn, "SELECT name, count FROM catalog_counts ORDER BY rowid")
+        return {row[0]: row[1] for row in rows}
 
-        cursor.execute("SELECT COUNT(*) FROM books")
-        stats['books'] = cursor.fetchone()[0]
 
-        cursor.execute("SELECT COUNT(*) FROM chapters")
-        stats['chapters'] = cursor.fetchone()[0]
+catalog = CatalogAPI()
 
-        try:
-            cursor.execute("SELECT COUNT(*) FROM topics")
-            stats['topics'] = cursor.fetchone()[0]
-        except:
-            stats['topics'] = 0
 
-        cursor.execute("SELECT COUNT(*) FROM tags")
-        stats['tags'] = cursor.fetchone()[0]
+def static_file(root, url_path):
+    """Resolve a URL path to a file under `root`, as SimpleHTTPRequestHandler does.
 
-        cursor.execute("SELECT COUNT(*) FROM curricula")
-        stats['curricula'] = cursor.fetchone()[0]
+    Directories map to their index.html. Like translate_path(), parts that
+    carry a separator or drive of their own (an encoded backslash, "C:")
+    are dropped. Returns None for anything that is missing or would escape
+    the root.
+    """
+    parts = []
+    for part in urllib.parse.unquote(url_path).split('/'):
+        if not part or part == os.curdir:
+            continue
+        if part == os.pardir:
+            return None
+        if (os.path.dirname(part) or os.path.splitdrive(part)[0]
+                or os.sep in part or (os.altsep and os.altsep in part)):
+            continue
+        parts.append(part)
+    path = root.joinpath(*parts)
+    if path.is_dir():
+        path = path / 'index.html'
+    if not path.resolve().is_relative_to(root.resolve()):
+        return None
+    return path if path.is_file() else None
+
+
+class AsyncQuarexServer:
+    """asyncio front end with the same routes as QuarexHandler.
+
+    Each client connection is a coroutine, so idle keep-alive connections
+    and slow readers cost no thread. Queries and file reads run on a
+    bounded thread pool sized like the connection pool.
+
+    A pooled connection is only ever checked out inside one executor call
+    and returned before that call ends - streams included - so a request
+    holding a connection always has a thread to finish on, and requests
+    waiting for a connection cannot starve it.
+    """
+
+    def __init__(self, host, port, workers, root=None):
+        self.host = host
+        self.port = port
+        self.root = Path(root or os.getcwd())
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='quarex-db')
+
+    async def run(self, func, *args):
+        """Run a blocking call on the executor."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def serve_forever(self):
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests on one connection until it closes or goes idle."""
+        try:
+            while True:
+                request = await asyncio.wait_for(self.read_request(reader), KEEPALIVE_TIMEOUT)
+                if request is None:
+                    break
+                method, target, version, headers = request
+                connection = headers.get('connection', '').lower()
+                keep_alive = (version == 'HTTP/1.1' and connection != 'close'
+                              or version == 'HTTP/1.0' and connection == 'keep-alive')
+                if not await self.handle_request(method, target, version, headers, writer, keep_alive):
+                    break
+        except (asyncio.TimeoutError, ConnectionError, ValueError):
+            # Idle timeout, client gone, or a malformed / oversized request line
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def read_request(self, reader):
+        """Read a request line and headers; None at end of stream."""
+        line = await reader.readline()
+        if not line:
+            return None
+        parts = line.decode('latin-1').split()
+        if len(parts) != 3:
+            raise ValueError("bad request line")
+        method, target, version = parts
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return method, target, version, headers
+
+    async def handle_request(self, method, target, version, headers, writer, keep_alive):
+        """Answer one request; returns whether the connection stays open."""
+        parsed = urllib.parse.urlparse(target)
+        path = parsed.path
+        accept_encoding = headers.get('accept-encoding', '')
+
+        if method not in ('GET', 'HEAD'):
+            await self.send(writer, error_text(501, 'Unsupported method'), keep_alive)
+        elif method == 'GET' and path in API_PATHS:
+            start = time.perf_counter()
+            response, rows = await self.run(self.api_response, path, parsed.query,
+                                            accept_encoding, headers.get('if-none-match', ''))
+            if isinstance(response, StreamQuery):
+                streamed, keep_alive = await self.stream(writer, response, version, keep_alive)
+                rows += streamed
+            else:
+                await self.send(writer, response, keep_alive)
+            metrics.end_request(path, time.perf_counter() - start, rows)
+        elif method == 'GET' and path == '/api/_metrics':
+            await self.send(writer, metrics_response(), keep_alive)
+        elif path == '/' or path == '/index.html':
+            response = await self.run(html_response, accept_encoding)
+            await self.send(writer, response or error_text(404, 'HTML file not found'),
+                            keep_alive, head=method == 'HEAD')
+        else:
+            await self.send_file(writer, path, headers, keep_alive, head=method == 'HEAD')
+        return keep_alive
+
+    @staticmethod
+    def api_response(path, query_string, accept_encoding, if_none_match):
+        """api_response() plus the rows it read, run on an executor thread."""
+        metrics.begin_request()
+        response = api_response(path, query_string, accept_encoding, if_none_match)
+        return response, metrics.request_rows()
+
+    @staticmethod
+    def next_piece(pieces):
+        """Next piece of a streamed array (None when done) plus the rows it read."""
+        metrics.begin_request()
+        piece = next(pieces, None)
+        return piece, metrics.request_rows()
+
+    def head_bytes(self, status, headers, keep_alive):
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+                 f"Date: {email.utils.formatdate(usegmt=True)}"]
+        lines += [f"{name}: {value}" for name, value in headers]
+        lines.append('Connection: keep-alive' if keep_alive else 'Connection: close')
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    async def send(self, writer, response, keep_alive, head=False):
+        """Send a complete Response."""
+        headers = list(response.headers)
+        if response.body is not None:
+            headers.append(('Content-Length', str(len(response.body))))
+        writer.write(self.head_bytes(response.status, headers, keep_alive))
+        if response.body is not None and not head:
+            writer.write(response.body)
+        await writer.drain()
+
+    async def stream(self, writer, stream, version, keep_alive):
+        """Send a StreamQuery batch by batch; returns (rows, keep_alive).
+
+        Each batch is fetched on the executor and written once the client
+        has drained the previous one, so a slow reader holds neither a
+        pooled connection nor a thread.
+        """
+        chunked = version == 'HTTP/1.1'
+        keep_alive = keep_alive and chunked
+        writer.write(self.head_bytes(200, stream_headers(stream.encoding, chunked), keep_alive))
 
-        conn.close()
-        return stats
+        encoder = StreamEncoder(stream.encoding, chunked)
+        pieces = iter_json_rows(stream)
+        rows = 0
+        try:
+            while True:
+                piece, count = await self.run(self.next_piece, pieces)
+                rows += count
+                if piece is None:
+                    break
+                writer.write(encoder.encode(piece))
+                await writer.drain()
+            writer.write(encoder.finish())
+            await writer.drain()
+        finally:
+            pieces.close()
+        return rows, keep_alive
+
+    async def send_file(self, writer, url_path, headers, keep_alive, head=False):
+        """Send a static file from the root, reading it on the executor."""
+        path = await self.run(static_file, self.root, url_path)
+        if path is None:
+            await self.send(writer, error_text(404, 'File not found'), keep_alive)
+            return
+
+        f = await self.run(open, path, 'rb')
+        try:
+            st = os.fstat(f.fileno())
+            last_modified = email.utils.formatdate(st.st_mtime, usegmt=True)
+            if headers.get('if-modified-since') == last_modified:
+                await self.send(writer, Response(304, [('Last-Modified', last_modified)], None),
+                                keep_alive)
+                return
+
+            content_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+            writer.write(self.head_bytes(200, [
+                ('Content-Type', content_type),
+                ('Content-Length', str(st.st_size)),
+                ('Last-Modified', last_modified),
+            ], keep_alive))
+            if not head:
+                while True:
+                    data = await self.run(f.read, STATIC_CHUNK_BYTES)
+                    if not data:
+                        break
+                    writer.write(data)
+                    await writer.drain()
+            await writer.drain()
+        finally:
+            f.close()
+
+
+def error_text(status, message):
+    """A plain-text error Response."""
+    return Response(status, [('Content-Type', 'text/plain; charset=utf-8')], message.encode('utf-8'))
 
 
 def main():
     """Run the server."""
-    if not DB_PATH.exists():
-        print(f"Error: Database not found at {DB_PATH}")
+    global pool
+
+    parser = argparse.ArgumentParser(description='Quarex database explorer server')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Pooled read-only connections (default {DEFAULT_WORKERS})')
+    parser.add_argument('--immutable', action='store_true',
+                        help='Open the database as immutable (it must not change while serving)')
+    parser.add_argument('--single-thread', action='store_true',
+                        help='Serve one request at a time')
+    parser.add_argument('--asyncio', action='store_true',
+                        help='Serve connections on an asyncio loop, with queries on --workers threads')
+    parser.add_argument('--db', type=Path, default=DB_PATH,
+                        help=f'Catalog database (default {DB_PATH})')
+    parser.add_argument('--port', type=int, default=PORT,
+                        help=f'Port to listen on (default {PORT})')
+    args = parser.parse_args()
+    db_path = args.db
+    logging.basicConfig(format='[%(levelname)s] %(message)s')
+
+    if not db_path.exists():
+        print(f"Error: Database not found at {db_path}")
         print("Run build-quarex-db.py first to create the database.")
         return 1
 
-    server = HTTPServer(('localhost', PORT), QuarexHandler)
+    pool = ConnectionPool(db_path, size=max(1, args.workers), immutable=args.immutable)
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'catalog_counts'")
+        if cursor.fetchone() is None:
+            print(f"Error: {db_path} predates the summary tables.")
+            print("Run build-quarex-db.py to rebuild the database.")
+            pool.close()
+            return 1
+    facets = get_facet_index()
+    explorer_page.load()
+
+    if args.asyncio:
+        server = AsyncQuarexServer('localhost', args.port, pool.size)
+        mode = f'asyncio, {pool.size} query threads'
+    elif args.single_thread:
+        server = HTTPServer(('localhost', args.port), QuarexHandler)
+        mode = 'single thread'
+    else:
+        server = ThreadingHTTPServer(('localhost', args.port), QuarexHandler)
+        server.daemon_threads = True
+        mode = f'threaded, {pool.size} connections'
     print(f"Quarex Database Explorer")
     print(f"========================")
-    print(f"Database: {DB_PATH}")
-    print(f"Server running at: http://localhost:{PORT}")
+    print(f"Database: {db_path}")
+    print(f"Mode: {mode}{', immutable' if args.immutable else ''}")
+    print(f"Facet index: {len(facets.used_tags)} tags over {len(facets.book_ranges)} books")
+    print(f"Server running at: http://localhost:{args.port}")
     print(f"Press Ctrl+C to stop.")
     print()
 
     try:
-        server.serve_forever()
+        if args.asyncio:
+            asyncio.run(server.serve_forever())
+        else:
+            server.serve_forever()
     except KeyboardInterrupt:
         print("\nShutting down...")
-        server.shutdown()
+        if not args.asyncio:
+            server.shutdown()
+    finally:
+        if args.asyncio:
+            server.executor.shutdown(wait=False)
+        pool.close()
 
     return 0
 
@@ -0,0 +1,391 @@
+"""
+Shared in-memory model of the Quarex libraries tree.
+
+The DB tools, the auto-taggers and the scrapers' compare/convert scripts
+all read the same library JSON files. This module gives them one walker
+and one loader instead of each doing its own os.walk + json.load:
+
+    walk_library_files()  - cached (file, library type, library, shelf) list
+    read_json(path)       - the single place book/library JSON is decoded
+    load_file_books(path) - Book objects for a plain book or a nested-shelves file
+    load_catalog()        - Library -> Shelf -> Book -> Chapter for the whole tree
+
+The model classes use __slots__ and intern their repeated strings (tags,
+shelf and library names). Topics are the bulk of the data and most tools
+never look at them, so they are read on first access to Chapter.topics
+unless with_topics=True is passed.
+
+load_catalog() keeps a pickled snapshot of the parsed tree in database/.
+Each library directory is stored with a signature of its JSON files'
+names, mtimes and sizes; only directories whose signature changed are
+re-read from JSON, so a warm load is a single unpickle plus a scandir
+per directory. Books from the snapshot come with their topics filled in.
+
+Scripts outside tools/ import this by adding tools/ to sys.path.
+"""
+
+import json
+import os
+import pickle
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+from quarex_json_stream import is_legacy_library, iter_legacy_books
+
+LIBRARIES_DIR = Path(__file__).resolve().parent.parent / "libraries"
+SNAPSHOT_PATH = Path(__file__).resolve().parent.parent / "database" / "catalog-snapshot.pickle"
+SNAPSHOT_VERSION = 1
+
+LIBRARY_TYPE_DIRS = [
+    "event-libraries",
+    "geography-libraries",
+    "infrastructure-libraries",
+    "knowledge-libraries",
+    "perspectives-libraries",
+    "politician-libraries",
+    "practical-libraries",
+    "questions-libraries",
+]
+
+_intern = sys.intern
+
+
+def default_library_paths(libraries_dir=LIBRARIES_DIR):
+    """Return the library type directories under a libraries/ folder."""
+    return [Path(libraries_dir) / name for name in LIBRARY_TYPE_DIRS]
+
+
+def display_name(slug):
+    """Turn a directory name like 'contested-issues' into 'Contested Issues'."""
+    return slug.replace('-', ' ').title()
+
+
+def library_type_name(lib_path):
+    """Display name of a library type directory ('knowledge-libraries' -> 'Knowledge')."""
+    return display_name(Path(lib_path).name.replace('-libraries', ''))
+
+
+# =============================================================================
+# MODEL
+# =============================================================================
+
+class Chapter:
+    """A chapter's name and tags; topics are loaded on demand."""
+    __slots__ = ('book', 'name', 'tags', '_topics')
+
+    def __init__(self, book, name, tags, topics=None):
+        self.book = book
+        self.name = name
+        self.tags = tags
+        self._topics = topics
+
+    @property
+    def topics(self):
+        if self._topics is None:
+            self.book.load_topics()
+        return self._topics
+
+    def __repr__(self):
+        return f"Chapter({self.name!r})"
+
+
+class Book:
+    """One book: a standalone file, or one entry of a nested-shelves file."""
+    __slots__ = ('path', 'name', 'created_by', 'shelf', 'chapters', 'legacy_index')
+
+    def __init__(self, path, name, created_by=None, shelf=None, legacy_index=None):
+        self.path = path
+        self.name = name
+        self.created_by = created_by
+        self.shelf = shelf
+        self.chapters = []
+        # Position within a nested-shelves file, None for standalone books
+        self.legacy_index = legacy_index
+
+    def load_topics(self):
+        """Read this book's topics from disk into its chapters."""
+        if self.legacy_index is None:
+            data = read_json(self.path)
+        else:
+            for i, (_, data) in enumerate(iter_legacy_books(self.path)):
+                if i == self.legacy_index:
+                    break
+        for chapter, raw in zip(self.chapters, data.get('chapters', [])):
+            chapter._topics = _topics_of(raw)
+
+    def __repr__(self):
+        return f"Book({self.name!r}, {len(self.chapters)} chapters)"
+
+
+class Shelf:
+    __slots__ = ('library', 'name', 'books')
+
+    def __init__(self, library, name):
+        self.library = library
+        self.name = name
+        self.books = []
+
+    def __repr__(self):
+        return f"Shelf({self.name!r}, {len(self.books)} books)"
+
+
+class Library:
+    __slots__ = ('library_type', 'name', 'shelves')
+
+    def __init__(self, library_type, name):
+        self.library_type = library_type
+        self.name = name
+        self.shelves = {}
+
+    def shelf(self, name):
+        """Get or create a shelf by name."""
+        name = _intern(name)
+        if name not in self.shelves:
+            self.shelves[name] = Shelf(self, name)
+        return self.shelves[name]
+
+    def __repr__(self):
+        return f"Library({self.library_type!r}, {self.name!r})"
+
+
+# =============================================================================
+# LOADING
+# =============================================================================
+
+def read_json(path):
+    """Decode one library JSON file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _topics_of(chapter):
+    if not isinstance(chapter, dict):
+        return []
+    return [topic for topic in chapter.get('topics', []) if isinstance(topic, str)]
+
+
+def _fill_chapters(book, chapters, with_topics):
+    for i, chapter in enumerate(chapters):
+        if isinstance(chapter, dict):
+            name = chapter.get('name', f'Chapter {i+1}')
+            tags = tuple(_intern(tag) for tag in chapter.get('tags', []) if isinstance(tag, str))
+        else:
+            name = str(chapter)
+            tags = ()
+        topics = _topics_of(chapter) if with_topics else None
+        book.chapters.append(Chapter(book, name, tags, topics))
+
+
+def load_book(path, with_topics=False):
+    """Load a standalone book file, or None if it has no chapters."""
+    path = Path(path)
+    data = read_json(path)
+    if not isinstance(data, dict) or not data.get('chapters'):
+        return None
+    name = data.get('name', path.name.replace('.json', '').replace('-', ' ').title())
+    book = Book(path, name, data.get('created_by'))
+    _fill_chapters(book, data['chapters'], with_topics)
+    return book
+
+
+def load_file_books(path, with_topics=False):
+    """Return (shelf_name, Book) pairs for any library file.
+
+    Standalone books give a single pair with shelf_name None; nested-shelves
+    files are streamed and give one pair per book with the file's shelf names.
+    """
+    path = Path(path)
+    if not is_legacy_library(path):
+        book = load_book(path, with_topics)
+        return [(None, book)] if book else []
+
+    books = []
+    for i, (shelf_name, data) in enumerate(iter_legacy_books(path)):
+        if not data.get('chapters'):
+            continue
+        book = Book(path, data.get('name', f'{shelf_name} Book {i+1}'), data.get('created_by'),
+                    legacy_index=i)
+        _fill_chapters(book, data['chapters'], with_topics)
+        books.append((_intern(shelf_name), book))
+    return books
+
+
+@lru_cache(maxsize=None)
+def _walk(library_paths):
+    entries = []
+    for lib_path in library_paths:
+        if not lib_path.exists():
+            continue
+
+        type_name = _intern(library_type_name(lib_path))
+
+        for library_dir in sorted(lib_path.iterdir()):
+            if not library_dir.is_dir() or library_dir.name.startswith('_'):
+                continue
+
+            library_name = _intern(display_name(library_dir.name))
+
+            # Library-level files, e.g. the nested-shelves compendiums in
+            # politician-libraries; any plain book here goes on a General shelf
+            for book_file in sorted(library_dir.glob('*.json')):
+                if not book_file.name.startswith('_'):
+                    entries.append((book_file, type_name, library_name, "General"))
+
+            for shelf_dir in sorted(library_dir.iterdir()):
+                if not shelf_dir.is_dir() or shelf_dir.name.startswith('_'):
+                    continue
+
+                shelf_name = _intern(display_name(shelf_dir.name))
+                for book_file in sorted(shelf_dir.glob('*.json')):
+                    if not book_file.name.startswith('_'):
+                        entries.append((book_file, type_name, library_name, shelf_name))
+
+        # questions-libraries keeps its books flat
+        if 'questions' in lib_path.name:
+            for book_file in sorted(lib_path.glob('*.json')):
+                if not book_file.name.startswith('_'):
+                    entries.append((book_file, "Questions", "Questions", "General"))
+
+    return tuple(entries)
+
+
+def walk_library_files(library_paths=None):
+    """Return (file, library_type, library, shelf) for every candidate book file.
+
+    The walk is done once per process and cached; pass the same paths to
+    get the cached result.
+    """
+    if library_paths is None:
+        library_paths = default_library_paths()
+    return _walk(tuple(Path(p) for p in library_paths))
+
+
+# =============================================================================
+# SNAPSHOT
+# =============================================================================
+
+def _dir_signature(directory):
+    """(name, mtime, size) of every JSON file in a directory."""
+    files = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith('.json') and entry.is_file():
+                st = entry.stat()
+                files.append((entry.name, st.st_mtime_ns, st.st_size))
+    files.sort()
+    return tuple(files)
+
+
+def _book_record(shelf_name, book):
+    chapters = tuple((chapter.name, chapter.tags, chapter.topics) for chapter in book.chapters)
+    return (shelf_name, book.name, book.created_by, book.legacy_index, chapters)
+
+
+def _book_from_record(path, record):
+    shelf_name, name, created_by, legacy_index, chapters = record
+    book = Book(path, name, created_by, legacy_index=legacy_index)
+    book.chapters = [Chapter(book, *chapter) for chapter in chapters]
+    return shelf_name, book
+
+
+def _file_records(book_file):
+    """Snapshot records for one library file (always with topics)."""
+    try:
+        file_books = load_file_books(book_file, with_topics=True)
+    except (OSError, ValueError) as e:
+        print(f"Error loading {book_file}: {e}")
+        return ()
+    return tuple(_book_record(shelf_name, book) for shelf_name, book in file_books)
+
+
+def read_snapshot(snapshot_path=SNAPSHOT_PATH):
+    """Return {directory: (signature, {file name: records})}, or {} if unusable."""
+    try:
+        with open(snapshot_path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return {}
+    if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+        return {}
+    return snapshot['directories']
+
+
+def write_snapshot(directories, snapshot_path=SNAPSHOT_PATH):
+    """Write the snapshot next to its final path and swap it in."""
+    snapshot_path = Path(snapshot_path)
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = snapshot_path.with_name(snapshot_path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'version': SNAPSHOT_VERSION, 'directories': directories}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, snapshot_path)
+
+
+def _iter_file_books(library_paths, with_topics, snapshot_path):
+    """Yield (entry, file_books) for the walk, reading JSON only where needed."""
+    entries = walk_library_files(library_paths)
+
+    if snapshot_path is None:
+        for entry in entries:
+            try:
+                yield entry, load_file_books(entry[0], with_topics)
+            except (OSError, ValueError) as e:
+                print(f"Error loading {entry[0]}: {e}")
+        return
+
+    # Files sharing a directory also share their type / library / shelf
+    by_dir = {}
+    for entry in entries:
+        by_dir.setdefault(entry[0].parent, []).append(entry)
+
+    snapshot = read_snapshot(snapshot_path)
+    directories = {}
+    changed = False
+
+    for directory, dir_entries in by_dir.items():
+        key = str(directory)
+        signature = _dir_signature(directory)
+        cached = snapshot.get(key)
+        if cached is not None and cached[0] == signature:
+            records = cached[1]
+        else:
+            records = {entry[0].name: _file_records(entry[0]) for entry in dir_entries}
+            changed = True
+        directories[key] = (signature, records)
+
+        for entry in dir_entries:
+            book_file = entry[0]
+            yield entry, [_book_from_record(book_file, record)
+                          for record in records.get(book_file.name, ())]
+
+    if changed or directories.keys() != snapshot.keys():
+        try:
+            write_snapshot(directories, snapshot_path)
+        except OSError as e:
+            print(f"Could not write catalog snapshot {snapshot_path}: {e}")
+
+
+def load_catalog(library_paths=None, with_topics=False, snapshot_path=SNAPSHOT_PATH):
+    """Load the whole tree as {(library_type, library_name): Library}.
+
+    Pass snapshot_path=None to read every file from JSON and leave the
+    snapshot alone.
+    """
+    libraries = {}
+    for entry, file_books in _iter_file_books(library_paths, with_topics, snapshot_path):
+        _, type_name, library_name, shelf_name = entry
+        if not file_books:
+            continue
+
+        key = (type_name, library_name)
+        if key not in libraries:
+            libraries[key] = Library(type_name, library_name)
+        library = libraries[key]
+
+        for file_shelf_name, book in file_books:
+            shelf = library.shelf(file_shelf_name or shelf_name)
+            book.shelf = shelf
+            shelf.books.append(book)
+
+    return libraries
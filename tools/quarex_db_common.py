@@ -0,0 +1,204 @@
+"""
+Shared helpers for the Quarex catalog database tools.
+
+Imported by build-quarex-db.py and add-books-to-db.py, which both run from
+the tools directory, so no package setup is needed.
+"""
+
+import re
+
+
+def name_to_slug(name):
+    """Convert a name to a slug."""
+    slug = name.lower()
+    slug = re.sub(r'[^a-z0-9\s-]', '', slug)
+    slug = re.sub(r'\s+', '-', slug)
+    slug = re.sub(r'-+', '-', slug)
+    return slug.strip('-')
+
+
+class HierarchyResolver:
+    """Maps library type / library / shelf names to ids for a whole run.
+
+    Existing rows are read once up front; new rows are inserted on the
+    caller's connection without committing, so they land in the same
+    transaction as the books that reference them.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT name, id FROM library_types")
+        self.library_types = {row[0]: row[1] for row in cursor.fetchall()}
+
+        cursor.execute("SELECT library_type_id, name, id FROM libraries")
+        self.libraries = {(row[0], row[1]): row[2] for row in cursor.fetchall()}
+
+        cursor.execute("SELECT library_id, name, id FROM shelves")
+        self.shelves = {(row[0], row[1]): row[2] for row in cursor.fetchall()}
+
+        # Rows inserted by this resolver, for build summaries
+        self.created = {"library_types": 0, "libraries": 0, "shelves": 0}
+
+    def library_type(self, name):
+        """Get or create a library type."""
+        if name not in self.library_types:
+            cursor = self.conn.cursor()
+            cursor.execute("INSERT INTO library_types (name) VALUES (?)", (name,))
+            self.library_types[name] = cursor.lastrowid
+            self.created["library_types"] += 1
+        return self.library_types[name]
+
+    def library(self, library_type_id, name, slug=None, description=None):
+        """Get or create a library."""
+        key = (library_type_id, name)
+        if key not in self.libraries:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                INSERT INTO libraries (library_type_id, name, slug, description)
+                VALUES (?, ?, ?, ?)
+            """, (library_type_id, name, slug, description))
+            self.libraries[key] = cursor.lastrowid
+            self.created["libraries"] += 1
+        return self.libraries[key]
+
+    def shelf(self, library_id, name, slug=None):
+        """Get or create a shelf."""
+        key = (library_id, name)
+        if key not in self.shelves:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                INSERT INTO shelves (library_id, name, slug)
+                VALUES (?, ?, ?)
+            """, (library_id, name, slug))
+            self.shelves[key] = cursor.lastrowid
+            self.created["shelves"] += 1
+        return self.shelves[key]
+
+    def resolve(self, library_type_name, library_name, shelf_name):
+        """Return the shelf id for a type / library / shelf path, creating rows as needed."""
+        library_type_id = self.library_type(library_type_name)
+        library_id = self.library(library_type_id, library_name, name_to_slug(library_name))
+        return self.shelf(library_id, shelf_name, name_to_slug(shelf_name))
+
+
+# Global counts kept in catalog_counts, in the order /api/stats reports them
+CATALOG_COUNTS = ('library_types', 'libraries', 'shelves', 'books', 'chapters',
+                  'topics', 'tags', 'curricula')
+
+
+def create_summary_tables(conn):
+    """Create the materialized count tables (no-op for ones that already exist)."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_counts (
+            name TEXT PRIMARY KEY,
+            count INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tag_usage (
+            tag_id INTEGER PRIMARY KEY,
+            usage_count INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS shelf_stats (
+            shelf_id INTEGER PRIMARY KEY,
+            book_count INTEGER NOT NULL,
+            chapter_count INTEGER NOT NULL,
+            topic_count INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS library_stats (
+            library_id INTEGER PRIMARY KEY,
+            shelf_count INTEGER NOT NULL,
+            book_count INTEGER NOT NULL,
+            chapter_count INTEGER NOT NULL,
+            topic_count INTEGER NOT NULL
+        )
+    """)
+
+
+class SummaryTracker:
+    """Keeps the materialized count tables in step with a run's changes.
+
+    Callers touch() every shelf and tag whose books they add or delete;
+    refresh() then recounts only those shelf_stats and tag_usage rows and
+    re-derives library_stats and catalog_counts from the (small) shelf
+    table. A database without summaries yet is counted in full.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.shelves = set()
+        self.tags = set()
+        create_summary_tables(conn)
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM catalog_counts LIMIT 1")
+        self.full = cursor.fetchone() is None
+
+    def touch(self, shelf_id, tag_ids=()):
+        """Mark a shelf, and the tags on its changed chapters, for recounting."""
+        self.shelves.add(shelf_id)
+        self.tags.update(tag_ids)
+
+    def refresh(self):
+        """Bring the summary tables up to date, without committing."""
+        cursor = self.conn.cursor()
+
+        if self.full:
+            cursor.execute("DELETE FROM shelf_stats")
+            cursor.execute("DELETE FROM tag_usage")
+            cursor.execute("SELECT id FROM shelves")
+            self.shelves = {row[0] for row in cursor.fetchall()}
+            cursor.execute("SELECT DISTINCT tag_id FROM chapter_tags")
+            self.tags = {row[0] for row in cursor.fetchall()}
+
+        cursor.executemany("""
+            INSERT OR REPLACE INTO shelf_stats (shelf_id, book_count, chapter_count, topic_count)
+            SELECT s.id,
+                   (SELECT COUNT(*) FROM books b WHERE b.shelf_id = s.id),
+                   (SELECT COALESCE(SUM(b.chapter_count), 0) FROM books b WHERE b.shelf_id = s.id),
+                   (SELECT COUNT(*) FROM topics tp
+                    JOIN chapters c ON tp.chapter_id = c.id
+                    JOIN books b ON c.book_id = b.id WHERE b.shelf_id = s.id)
+            FROM shelves s WHERE s.id = ?
+        """, [(shelf_id,) for shelf_id in self.shelves])
+        cursor.executemany("""
+            INSERT OR REPLACE INTO tag_usage (tag_id, usage_count)
+            SELECT ?, COUNT(*) FROM chapter_tags WHERE tag_id = ?
+        """, [(tag_id, tag_id) for tag_id in self.tags])
+        # Shelves pruned after their last book went away, tags no longer used
+        cursor.execute("DELETE FROM shelf_stats WHERE shelf_id NOT IN (SELECT id FROM shelves)")
+        cursor.execute("DELETE FROM tag_usage WHERE usage_count = 0")
+
+        cursor.execute("DELETE FROM library_stats")
+        cursor.execute("""
+            INSERT INTO library_stats (library_id, shelf_count, book_count, chapter_count, topic_count)
+            SELECT l.id, COUNT(ss.shelf_id),
+                   COALESCE(SUM(ss.book_count), 0),
+                   COALESCE(SUM(ss.chapter_count), 0),
+                   COALESCE(SUM(ss.topic_count), 0)
+            FROM libraries l
+            LEFT JOIN shelves s ON s.library_id = l.id
+            LEFT JOIN shelf_stats ss ON ss.shelf_id = s.id
+            GROUP BY l.id
+        """)
+
+        cursor.execute("SELECT SUM(book_count), SUM(chapter_count), SUM(topic_count) FROM shelf_stats")
+        books, chapters, topics = (count or 0 for count in cursor.fetchone())
+        counts = {'books': books, 'chapters': chapters, 'topics': topics}
+        for table in ('library_types', 'libraries', 'shelves', 'tags', 'curricula'):
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            counts[table] = cursor.fetchone()[0]
+
+        cursor.execute("DELETE FROM catalog_counts")
+        cursor.executemany("INSERT INTO catalog_counts (name, count) VALUES (?, ?)",
+                           [(name, counts[name]) for name in CATALOG_COUNTS])
+
+        self.shelves.clear()
+        self.tags.clear()
+        self.full = False
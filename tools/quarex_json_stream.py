@@ -0,0 +1,155 @@
+"""
+Incremental JSON reading for large Quarex library files.
+
+The older library format keeps a whole library in one file:
+
+    {"library": ..., "shelves": [{"name": ..., "books": [{"name": ..., "chapters": [...]}]}]}
+
+The House/Senate compendiums in politician-libraries are the largest of
+these. iter_legacy_books() walks the shelves and books arrays token by
+token and decodes one book at a time, so memory use depends on the size
+of a single book rather than the whole file. Only the standard library's
+json decoder is used.
+"""
+
+import json
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+
+_decoder = json.JSONDecoder()
+
+
+class JsonStream:
+    """Pull-style reader over a text file containing one JSON document."""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, at_least=0):
+        """Drop consumed text and append the next chunk. Returns False at EOF."""
+        if self.eof:
+            return False
+        chunk = self.f.read(max(self.chunk_size, at_least))
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+        return bool(chunk)
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it ('' at EOF)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        """Consume the next non-whitespace character, which must be `char`."""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} but found {found!r}")
+        self.pos += 1
+
+    def read_value(self):
+        """Decode and return the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Most likely the value runs past the buffer - read more
+                # (doubling, so long values stay linear) and retry
+                if not self._fill(len(self.buf)):
+                    raise
+                continue
+            # A number or literal ending exactly at the buffer edge may be cut off
+            if end == len(self.buf) and self._fill(len(self.buf)):
+                continue
+            self.pos = end
+            return value
+
+    def iter_object(self):
+        """Yield the keys of the next object; the caller must consume each value."""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self.expect(':')
+            yield key
+            separator = self.peek()
+            self.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f"Expected ',' or '}}' but found {separator!r}")
+
+    def iter_array(self):
+        """Yield once per element of the next array; the caller must consume each element."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            separator = self.peek()
+            self.pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise ValueError(f"Expected ',' or ']' but found {separator!r}")
+
+
+def is_legacy_library(file_path):
+    """Check whether a file uses the nested-shelves format.
+
+    Stops as soon as a top-level "shelves" or "chapters" key is seen, so
+    only the small header fields of a file are decoded.
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        stream = JsonStream(f, chunk_size=4096)
+        if stream.peek() != '{':
+            return False
+        for key in stream.iter_object():
+            if key == 'shelves':
+                return True
+            if key == 'chapters':
+                return False
+            stream.read_value()
+    return False
+
+
+def iter_legacy_books(file_path):
+    """Yield (shelf_name, book) for every book in a nested-shelves library file.
+
+    Each book is an ordinary dict with "name" and "chapters". A shelf whose
+    "name" comes after its "books" is reported as "Shelf N".
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        stream = JsonStream(f)
+        for key in stream.iter_object():
+            if key != 'shelves':
+                stream.read_value()
+                continue
+
+            for shelf_index, _ in enumerate(stream.iter_array()):
+                shelf_name = None
+                for shelf_key in stream.iter_object():
+                    if shelf_key == 'books':
+                        if shelf_name is None:
+                            shelf_name = f"Shelf {shelf_index + 1}"
+                        for _ in stream.iter_array():
+                            yield shelf_name, stream.read_value()
+                    elif shelf_key == 'name':
+                        shelf_name = stream.read_value()
+                    else:
+                        stream.read_value()
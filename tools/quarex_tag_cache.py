@@ -0,0 +1,119 @@
+"""
+Skip cache for the auto-taggers.
+
+A tagger derives a chapter's tags only from a few names (library type,
+shelf, book, chapter, and topics for the book tagger), the tag
+vocabulary and its own rules. TagCache remembers the tags produced for
+each such input, keyed by a hash of the inputs together with
+
+    vocabulary version  - digest of tag-vocabulary.json
+    rule-set version    - digest of the tagger script, quarex_tag_matcher.py
+                          and quarex_tag_tfidf.py
+
+so editing the vocabulary or any keyword rule retags everything, while a
+rerun over an unchanged tree only looks tags up.
+
+    cache = TagCache.for_tagger(__file__, TAG_VOCABULARY_PATH)
+    key = cache.key(library_type, shelf_name, book_name, chapter_name)
+    tags = cache.get(key)
+    if tags is None:
+        tags = generate_tags(...)
+        cache.put(key, tags)
+    ...
+    cache.save()
+
+Each tagger has its own pickle in database/, written next to its final
+path and swapped in like the catalog snapshot. Entries made under other
+versions are dropped when the file is read. Worker processes only read
+the cache: they hand their new entries back with take_added(), and the
+main process merges them with update() and saves once.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+
+CACHE_DIR = Path(__file__).resolve().parent.parent / "database"
+CACHE_VERSION = 1
+
+MATCHER_PATH = Path(__file__).resolve().with_name("quarex_tag_matcher.py")
+TFIDF_PATH = Path(__file__).resolve().with_name("quarex_tag_tfidf.py")
+
+
+def file_digest(*paths):
+    """Short hex digest of the contents of one or more files."""
+    digest = hashlib.blake2b(digest_size=8)
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class TagCache:
+    """Tags already derived for chapter inputs, kept between runs."""
+
+    def __init__(self, name, versions, cache_dir=CACHE_DIR):
+        self.path = Path(cache_dir) / f"tag-cache-{name}.pickle"
+        self.versions = tuple(versions)
+        self.entries = self._read()
+        self.added = {}
+
+    @classmethod
+    def for_tagger(cls, tagger_path, vocabulary_path, cache_dir=CACHE_DIR):
+        """The cache of one tagger script, versioned by its vocabulary and rules."""
+        tagger_path = Path(tagger_path).resolve()
+        versions = (file_digest(vocabulary_path), file_digest(tagger_path, MATCHER_PATH, TFIDF_PATH))
+        return cls(tagger_path.stem, versions, cache_dir)
+
+    def _read(self):
+        """Stored {key: tags}, or {} if missing, unreadable or from other versions."""
+        try:
+            with open(self.path, 'rb') as f:
+                stored = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            return {}
+        if (not isinstance(stored, dict) or stored.get('version') != CACHE_VERSION
+                or stored.get('versions') != self.versions):
+            return {}
+        return stored['entries']
+
+    def key(self, *fields):
+        """Hash of a chapter's tagging inputs under the current versions."""
+        payload = json.dumps([self.versions, fields], ensure_ascii=False)
+        return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).digest()
+
+    def get(self, key):
+        """Cached tags for a key, or None."""
+        tags = self.added.get(key)
+        if tags is None:
+            tags = self.entries.get(key)
+        return None if tags is None else list(tags)
+
+    def put(self, key, tags):
+        """Remember the tags derived for a key."""
+        self.added[key] = tuple(tags)
+
+    def take_added(self):
+        """Entries added since the last call, for handing back from a worker."""
+        added, self.added = self.added, {}
+        return added
+
+    def update(self, added):
+        """Merge entries added elsewhere (e.g. by worker processes)."""
+        self.added.update(added)
+
+    def save(self):
+        """Write the cache if anything was added; returns whether it wrote."""
+        if not self.added:
+            return False
+        self.entries.update(self.added)
+        self.added = {}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': CACHE_VERSION, 'versions': self.versions,
+                         'entries': self.entries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+        return True
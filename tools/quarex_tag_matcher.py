@@ -0,0 +1,208 @@
+"""
+Whole-word keyword matching shared by the auto-taggers.
+
+auto-tagger.py, book-auto-tagger.py and single-auto-tagger.py all decide
+tags from keyword rules - {label: [keyword, ...]} tables checked against a
+chapter's library, shelf, book and chapter names (and topics). This module
+compiles those tables once and matches them against text split into words:
+
+    "art"           whole word: art, arts - not article, start or party
+    "civil rights"  phrase: consecutive words, any punctuation in between
+    "sculpt*"       stem: any word starting with it (sculptor, sculpture)
+
+The last word of a keyword may take a plural s/es ("elections" matches
+"election"); hyphens and other punctuation count as word breaks on both
+sides, so "non-fiction" matches "non fiction" too.
+
+    text = MatchText(f"{book_name} {chapter_name}")   # tokenized once
+    keyword_matcher(RULES).scores(text)   # {label: score} in rule order
+    keyword_matcher(RULES).first(text)    # first label with a match
+
+find_best_tag() and find_multiple_tags() pick tags from such scores the
+way the taggers always have: highest score first, ties to the earlier rule.
+
+keyword_matcher() caches the compiled matcher per rule table, so the
+tables stay plain module-level dicts in each tagger.
+"""
+
+import re
+
+# Words are runs of letters and digits; everything else separates them
+WORD = re.compile(r"[^\W_]+")
+
+# Trailing marker that turns a keyword's last word into a prefix
+STEM_MARK = "*"
+
+# Endings a keyword's last word may take, and words that only look like them
+PLURAL_ENDINGS = ("", "s", "es")
+NOT_PLURALS = frozenset({"news"})
+
+
+def tokenize(text):
+    """Lowercase words of a text, in order."""
+    return tuple(WORD.findall(text.lower()))
+
+
+def keyword_weight(keyword):
+    """Score of a keyword match: longer phrases are more specific."""
+    return len(keyword.rstrip(STEM_MARK).split())
+
+
+class MatchText:
+    """A text split into words once, for any number of matchers."""
+    __slots__ = ('text', 'tokens')
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+
+    def has_word(self, word):
+        """Whether a single word (or its plural) appears in the text."""
+        return any(form in self.tokens for form in plural_forms(word))
+
+
+def as_match_text(text):
+    """Accept either a plain string or an already tokenized MatchText."""
+    return text if isinstance(text, MatchText) else MatchText(text)
+
+
+class KeywordMatcher:
+    """One rule table {label: [keyword, ...]} compiled for word matching.
+
+    Keywords are indexed by their first word - every plural form of it
+    for one-word keywords, the stem for stems - so matching looks up each
+    word of the text once and only checks the phrases starting there.
+    """
+
+    def __init__(self, rules):
+        self.labels = list(rules)
+        # word -> [(label position, weight, number, rest of the phrase, stem)]
+        self.words = {}
+        self.stems = {}
+        # keyword number -> (label position, weight)
+        self.keywords = []
+
+        for position, keywords in enumerate(rules.values()):
+            for keyword in keywords:
+                tokens = tokenize(keyword)
+                if not tokens:
+                    continue
+                stem = keyword.endswith(STEM_MARK)
+                number = len(self.keywords)
+                entry = (position, keyword_weight(keyword), number, tokens[1:], stem)
+                self.keywords.append(entry[:2])
+                if len(tokens) > 1:
+                    self.words.setdefault(tokens[0], []).append(entry)
+                elif stem:
+                    self.stems.setdefault(tokens[0], []).append(entry)
+                else:
+                    for form in plural_forms(tokens[0]):
+                        self.words.setdefault(form, []).append(entry)
+        self.stem_lengths = sorted({len(stem) for stem in self.stems})
+        # word -> every entry it can start; names repeat across chapters
+        self.lookups = {}
+
+    def _lookup(self, token):
+        """Entries whose first word (or stem) matches a word of the text."""
+        entries = []
+        for length in self.stem_lengths:
+            if length > len(token):
+                break
+            entries.extend(self.stems.get(token[:length], ()))
+        entries.extend(self.words.get(token, ()))
+        self.lookups[token] = entries
+        return entries
+
+    def _found(self, text):
+        """{keyword number: entry} for every keyword found in a text."""
+        tokens = as_match_text(text).tokens
+        found = {}
+
+        for i, token in enumerate(tokens):
+            entries = self.lookups.get(token)
+            if entries is None:
+                entries = self._lookup(token)
+            for entry in entries:
+                if not entry[3] or _phrase_continues(tokens, i + 1, entry[3], entry[4]):
+                    found[entry[2]] = entry
+        return found
+
+    def hits(self, text):
+        """(label position, weight) of every keyword found, each counted once."""
+        return [(entry[0], entry[1]) for entry in self._found(text).values()]
+
+    def keyword_ids(self, text):
+        """Numbers of every keyword found (indexes into .keywords), each once."""
+        return list(self._found(text))
+
+    def scores(self, text):
+        """{label: score} for every label with a match, in rule order."""
+        points = {}
+        for position, weight in self.hits(text):
+            points[position] = points.get(position, 0) + weight
+        return {self.labels[position]: points[position] for position in sorted(points)}
+
+    def matching(self, text):
+        """Labels with at least one match, in rule order."""
+        return [self.labels[position] for position in sorted({position for position, _ in self.hits(text)})]
+
+    def first(self, text, allowed=None):
+        """First label in rule order with a match (and in `allowed`, if given)."""
+        for label in self.matching(text):
+            if allowed is None or label in allowed:
+                return label
+        return None
+
+
+def plural_forms(word):
+    """A keyword's last word and the plural spellings that also match it."""
+    forms = [word + ending for ending in PLURAL_ENDINGS]
+    return [form for form in forms if form == word or form not in NOT_PLURALS]
+
+
+def _phrase_continues(tokens, start, rest, stem):
+    """Whether the words of a phrase after its first follow at `start`."""
+    end = start + len(rest)
+    if end > len(tokens):
+        return False
+    for offset, word in enumerate(rest[:-1]):
+        if tokens[start + offset] != word:
+            return False
+    if stem:
+        return tokens[end - 1].startswith(rest[-1])
+    return tokens[end - 1] in plural_forms(rest[-1])
+
+
+_compiled = {}
+
+
+def keyword_matcher(rules):
+    """The compiled KeywordMatcher for a rule table, built on first use.
+
+    Cached by the table's identity: pass the same module-level dict each
+    time rather than building one per call.
+    """
+    cached = _compiled.get(id(rules))
+    if cached is None or cached[0] is not rules:
+        cached = (rules, KeywordMatcher(rules))
+        _compiled[id(rules)] = cached
+    return cached[1]
+
+
+def find_best_tag(scores, valid_tags):
+    """The highest-scoring valid tag, or None; ties go to the earlier rule."""
+    best_tag = None
+    best_score = 0
+    for tag, score in scores.items():
+        if score > best_score and tag in valid_tags:
+            best_tag, best_score = tag, score
+    return best_tag
+
+
+def find_multiple_tags(scores, valid_tags, exclude=None, limit=3):
+    """Up to `limit` valid tags by descending score, skipping `exclude`."""
+    if exclude is None:
+        exclude = set()
+    candidates = [tag for tag in scores if tag in valid_tags and tag not in exclude]
+    candidates.sort(key=lambda tag: scores[tag], reverse=True)
+    return candidates[:limit]
@@ -0,0 +1,139 @@
+"""
+TF-IDF tag scoring for the auto-taggers, vectorized with NumPy.
+
+The default scoring adds up len(keyword.split()) for every keyword found,
+so a keyword that shows up in half the catalog ("history", "policy")
+counts as much as one that picks out a handful of chapters. TfidfScorer
+scores a whole batch of chapters (one library file) at once instead:
+
+    1. every chapter text is matched once per tier with the shared
+       KeywordMatcher, giving a sparse chapter x keyword matrix (COO:
+       one (row, keyword) pair per match);
+    2. each match is weighted by phrase length x IDF, where the IDF of a
+       keyword is learned from how many chapters of the catalog it
+       matches (learn_idf);
+    3. np.bincount folds keywords into their tags, giving a dense
+       chapter x tag score matrix per tier, with tags missing from the
+       vocabulary zeroed;
+    4. np.argpartition finds the TOP_K-th best score of every chapter;
+       the tags above it, and the earliest of those tied with it, are
+       ordered by score (ties to the earlier rule).
+
+The result for each chapter is {tier: {tag: score}}, highest first - the
+same shape generate_tags() gets from keyword_matcher().scores(), so
+find_best_tag() and the tagger's fallbacks work unchanged.
+
+    idf = learn_idf(TIER_KEYWORDS, catalog_texts)
+    scorer = TfidfScorer(TIER_KEYWORDS, idf, valid_tags)
+    for scores in scorer.score(texts): ...
+
+NumPy is optional: HAS_NUMPY is False without it, and auto-tagger.py
+refuses --tfidf until it is installed.
+"""
+
+import hashlib
+
+try:
+    import numpy as np
+except ImportError:
+    # keyword-count scoring only; pip install numpy for --tfidf
+    np = None
+
+from quarex_tag_matcher import as_match_text, keyword_matcher
+
+HAS_NUMPY = np is not None
+
+# Best tags kept per tier and chapter: enough for the tagger to skip the
+# tags it already used and still have candidates left
+TOP_K = 8
+
+
+def _match_matrix(matcher, texts):
+    """(rows, keyword numbers) of every match - the sparse chapter x keyword matrix."""
+    rows = []
+    columns = []
+    for row, text in enumerate(texts):
+        found = matcher.keyword_ids(text)
+        rows.extend([row] * len(found))
+        columns.extend(found)
+    return np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)
+
+
+def learn_idf(tier_rules, texts):
+    """{tier: IDF of every keyword} from the chapter texts of a catalog.
+
+    Smoothed so that a keyword no chapter matches still gets a finite,
+    highest weight: idf = ln((1 + N) / (1 + df)) + 1.
+    """
+    texts = [as_match_text(text) for text in texts]
+    idf = {}
+    for tier, rules in tier_rules.items():
+        matcher = keyword_matcher(rules)
+        _, columns = _match_matrix(matcher, texts)
+        df = np.bincount(columns, minlength=len(matcher.keywords))
+        idf[tier] = np.log((1 + len(texts)) / (1 + df)) + 1
+    return idf
+
+
+class TfidfScorer:
+    """Batch TF-IDF scoring of chapter texts against tiered rule tables."""
+
+    def __init__(self, tier_rules, idf, valid_tags):
+        self.tiers = {}
+        digest = hashlib.blake2b(digest_size=8)
+        for tier, rules in tier_rules.items():
+            matcher = keyword_matcher(rules)
+            positions = np.array([position for position, _ in matcher.keywords], dtype=np.intp)
+            weights = np.array([weight for _, weight in matcher.keywords], dtype=np.float64)
+            valid = np.array([label in valid_tags[tier] for label in matcher.labels], dtype=bool)
+            self.tiers[tier] = (matcher, positions, weights * idf[tier], valid)
+            digest.update(np.ascontiguousarray(idf[tier], dtype=np.float64).tobytes())
+        # Changes with the IDF weights, for the taggers' skip cache
+        self.version = digest.hexdigest()
+
+    def score(self, texts):
+        """[{tier: {tag: score}}] for a batch of texts, best tags first."""
+        texts = [as_match_text(text) for text in texts]
+        results = [{} for _ in texts]
+        if not texts:
+            return results
+
+        for tier, (matcher, positions, weights, valid) in self.tiers.items():
+            labels = matcher.labels
+            rows, columns = _match_matrix(matcher, texts)
+
+            # Sum keyword weights into a chapter x tag matrix
+            cells = rows * len(labels) + positions[columns]
+            matrix = np.bincount(cells, weights=weights[columns],
+                                 minlength=len(texts) * len(labels))
+            matrix = matrix.reshape(len(texts), len(labels))
+            matrix[:, ~valid] = 0
+
+            top, values = _top_tags(matrix, TOP_K)
+            for row, result in enumerate(results):
+                result[tier] = {labels[column]: float(value)
+                                for column, value in zip(top[row], values[row]) if value > 0}
+        return results
+
+
+def _top_tags(matrix, k):
+    """(columns, scores) of the k best cells of each row, best first.
+
+    argpartition only finds the k-th best score of each row; every cell
+    above it is kept, and cells equal to it are filled in from the left,
+    so a tie at the cut goes to the earlier rule just as ties within the
+    k do after the stable sort by score.
+    """
+    k = min(k, matrix.shape[1])
+    if k == 0:
+        return np.empty((matrix.shape[0], 0), dtype=np.intp), np.empty((matrix.shape[0], 0))
+    kth = np.take_along_axis(matrix, np.argpartition(-matrix, k - 1, axis=1)[:, k - 1:k], axis=1)
+    above = matrix > kth
+    tied = matrix == kth
+    room = k - above.sum(axis=1, keepdims=True)
+    keep = above | (tied & (np.cumsum(tied, axis=1) <= room))
+    # Exactly k cells per row, in column order
+    top = np.nonzero(keep)[1].reshape(matrix.shape[0], k)
+    values = np.take_along_axis(matrix, top, axis=1)
+    order = np.argsort(-values, axis=1, kind='stable')
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(values, order, axis=1)